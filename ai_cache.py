@@ -0,0 +1,354 @@
+import hashlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_TTL = 24 * 60 * 60  # segundos
+DEFAULT_MAX_ENTRIES = 1000
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normaliza o prompt (espaços e quebras de linha) para que variações de formatação gerem a mesma chave
+    """
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def prompt_key(prompt: str, model_name: str = '') -> str:
+    """
+    Chave de conteúdo: hash SHA-256 do modelo e do prompt normalizado
+    """
+    return hashlib.sha256(f"{model_name}\n{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    """
+    Resposta servida pelo cache, compatível com o uso de response.text
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ResponseCache:
+    """
+    Cache de respostas do modelo, em memória com TTL e opcionalmente persistido em SQLite
+
+    Requisições simultâneas com a mesma chave são coalescidas: apenas a
+    primeira chama o modelo e as demais aguardam o mesmo resultado.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()  # chave -> (texto, criado_em)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        if path:
+            with sqlite3.connect(path) as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses '
+                    '(key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)'
+                )
+
+    def get(self, key):
+        """
+        Retorna o texto em cache (memória e depois SQLite) ou None se ausente/expirado
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+
+        if self.path:
+            with sqlite3.connect(self.path) as conn:
+                row = conn.execute(
+                    'SELECT text, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+            if row and now - row[1] < self.ttl:
+                self._remember(key, row[0], row[1])
+                return row[0]
+        return None
+
+    def put(self, key, text):
+        """
+        Armazena a resposta em memória e, se configurado, no SQLite
+        """
+        created_at = time.time()
+        self._remember(key, text, created_at)
+        if self.path:
+            with sqlite3.connect(self.path) as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, text, created_at) VALUES (?, ?, ?)',
+                    (key, text, created_at)
+                )
+
+    def _remember(self, key, text, created_at):
+        with self._lock:
+            self._entries[key] = (text, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, counter):
+        """
+        Incrementa um contador de uso ('hits', 'misses' ou 'coalesced')
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def claim(self, key):
+        """
+        Registra uma chamada em andamento para a chave, ou retorna a já registrada
+
+        Returns:
+            tuple[Future, bool]: (resultado compartilhado, True se o chamador deve calcular)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def release(self, key):
+        """
+        Remove o registro da chamada em andamento (chamado pelo dono, com o Future já resolvido)
+        """
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """
+        Retorna a resposta em cache ou calcula uma única vez, mesmo com chamadas simultâneas
+
+        Args:
+            key (str): Chave do prompt (ver prompt_key)
+            compute (callable): Função sem argumentos que chama o modelo e retorna o texto
+            timeout (float, optional): Espera máxima, em segundos, por uma chamada
+                simultânea já em andamento; None espera indefinidamente
+
+        Returns:
+            str: Texto da resposta
+
+        Raises:
+            concurrent.futures.TimeoutError: Se a chamada em andamento não terminar a tempo
+        """
+        text = self.get(key)
+        if text is not None:
+            self.record('hits')
+            return text
+
+        future, owner = self.claim(key)
+        if not owner:
+            self.record('coalesced')
+            return future.result(timeout=timeout)
+
+        try:
+            # Outra chamada pode ter concluído entre a leitura e o registro
+            text = self.get(key)
+            if text is None:
+                self.record('misses')
+                text = compute()
+                self.put(key, text)
+            else:
+                self.record('hits')
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.release(key)
+
+    def stats(self):
+        """
+        Retorna contadores de uso do cache
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
+
+
+def get_response_cache(path=None, ttl=DEFAULT_TTL) -> ResponseCache:
+    """
+    Retorna o cache compartilhado pelo processo para o arquivo informado (ou só em memória)
+    """
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(ttl=ttl, path=path)
+            _caches[path] = cache
+        return cache
+
+
+class CachedModel:
+    """
+    Envolve um modelo generativo, servindo generate_content a partir do ResponseCache
+    """
+
+    def __init__(self, model, cache: ResponseCache, model_name='', timeout=None):
+        self.model = model
+        self.cache = cache
+        self.model_name = model_name or getattr(model, 'model_name', '')
+        # Espera máxima por uma chamada simultânea com o mesmo prompt (ver get_or_compute)
+        self.timeout = timeout
+
+    def generate_content(self, prompt, **kwargs):
+        """
+        Gera (ou recupera do cache) a resposta para o prompt
+
+        Chamadas com parâmetros extras (ex.: stream=True) não passam pelo cache.
+        Se outra chamada com o mesmo prompt não terminar em self.timeout segundos,
+        levanta concurrent.futures.TimeoutError para que o chamador use o fallback.
+        """
+        if kwargs:
+            return self.model.generate_content(prompt, **kwargs)
+        key = prompt_key(prompt, self.model_name)
+        text = self.cache.get_or_compute(key, lambda: self.model.generate_content(prompt).text, self.timeout)
+        return CachedResponse(text)
+
+    def stream_content(self, prompt):
+        """
+        Gera a resposta em partes (stream), servindo do cache quando disponível
+
+        Streams simultâneos do mesmo prompt são coalescidos como em
+        get_or_compute: apenas o primeiro chama o modelo e os demais recebem o
+        texto completo quando ele termina (ou TimeoutError após self.timeout).
+        A resposta completa é armazenada no cache ao final do stream.
+
+        Yields:
+            str: Trechos do texto da resposta
+        """
+        key = prompt_key(prompt, self.model_name)
+        text = self.cache.get(key)
+        if text is not None:
+            self.cache.record('hits')
+            yield text
+            return
+
+        future, owner = self.cache.claim(key)
+        if not owner:
+            self.cache.record('coalesced')
+            yield future.result(timeout=self.timeout)
+            return
+
+        try:
+            # Outra chamada pode ter concluído entre a leitura e o registro
+            text = self.cache.get(key)
+            if text is not None:
+                self.cache.record('hits')
+                yield text
+            else:
+                self.cache.record('misses')
+                parts = []
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    parts.append(chunk.text)
+                    yield chunk.text
+                text = ''.join(parts)
+                self.cache.put(key, text)
+            future.set_result(text)
+        except GeneratorExit:
+            # Stream abandonado pelo consumidor: quem aguarda segue para o fallback
+            future.set_exception(RuntimeError("Stream interrompido antes do fim"))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.cache.release(key)
+
+
+def stream_with_budget(chunks, fallback, budget, prefix=''):
+    """
+    Repassa um stream de texto respeitando um orçamento de latência
+
+    O stream é consumido em uma thread separada. Se nada chegar dentro do
+    orçamento (ou o modelo falhar antes do primeiro trecho), o texto de
+    fallback é emitido; se o orçamento estourar no meio, o stream é cortado.
+
+    Args:
+        chunks (callable): Função sem argumentos que retorna o iterador de trechos
+        fallback (str): Texto usado quando o modelo não responde a tempo
+        budget (float): Tempo máximo, em segundos, para a resposta completa
+        prefix (str): Texto emitido antes do primeiro trecho do modelo (nunca antes do fallback)
+
+    Yields:
+        str: Trechos da resposta ou o fallback
+    """
+    pending = queue.Queue()
+
+    def consume():
+        try:
+            for text in chunks():
+                pending.put(('chunk', text))
+            pending.put(('done', None))
+        except Exception as e:
+            pending.put(('error', e))
+
+    threading.Thread(target=consume, daemon=True).start()
+
+    deadline = time.monotonic() + budget
+    produced = False
+    while True:
+        try:
+            kind, value = pending.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            yield ' …' if produced else fallback
+            return
+        if kind == 'chunk':
+            if not produced and prefix:
+                yield prefix
+            produced = True
+            yield value
+        else:
+            if not produced:
+                yield fallback
+            return
+
+
+class FakeModel:
+    """
+    Substituto offline do GenerativeModel para testes e benchmarks
+
+    Responde com um texto determinístico derivado do prompt e conta as
+    chamadas recebidas; delay simula a latência do serviço.
+    """
+
+    def __init__(self, responses=None, delay=0.0, model_name='fake-model'):
+        self.responses = responses or {}
+        self.delay = delay
+        self.model_name = model_name
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        text = self.responses.get(normalize_prompt(prompt),
+                                  f"Resposta simulada {prompt_key(prompt)[:8]}")
+        if stream:
+            return [CachedResponse(word + ' ') for word in text.split(' ')]
+        return CachedResponse(text)
@@ -1,38 +1,89 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from pymongo import MongoClient
 from datetime import datetime
-import os
-import numpy as np
-import yfinance as yf
-from datetime import datetime, timedelta
-import google.generativeai as genai 
-import requests
-from dotenv import load_dotenv
 from auth_manager import AuthManager
+from db_connection import check_connection
+from db_indexes import ensure_indexes_once
+from monthly_rollups import ensure_rollups_once
 from custom_select import custom_select
-from financial_advisor import FinancialAdvisor
-from financial_tracker import FinancialTracker
-from purchase_intelligence_interface import purchase_intelligence_interface
+from financial_tracker import FinancialTracker, CATEGORIAS, MESES, TIPOS
+import instrumentation
+from instrumentation import span
+from command_monitor import command_monitor
 
-mongo_uri = st.secrets["mongo_uri"]
+# Dependências pesadas (Gemini, plotly, numpy das simulações) são importadas
+# apenas nas páginas que as usam; ver benchmarks/startup.py
                     
     
 def check_mongodb_connection():
     """
-    Verifica a conexão com o MongoDB
+    Verifica a conexão com o MongoDB (resultado em cache, com backoff após falhas)
     """
-    try:
-        client = MongoClient(mongo_uri)
-        client.admin.command('ismaster')
-        #st.success("Conexão com MongoDB estabelecida com sucesso!")
-        return True
-    except Exception as e:
-        st.error(f"Erro de conexão com MongoDB: {e}")
+    ok, error = check_connection(st.secrets["mongo_uri"])
+    if not ok:
+        st.error(f"Erro de conexão com MongoDB: {error}")
         st.warning("Verifique sua connection string e configurações de rede.")
-        return False
+    return ok
+
+def paginated_transactions(tracker, key, page_size=50, **filters):
+    """
+    Renderiza a navegação entre páginas e retorna apenas a página atual
+
+    Os cursores das páginas já visitadas ficam em st.session_state, e a
+    navegação volta à primeira página quando os filtros mudam.
+
+    Args:
+        tracker (FinancialTracker): Rastreador do usuário atual
+        key (str): Prefixo único das chaves de sessão e dos botões
+        page_size (int): Linhas por página
+        **filters: Filtros repassados a FinancialTracker.get_transactions_page
+
+    Returns:
+        pd.DataFrame: Transações da página atual
+    """
+    cursors_key = f"{key}_cursors"
+    filters_key = f"{key}_filters"
+    if st.session_state.get(filters_key) != filters or cursors_key not in st.session_state:
+        st.session_state[filters_key] = filters
+        st.session_state[cursors_key] = [None]
+
+    cursors = st.session_state[cursors_key]
+    page, next_cursor = tracker.get_transactions_page(after=cursors[-1], limit=page_size, **filters)
+
+    if len(cursors) > 1 or next_cursor is not None:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("⬅️ Anterior", key=f"{key}_prev", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.write(f"Página {len(cursors)}")
+        with col_next:
+            if st.button("Próxima ➡️", key=f"{key}_next", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+
+    return page
+
+def render_debug_panel(metrics):
+    """
+    Painel de desenvolvimento com os tempos de cada span do último rerun
+    """
+    with st.sidebar.expander("⏱️ Desempenho (último rerun)"):
+        st.write(f"Rerun: {metrics.duration * 1000:.0f} ms")
+        rows = [{'Span': name, 'Chamadas': calls, 'Total (ms)': total * 1000, 'Maior (ms)': longest * 1000}
+                for name, calls, total, longest in metrics.rows()]
+        if rows:
+            st.dataframe(rows, hide_index=True)
+
+    with st.sidebar.expander("🗄️ Comandos MongoDB (processo)"):
+        stats = command_monitor.stats()
+        if stats:
+            st.dataframe(stats, hide_index=True, column_config={
+                'bytes': st.column_config.NumberColumn(
+                    "bytes (medidos)",
+                    help="Soma apenas das respostas medidas: consultas lentas, ou todas com o "
+                         "secret mongo_reply_bytes; vazio se nenhuma foi medida"),
+            })
 
 def login_page():
     """Render login page"""
@@ -129,8 +180,9 @@ def main():
     
     # Menu de navegação
     menu = ["Análise Financeira", "Dicas Financeiras", 
-            "Gerenciar Transações", "Inteligência de Compra"]
+            "Gerenciar Transações", "Inteligência de Compra", "Investimentos"]
     choice = st.sidebar.selectbox("Menu", menu)
+    instrumentation.label_rerun(page=choice)
     
     st.title("🏦 Gestor Financeiro Inteligente")
 
@@ -152,13 +204,12 @@ def main():
                 ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
                  'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'])
         
-        # Recupera transações com filtros
-        df_transactions = tracker.get_transactions_for_display(selected_year)
+        month_filter = None if selected_month == 'Todos' else selected_month
         
-        if selected_month != 'Todos':
-            df_transactions = df_transactions[df_transactions['month'] == selected_month]
+        # Matriz mensal e totais pagos/pendentes lidos dos rollups pré-agregados (monthly_rollups)
+        monthly, totals = tracker.dashboard_summary(selected_year, month_filter)
         
-        if not df_transactions.empty:
+        if not monthly.empty:
             # Sumário de métricas
             st.subheader("Resumo Financeiro")
             
@@ -166,14 +217,13 @@ def main():
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                total_receita = df_transactions[df_transactions['type'] == 'Receita']['value'].sum()
+                total_receita = totals.loc['Receita', 'total']
                 st.metric(label="Total Receitas", value=f"R$ {total_receita:.2f}")
                 
             with col2:
-                total_despesa = df_transactions[df_transactions['type'] == 'Despesa']['value'].sum()
-                paid_expenses = df_transactions[(df_transactions['type'] == 'Despesa') & 
-                                             (df_transactions['paid'])]['value'].sum()
-                pending_expenses = total_despesa - paid_expenses
+                total_despesa = totals.loc['Despesa', 'total']
+                paid_expenses = totals.loc['Despesa', 'paid']
+                pending_expenses = totals.loc['Despesa', 'pending']
                 
                 st.metric(label="Total Despesas",
                          value=f"R$ {total_despesa:.2f}",
@@ -189,10 +239,8 @@ def main():
             col4, col5 = st.columns(2)
 
             with col4:
-                total_investimento = df_transactions[df_transactions['type'] == 'Investimento']['value'].sum()
-                paid_investimento = df_transactions[(df_transactions['type'] == 'Investimento') & 
-                                             (df_transactions['paid'])]['value'].sum()
-                pending_investimento = total_investimento - paid_investimento
+                total_investimento = totals.loc['Investimento', 'total']
+                pending_investimento = totals.loc['Investimento', 'pending']
                 
                 st.metric(label="Total Investimentos",
                          value=f"R$ {total_investimento:.2f}",
@@ -209,6 +257,24 @@ def main():
                           delta=delta_saldo,
                           delta_color=delta_color)
 
+            with st.expander("📈 Evolução Histórica"):
+                # Todos os anos do usuário, recalculado só a partir do último mês em cache
+                history = tracker.history()
+                with span('chart.evolucao_historica'):
+                    chart = history.copy()
+                    chart.index = chart.index.to_timestamp()
+
+                    st.line_chart(chart[['Patrimônio Acumulado']])
+                    st.line_chart(chart[['Net', 'Net Média 3m', 'Net Média 6m', 'Net Média 12m']])
+
+                st.write("Comparação com o mesmo mês do ano anterior")
+                yoy = history[['Receita', 'Despesa', 'Net', 'Receita YoY (%)', 'Despesa YoY (%)', 'Net YoY (%)']].iloc[-12:]
+                yoy.index = yoy.index.strftime('%m/%Y')
+                st.dataframe(yoy.style.format({
+                    'Receita': 'R$ {:.2f}', 'Despesa': 'R$ {:.2f}', 'Net': 'R$ {:.2f}',
+                    'Receita YoY (%)': '{:+.1f}%', 'Despesa YoY (%)': '{:+.1f}%', 'Net YoY (%)': '{:+.1f}%'
+                }, na_rep='-'))
+
             with st.expander("➕ Adicionar Nova Transação"):
                 col1, col2 = st.columns(2)
         
@@ -251,32 +317,33 @@ def main():
                         placeholder="Ex: Pagamento adiantado, Despesa extra, Bônus especial...")
                 
                 if st.button("Adicionar Transação"):
-                    current_month_index = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
-                                       'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'].index(month)
-                    current_year = year
-                    
-                    for i in range(repeat_months):
-                        tracker.add_transaction(
-                            month=['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
-                                 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'][current_month_index],
-                            year=current_year,
-                            category=category,
-                            type=type_transaction,
-                            value=value,
-                            observation=observation
-                        )
-                        
-                        # Avança para o próximo mês
-                        current_month_index += 1
-                        if current_month_index >= 12:
-                            current_month_index = 0
-                            current_year += 1
-                    
-                    st.success(f"Transação adicionada com sucesso para {repeat_months} meses!")
+                    if repeat_months > 1:
+                        # A recorrência é gravada uma única vez e expandida na leitura
+                        tracker.add_recurrence(month, year, category, type_transaction, value,
+                                               observation, count=repeat_months)
+                        st.success(f"Transação adicionada com sucesso para {repeat_months} meses!")
+                    else:
+                        results = tracker.add_transactions([{
+                            'month': month,
+                            'year': year,
+                            'category': category,
+                            'type': type_transaction,
+                            'value': value,
+                            'observation': observation
+                        }])
+
+                        if results[0]['error']:
+                            st.error(f"Falha ao adicionar a transação: {results[0]['error']}")
+                        else:
+                            st.success("Transação adicionada com sucesso!")
             
             # Tabela detalhada com status de pagamento
             st.subheader("Detalhamento de Transações")
             
+            # Apenas uma página é carregada e renderizada por vez
+            df_transactions = paginated_transactions(
+                tracker, 'detalhamento', year=selected_year, month=month_filter)
+            
             # Prepara dados para exibição
             display_df = df_transactions[['month', 'category', 'type', 'observation', 'value', 'paid']].copy()
             
@@ -299,9 +366,9 @@ def main():
             if st.checkbox("Gerenciar Status de Compromissos"):
                 st.subheader("Atualizar Status de Compromissos")
             
-                unpaid_transactions = df_transactions[
-                    (df_transactions['paid'].fillna(False) == False)
-                ][['_id', 'month', 'category', 'type', 'value', 'paid']]
+                unpaid_transactions = paginated_transactions(
+                    tracker, 'pendentes', page_size=20, year=selected_year, month=month_filter, paid=False
+                )[['_id', 'month', 'category', 'type', 'value', 'paid']]
             
                 if not unpaid_transactions.empty:
                     for _, row in unpaid_transactions.iterrows():
@@ -331,19 +398,25 @@ def main():
     elif choice == "Dicas Financeiras":
         st.subheader("💡 Dicas de Otimização")
         
-        # Recupera transações
-        df_transactions = tracker.get_transactions()
+        # Recupera o resumo mensal agregado no MongoDB
+        monthly_summary = tracker.monthly_summary()
         
         
-        if not df_transactions.empty:
+        if not monthly_summary.empty:
+            from financial_advisor import FinancialAdvisor
+            
             # Gera dicas contextuais
-            advisor = FinancialAdvisor(df_transactions)
+            advisor = FinancialAdvisor(monthly_summary=monthly_summary)
             
             tips = advisor.generate_contextual_tips()
             
             
             for i, tip in enumerate(tips, 1):
                 st.write(f"{i}. {tip}")
+            
+            # O modelo só é inicializado quando a dica é pedida; a resposta chega em stream
+            if st.button("Dica do HeroAI") and tips:
+                st.write_stream(advisor.stream_ai_tip(tips))
         else:
             st.warning("Adicione algumas transações para receber dicas personalizadas.")
 
@@ -354,12 +427,30 @@ def main():
       selected_year = st.selectbox("Selecione o Ano", 
           list(range(datetime.now().year, 2019, -1)))
     
-    # Recupera transações do ano selecionado
-      df_transactions = tracker.get_transactions_for_display(selected_year)
+    # Filtros aplicados no servidor
+      col1, col2, col3 = st.columns(3)
+      with col1:
+          type_filter = st.selectbox("Tipo", ['Todos'] + TIPOS)
+      with col2:
+          category_options = CATEGORIAS.get(type_filter) or sorted({c for cats in CATEGORIAS.values() for c in cats})
+          category_filter = st.selectbox("Categoria", ['Todas'] + category_options)
+      with col3:
+          paid_filter = st.selectbox("Status", ['Todos', 'Concluídos', 'Pendentes'])
+    
+    # Recupera apenas a página atual das transações do ano selecionado
+      df_transactions = paginated_transactions(
+          tracker, 'gerenciar',
+          year=selected_year,
+          type=None if type_filter == 'Todos' else type_filter,
+          category=None if category_filter == 'Todas' else category_filter,
+          paid={'Todos': None, 'Concluídos': True, 'Pendentes': False}[paid_filter]
+      )
     
       if not df_transactions.empty:
-        # Adiciona coluna de ID para referência
-          df_transactions = tracker.get_transactions_for_display(selected_year)
+          from transaction_diff import diff_transactions
+        
+        # Categoria como texto livre no editor (a coluna categórica limitaria às já existentes)
+          df_transactions['category'] = df_transactions['category'].astype(str)
         
         # Adiciona uma coluna de seleção (checkboxes) para exclusão
           df_transactions['Selecionar'] = False  # Coluna inicializada como False
@@ -371,12 +462,11 @@ def main():
                   '_id': st.column_config.TextColumn("ID", disabled=True),
                   'month': st.column_config.SelectboxColumn(
                       "Mês", 
-                      options=['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
-                             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+                      options=MESES
                   ),
                   'type': st.column_config.SelectboxColumn(
                       "Tipo", 
-                      options=['Receita', 'Despesa', 'Investimento']
+                      options=TIPOS
                   ),
                   'Selecionar': st.column_config.CheckboxColumn("Selecionar para Excluir")  # Checkbox para seleção
               },
@@ -389,55 +479,119 @@ def main():
         
           with col1:
               if st.button("💾 Salvar Alterações"):
-                # Processa alterações
-                  for index, row in edited_df.iterrows():
-                    # Verifica se a linha foi modificada
-                      original_row = df_transactions.iloc[index]
-                    
-                    # Prepara dicionário de atualizações
-                      updates = {}
-                      for col in ['month', 'category', 'type', 'value']:
-                          if row[col] != original_row[col]:
-                              updates[col] = row[col]
-                    
-                    # Atualiza se houver mudanças
-                      if updates:
-                          try:
-                              tracker.update_transaction(row['_id'], updates)
-                              st.success(f"Transação {row['_id']} atualizada!")
-                          except Exception as e:
-                              st.error(f"Erro ao atualizar transação: {e}")
+                # Compara o editor com os dados originais em uma única passada
+                  updates, _ = diff_transactions(df_transactions, edited_df)
+
+                  if updates:
+                      try:
+                          result = tracker.apply_changes(updates=updates)
+                          st.success(f"{result['modified']} transações atualizadas!")
+                      except Exception as e:
+                          st.error(f"Erro ao atualizar transações: {e}")
+                  else:
+                      st.info("Nenhuma alteração encontrada.")
         
           with col2:
             # Exclusão de transações selecionadas
               if st.button("🗑️ Excluir Transações Selecionadas"):
                 # Filtra as transações marcadas para exclusão
-                  transactions_to_delete = edited_df[edited_df['Selecionar']]['_id'].tolist()
+                  _, transactions_to_delete = diff_transactions(df_transactions, edited_df)
                 
                   if transactions_to_delete:
-                      success_count = 0
-                      for transaction_id in transactions_to_delete:
-                          try:
-                              if tracker.delete_transaction(transaction_id):
-                                  success_count += 1
-                              else:
-                                  st.error(f"Falha ao excluir transação {transaction_id}")
-                          except Exception as e:
-                              st.error(f"Erro ao excluir transação {transaction_id}: {e}")
-                    
-                      if success_count > 0:
-                          st.success(f"{success_count} transações excluídas com sucesso!")
-                        # Atualiza a página para refletir a exclusão
-                          st.rerun()
+                      try:
+                          result = tracker.apply_changes(deletes=transactions_to_delete)
+                          failed = len(transactions_to_delete) - result['deleted']
+                          if failed:
+                              st.error(f"Falha ao excluir {failed} transações")
+                          if result['deleted'] > 0:
+                              st.success(f"{result['deleted']} transações excluídas com sucesso!")
+                            # Atualiza a página para refletir a exclusão
+                              st.rerun()
+                      except Exception as e:
+                          st.error(f"Erro ao excluir transações: {e}")
                   else:
                       st.warning("Nenhuma transação selecionada para exclusão.")
       else:
           st.warning("Nenhuma transação encontrada para o ano selecionado")
 
+    # Regras recorrentes: alterar o valor aqui vale para todos os meses de uma vez
+      recurrences = tracker.get_recurrences()
+      if not recurrences.empty:
+          with st.expander("🔁 Transações Recorrentes"):
+              recurrences['Excluir'] = False
+              edited_recurrences = st.data_editor(
+                  recurrences,
+                  column_config={
+                      '_id': st.column_config.TextColumn("ID", disabled=True),
+                      'count': st.column_config.NumberColumn("Meses", min_value=1, step=1),
+                      'type': st.column_config.SelectboxColumn("Tipo", options=TIPOS),
+                  },
+                  disabled=['_id', 'start_month', 'start_year'],
+                  hide_index=True,
+                  key='recorrencias'
+              )
+              if st.button("💾 Salvar Recorrências"):
+                  fields = ['count', 'category', 'type', 'value', 'observation']
+                  changed = 0
+                  for (_, before), (_, after) in zip(recurrences.iterrows(), edited_recurrences.iterrows()):
+                      if after['Excluir']:
+                          changed += tracker.delete_recurrence(after['_id'])
+                      else:
+                          updates = {field: after[field] for field in fields if after[field] != before[field]}
+                          changed += bool(updates) and tracker.update_recurrence(after['_id'], updates)
+                  if changed:
+                      st.success(f"{changed} recorrências atualizadas!")
+                      st.rerun()
+                  else:
+                      st.info("Nenhuma alteração encontrada.")
+
     elif choice == "Inteligência de Compra":
+        from purchase_intelligence_interface import purchase_intelligence_interface
         purchase_intelligence_interface(tracker)
-    
+
+    elif choice == "Investimentos":
+        st.subheader("📈 Carteira de Investimentos")
+
+        try:
+            positions = tracker.investment_positions()
+            fixed_income = tracker.fixed_income_positions()
+            # Série diária lida das matrizes mapeadas em memória
+            history = tracker.portfolio_history()
+        except Exception as e:
+            st.error(f"Erro ao obter cotações: {e}")
+        else:
+            if positions.empty and fixed_income.empty:
+                st.info("Nenhum investimento cadastrado.")
+
+            if not positions.empty:
+                st.write("### Renda Variável")
+                st.dataframe(positions.style.format(
+                    {'quantity': '{:.0f}', 'price': 'R$ {:.2f}', 'market_value': 'R$ {:.2f}'}, na_rep='-'))
+                st.metric("Valor de Mercado", f"R$ {positions['market_value'].sum():.2f}")
+                if not history.empty:
+                    with span('chart.carteira'):
+                        st.line_chart(history)
+
+            if not fixed_income.empty:
+                st.write("### Renda Fixa (CDI)")
+                st.dataframe(
+                    fixed_income[['name', 'principal', 'cdi_percent', 'days', 'gross', 'ir', 'net']]
+                    .style.format({'principal': 'R$ {:.2f}', 'cdi_percent': '{:.0f}%', 'gross': 'R$ {:.2f}',
+                                   'ir': 'R$ {:.2f}', 'net': 'R$ {:.2f}'})
+                )
+                st.metric("Valor Líquido", f"R$ {fixed_income['net'].sum():.2f}")
+
 if __name__ == "__main__":
-    # Verifica conexão com MongoDB
-    if check_mongodb_connection():
-        main()
+    # Métricas por rerun: arquivo rotativo no formato do Prometheus e painel opcional
+    instrumentation.configure_metrics_file(st.secrets.get("metrics_path"))
+    with instrumentation.rerun() as metrics:
+        # Verifica conexão com MongoDB
+        with span('check_mongodb_connection'):
+            connected = check_mongodb_connection()
+        if connected:
+            # Cria os índices e os rollups mensais uma única vez por processo
+            ensure_indexes_once()
+            ensure_rollups_once()
+            main()
+    if st.secrets.get("debug_panel", False):
+        render_debug_panel(metrics)
@@ -1,6 +1,9 @@
 import streamlit as st
-from pymongo import MongoClient
-import bcrypt
+from db_connection import get_client
+from session_cache import session_cache
+from instrumentation import instrument, span
+from concurrent.futures import TimeoutError as HashTimeoutError
+import password_hasher
 from datetime import datetime, timedelta
 import jwt
 import re
@@ -10,13 +13,18 @@ import extra_streamlit_components as stx
 class AuthManager:
     def __init__(self, mongo_uri):
         """
-        Initialize authentication manager with MongoDB connection
+        Initialize authentication manager with the shared MongoDB connection
         """
-        self.client = MongoClient(mongo_uri)
+        self.client = get_client(mongo_uri)
         self.db = self.client['financial_tracker']
         self.users_collection = self.db['users']
         self.JWT_SECRET = st.secrets["jwt_secret"]
         self.JWT_EXPIRY_DAYS = 30  # Aumentado para 30 dias
+        self.session_cache = session_cache
+        # bcrypt cost factor; changing it triggers a transparent rehash on the next login
+        self.BCRYPT_ROUNDS = int(st.secrets.get("bcrypt_rounds", password_hasher.DEFAULT_ROUNDS))
+        self.HASH_TIMEOUT = float(st.secrets.get("bcrypt_timeout", password_hasher.DEFAULT_TIMEOUT))
+        password_hasher.configure(st.secrets.get("bcrypt_workers"), st.secrets.get("bcrypt_max_pending"))
         
     def _get_cookie_manager(self):
         """Get or create cookie manager with unique key"""
@@ -37,6 +45,7 @@ class AuthManager:
             algorithm='HS256'
         )
     
+    @instrument()
     def login_user(self, email: str, password: str, remember_me: bool = False) -> tuple[bool, str]:
         """
         Login a user
@@ -46,8 +55,22 @@ class AuthManager:
         if not user:
             return False, "Email ou senha incorretos"
             
-        if not self._verify_password(password, user['password']):
-            return False, "Email ou senha incorretos"
+        try:
+            if not self._verify_password(password, user['password']):
+                return False, "Email ou senha incorretos"
+        except HashTimeoutError:
+            return False, "Servidor ocupado, tente novamente em instantes"
+        
+        # Rehash transparently when the configured cost factor changed; best-effort,
+        # a busy pool just leaves the upgrade for the next login
+        if password_hasher.needs_rehash(user['password'], self.BCRYPT_ROUNDS):
+            try:
+                self.users_collection.update_one(
+                    {'_id': user['_id']},
+                    {'$set': {'password': self._hash_password(password)}}
+                )
+            except HashTimeoutError:
+                pass
             
         token = self._generate_token(user['_id'], remember_me)
         
@@ -63,40 +86,61 @@ class AuthManager:
         st.session_state['token'] = token
         return True, token
     
+    @instrument()
     def get_current_user(self) -> dict:
         """Get the current logged in user from session state or cookie"""
         # First check session state
         token = st.session_state.get('token')
+        from_cookie = False
         
         # If no token in session state, check cookies
         if not token:
             cookie_manager = self._get_cookie_manager()
             token = cookie_manager.get('auth_token')
-            if token:
-                # Validate token from cookie
-                payload = self._verify_token(token)
-                if payload and payload.get('remember_me'):
-                    # Token is valid and was created with remember_me
-                    st.session_state['token'] = token
-                else:
-                    # Invalid or expired token, clear cookie
-                    cookie_manager.delete('auth_token')
-                    return None
+            if not token:
+                return None
+            from_cookie = True
         
-        # Verify token and get user
+        # Verified sessions are cached by token, skipping the decode and the DB lookup
+        cached = self.session_cache.get(token)
+        if cached and (not from_cookie or cached[0].get('remember_me')):
+            if from_cookie:
+                st.session_state['token'] = token
+            return cached[1]
+        
+        # Verify token (decoded only once, even when it comes from the cookie)
         payload = self._verify_token(token)
+        if from_cookie:
+            if payload and payload.get('remember_me'):
+                # Token is valid and was created with remember_me
+                st.session_state['token'] = token
+            else:
+                # Invalid or expired token, clear cookie
+                self._get_cookie_manager().delete('auth_token')
+                return None
         if not payload:
             return None
             
-        user = self.users_collection.find_one({'_id': ObjectId(payload['user_id'])})
+        self.session_cache.record_lookup()
+        with span('AuthManager.user_lookup'):
+            user = self.users_collection.find_one(
+                {'_id': ObjectId(payload['user_id'])},
+                {'name': 1, 'email': 1}
+            )
+        if user:
+            self.session_cache.put(token, payload, user)
         return user
     
     def logout_user(self):
         """Logout the current user"""
         if 'token' in st.session_state:
+            self.session_cache.evict(st.session_state['token'])
             del st.session_state['token']
         # Clear auth cookie
         cookie_manager = self._get_cookie_manager()
+        token = cookie_manager.get('auth_token')
+        if token:
+            self.session_cache.evict(token)
         cookie_manager.delete('auth_token')
         
         # Ensure legacy user exists
@@ -123,12 +167,12 @@ class AuthManager:
     #         )
     
     def _hash_password(self, password: str) -> bytes:
-        """Hash a password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        """Hash a password using bcrypt in the shared process pool"""
+        return password_hasher.hash_password(password, self.BCRYPT_ROUNDS, timeout=self.HASH_TIMEOUT)
     
     def _verify_password(self, password: str, hashed: bytes) -> bool:
-        """Verify a password against its hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed)
+        """Verify a password against its hash in the shared process pool"""
+        return password_hasher.verify_password(password, hashed, timeout=self.HASH_TIMEOUT)
     
     def _verify_token(self, token: str) -> dict:
         """Verify a JWT token and return the payload"""
@@ -157,6 +201,7 @@ class AuthManager:
             return False, "Senha deve conter pelo menos um número"
         return True, "Senha válida"
     
+    @instrument()
     def register_user(self, email: str, password: str, name: str) -> tuple[bool, str]:
         """
         Register a new user
@@ -175,9 +220,13 @@ class AuthManager:
             return False, "Email já cadastrado"
             
         # Create user
+        try:
+            hashed = self._hash_password(password)
+        except HashTimeoutError:
+            return False, "Servidor ocupado, tente novamente em instantes"
         user = {
             'email': email,
-            'password': self._hash_password(password),
+            'password': hashed,
             'name': name,
             'created_at': datetime.utcnow(),
             'is_legacy': False
@@ -0,0 +1,80 @@
+"""
+Compara a avaliação em lote de posições % do CDI com um laço dia a dia por posição
+
+Usa uma série sintética do DI em dias úteis; o laço roda em uma amostra das
+posições para conferir a paridade e estimar o tempo total.
+
+Uso: python -m benchmarks.fixed_income [--positions 10000] [--sample 200]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from fixed_income import CDIAccrual, ir_rate
+
+
+def synthetic_cdi(start='2016-01-01', end='2026-01-01', seed=42):
+    """
+    Série do DI (% ao dia) em dias úteis, oscilando entre ~2% e ~14% ao ano
+    """
+    dates = pd.bdate_range(start, end)
+    rng = np.random.default_rng(seed)
+    annual = 0.08 + 0.06 * np.sin(np.linspace(0, 3 * np.pi, len(dates))) + rng.normal(0, 0.001, len(dates))
+    return pd.Series(((1 + annual) ** (1 / 252) - 1) * 100, index=dates)
+
+
+def synthetic_positions(n, cdi, as_of, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = cdi.index[cdi.index < as_of]
+    return pd.DataFrame({
+        'principal': rng.uniform(1000, 100000, n).round(2),
+        'start_date': dates[rng.integers(0, len(dates), n)],
+        'cdi_percent': rng.choice([90, 100, 102, 105, 110, 115, 120], n),
+    })
+
+
+def loop_value(cdi, principal, start_date, cdi_percent, as_of):
+    """
+    Referência: acumula o rendimento dia a dia, uma posição por vez
+    """
+    value = principal
+    for date, rate in cdi.items():
+        if start_date <= date < as_of:
+            value *= 1 + cdi_percent / 100 * rate / 100
+    days = (as_of - start_date).days
+    ir = max(value - principal, 0) * ir_rate(days)
+    return value - ir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--positions', type=int, default=10_000)
+    parser.add_argument('--sample', type=int, default=200)
+    args = parser.parse_args()
+
+    cdi = synthetic_cdi()
+    as_of = pd.Timestamp('2025-12-01')
+    positions = synthetic_positions(args.positions, cdi, as_of)
+
+    accrual = CDIAccrual(cdi)
+    start = time.perf_counter()
+    result = accrual.value(positions['principal'], positions['start_date'], positions['cdi_percent'], as_of=as_of)
+    batch_time = time.perf_counter() - start
+
+    sample = positions.iloc[:args.sample]
+    start = time.perf_counter()
+    expected = np.array([loop_value(cdi, row.principal, row.start_date, row.cdi_percent, as_of)
+                         for row in sample.itertuples()])
+    loop_time = (time.perf_counter() - start) / len(sample) * len(positions)
+
+    mismatches = int((~np.isclose(result['net'][:len(sample)], expected, rtol=1e-10)).sum())
+    print(f"Posições: {len(positions)}  Dias úteis na série: {len(cdi)}")
+    print(f"Avaliação em lote:        {batch_time * 1000:8.1f} ms")
+    print(f"Laço por posição (estim.): {loop_time * 1000:8.1f} ms")
+    print(f"{mismatches} divergências em {len(sample)} posições conferidas")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
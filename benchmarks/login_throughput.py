@@ -0,0 +1,64 @@
+"""
+Mede a vazão de logins (verificação bcrypt) com 1, 8 e 32 logins simultâneos
+
+Compara a verificação direta na thread da sessão com o pool de processos de
+password_hasher. As threads simulam sessões Streamlit no mesmo processo.
+
+Uso: python -m benchmarks.login_throughput [--rounds 12] [--logins 64]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import password_hasher
+
+CONCURRENCY = (1, 8, 32)
+PASSWORD = 'Senha@Forte123'
+
+
+def inline_verify(hashed):
+    return bcrypt.checkpw(PASSWORD.encode('utf-8'), hashed)
+
+
+def pooled_verify(hashed):
+    return password_hasher.verify_password(PASSWORD, hashed, timeout=120)
+
+
+def measure(verify, hashed, concurrency, logins):
+    """
+    Executa logins verificações com concurrency sessões simultâneas
+
+    Returns:
+        float: Logins por segundo
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as sessions:
+        start = time.perf_counter()
+        results = list(sessions.map(lambda _: verify(hashed), range(logins)))
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=password_hasher.DEFAULT_ROUNDS)
+    parser.add_argument('--logins', type=int, default=64)
+    args = parser.parse_args()
+
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=args.rounds))
+    # Aquece o pool para não medir a criação dos processos
+    pooled_verify(hashed)
+
+    print(f"bcrypt rounds={args.rounds}, {args.logins} logins por medição, "
+          f"{password_hasher.get_executor()._max_workers} processos no pool")
+    print(f"{'simultâneos':>12} {'direto (login/s)':>18} {'pool (login/s)':>16}")
+    for concurrency in CONCURRENCY:
+        inline = measure(inline_verify, hashed, concurrency, args.logins)
+        pooled = measure(pooled_verify, hashed, concurrency, args.logins)
+        print(f"{concurrency:>12} {inline:>18.1f} {pooled:>16.1f}")
+
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Confere a paridade do kernel vetorizado de métricas com o cálculo pandas anterior
+
+Compara usuário a usuário (via summary_to_matrix) e em lote (via
+rollups_to_tensor), e mede o tempo de cada abordagem.
+
+Uso: python -m benchmarks.metrics_parity [--rows 200000] [--users 500]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from financial_metrics import compute_metrics, rollups_to_tensor, summary_to_matrix
+from benchmarks.synthetic import generate_transactions
+
+
+def legacy_metrics(monthly_summary):
+    """
+    Reproduz FinancialAdvisor.analyze_financial_health antes do kernel vetorizado
+    """
+    return {
+        'total_revenue': monthly_summary.get('Receita', pd.Series(0)).sum(),
+        'total_expenses': monthly_summary.get('Despesa', pd.Series(0)).sum(),
+        'total_investments': monthly_summary.get('Investimento', pd.Series(0)).sum(),
+        'net_cashflow': monthly_summary.get('Receita', pd.Series(0)).sum() -
+                        monthly_summary.get('Despesa', pd.Series(0)).sum(),
+        'average_monthly_revenue': monthly_summary.get('Receita', pd.Series(0)).mean(),
+        'average_monthly_expenses': monthly_summary.get('Despesa', pd.Series(0)).mean(),
+        'investment_ratio': monthly_summary.get('Investimento', pd.Series(0)).sum() /
+                            max(monthly_summary.get('Receita', pd.Series(0)).sum(), 1) * 100,
+        'expense_to_income_ratio': monthly_summary.get('Despesa', pd.Series(0)).sum() /
+                                   max(monthly_summary.get('Receita', pd.Series(0)).sum(), 1) * 100,
+        'revenue_volatility': monthly_summary.get('Receita', pd.Series(0)).std() /
+                              max(monthly_summary.get('Receita', pd.Series(0)).mean(), 1) * 100
+    }
+
+
+def _close(expected, got):
+    if pd.isna(expected) and np.isnan(got):
+        return True
+    return bool(np.isclose(expected, got, rtol=1e-9, atol=1e-6))
+
+
+def run(rows, users, year=2024):
+    documents = generate_transactions(rows, n_users=users, years=(year,))
+    frame = pd.DataFrame(documents, columns=['user_id', 'month', 'type', 'value', 'paid'])
+
+    start = time.perf_counter()
+    summaries = {
+        user_id: group.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
+        for user_id, group in frame.groupby('user_id')
+    }
+    legacy = {user_id: legacy_metrics(summary) for user_id, summary in summaries.items()}
+    legacy_time = time.perf_counter() - start
+
+    mismatches = []
+    for user_id, summary in summaries.items():
+        metrics = compute_metrics(*summary_to_matrix(summary))
+        for name, expected in legacy[user_id].items():
+            if not _close(expected, metrics[name]):
+                mismatches.append((user_id, name, expected, metrics[name]))
+
+    # Lote: os mesmos dados no formato de monthly_rollups
+    rollups = (frame.groupby(['user_id', 'month', 'type'])['value']
+               .agg(['sum', 'count']).reset_index().to_dict('records'))
+    start = time.perf_counter()
+    user_ids, tensor, present = rollups_to_tensor(rollups)
+    batch = compute_metrics(tensor, present)
+    batch_time = time.perf_counter() - start
+
+    for index, user_id in enumerate(user_ids):
+        for name, expected in legacy[user_id].items():
+            if not _close(expected, batch[name][index]):
+                mismatches.append((user_id, f'{name} (lote)', expected, batch[name][index]))
+
+    return {
+        'rows': rows,
+        'users': len(user_ids),
+        'legacy_s': legacy_time,
+        'batch_s': batch_time,
+        'mismatches': mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+    result = run(args.rows, args.users)
+
+    print(f"Linhas: {result['rows']}  Usuários: {result['users']}")
+    print(f"pandas (por usuário): {result['legacy_s']:.3f}s")
+    print(f"Kernel em lote:       {result['batch_s']:.3f}s")
+    for user_id, name, expected, got in result['mismatches'][:20]:
+        print(f"Divergência {user_id} {name}: esperado {expected}, obtido {got}")
+    print(f"{len(result['mismatches'])} divergências")
+    return 1 if result['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Mede a avaliação diária de uma carteira a partir das séries mapeadas em memória
+
+Grava um histórico sintético (por padrão 10 anos × 50 tickers) em um
+diretório temporário e compara a leitura pelos memmaps com o cálculo
+equivalente em pandas, conferindo a paridade.
+
+Uso: python -m benchmarks.portfolio_history [--years 10] [--tickers 50]
+"""
+import argparse
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from price_history import PriceHistoryStore, portfolio_value
+
+
+def synthetic_closes(years, n_tickers, seed=42):
+    dates = pd.bdate_range(end=pd.Timestamp('2026-01-02'), periods=252 * years)
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.015, (len(dates), n_tickers))
+    tickers = [f'ATIVO{i:02d}.SA' for i in range(n_tickers)]
+    return pd.DataFrame(20 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=tickers)
+
+
+def synthetic_holdings(closes, seed=42):
+    rng = np.random.default_rng(seed)
+    n = len(closes.columns) * 3
+    return pd.DataFrame({
+        'ticker': rng.choice(closes.columns, n),
+        'quantity': rng.integers(1, 500, n).astype(float),
+        'purchase_date': closes.index[rng.integers(0, len(closes.index), n)],
+    })
+
+
+def pandas_value(closes, holdings):
+    """
+    Referência: matriz de quantidades montada em pandas e multiplicada pelo DataFrame de preços
+    """
+    quantities = pd.DataFrame(0.0, index=closes.index, columns=closes.columns)
+    for row in holdings.itertuples():
+        quantities.loc[quantities.index >= row.purchase_date, row.ticker] += row.quantity
+    return (closes * quantities).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--tickers', type=int, default=50)
+    args = parser.parse_args()
+
+    closes = synthetic_closes(args.years, args.tickers)
+    holdings = synthetic_holdings(closes)
+    tickers = sorted(holdings['ticker'].unique())
+
+    with tempfile.TemporaryDirectory() as root:
+        PriceHistoryStore(root).update(closes)
+
+        # Nova instância: mede a abertura dos memmaps, como em um processo recém-iniciado
+        start = time.perf_counter()
+        store = PriceHistoryStore(root)
+        dates, prices = store.matrix(tickers)
+        value = portfolio_value(dates, prices, tickers, holdings)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dates, prices = store.matrix(tickers)
+        portfolio_value(dates, prices, tickers, holdings)
+        warm = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = pandas_value(closes, holdings)
+    reference = time.perf_counter() - start
+
+    ok = np.allclose(value.to_numpy(), expected.to_numpy())
+    print(f"{len(closes)} pregões × {len(closes.columns)} tickers, {len(holdings)} posições")
+    print(f"memmap (abertura):  {cold * 1000:8.1f} ms")
+    print(f"memmap (em cache):  {warm * 1000:8.1f} ms")
+    print(f"pandas (referência): {reference * 1000:8.1f} ms")
+    print("Paridade: ok" if ok else "Paridade: DIVERGENTE")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Mede o tempo de importação de app.py com python -X importtime e verifica o orçamento
+
+Falha (código 1) se o import exceder o orçamento ou se algum módulo que deveria
+ser carregado sob demanda (por página) for importado na inicialização.
+
+Uso: python -m benchmarks.startup [--budget-ms 1500] [--runs 3] [--top 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = 1500
+
+# Módulos que só devem ser carregados pelas páginas que os usam
+LAZY_MODULES = [
+    'google.generativeai',
+    'yfinance',
+    'dotenv',
+    'plotly.express',
+    'financial_advisor',
+    'purchase_intelligence_interface',
+    'transaction_diff',
+]
+
+
+def import_profile(module='app'):
+    """
+    Executa o import em um processo novo e retorna a subárvore de imports do módulo
+
+    Returns:
+        dict: {módulo: (self_us, cumulative_us, profundidade)}, na ordem do importtime
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    # Os filhos aparecem antes do pai; a subárvore vai até a entrada de nível 0 anterior
+    end = next(i for i, entry in enumerate(entries) if entry[0] == module and entry[3] == 0)
+    start = end
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    return {name: (self_us, cumulative_us, depth) for name, self_us, cumulative_us, depth in entries[start:end + 1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    total_ms = statistics.median(p['app'][1] for p in profiles) / 1000
+    profile = profiles[-1]
+
+    print(f"import app: {total_ms:.0f} ms (mediana de {args.runs}, orçamento {args.budget_ms:.0f} ms)")
+    print(f"Dependências diretas mais lentas:")
+    direct = [(name, cumulative) for name, (_, cumulative, depth) in profile.items() if depth == 1]
+    for name, cumulative in sorted(direct, key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import de app.py acima do orçamento ({total_ms:.0f} ms > {args.budget_ms:.0f} ms)")
+    for module in LAZY_MODULES:
+        if module in profile:
+            failures.append(f"{module} é importado na inicialização")
+
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
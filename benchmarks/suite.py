@@ -0,0 +1,184 @@
+"""
+Suíte de benchmarks da camada de dados e das análises, com saída em JSON
+
+Popula um banco com usuários e transações sintéticas (gerador com semente)
+e mede os caminhos mais usados pela interface. Por padrão usa o mongomock
+em memória; com --mongo-uri roda contra um mongod local, em um banco
+descartável.
+
+Uso: python -m benchmarks.suite [--rows 1000 100000] [--users 10] [--repeat 5]
+         [--mongo-uri mongodb://localhost:27017] [--output resultado.json]
+         [--compare anterior.json]
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from benchmarks.synthetic import populate
+
+YEAR = 2024
+
+
+def timed(function, repeat, setup=None):
+    """
+    Executa function repeat vezes (chamando setup antes de cada uma, fora da medição)
+
+    Uma execução de aquecimento, não medida, absorve imports tardios e caches de primeira chamada.
+
+    Returns:
+        dict: Mediana, mínimo e máximo em segundos
+    """
+    if setup is not None:
+        setup()
+    function()
+
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return {
+        'median_s': statistics.median(samples),
+        'min_s': min(samples),
+        'max_s': max(samples),
+        'runs': repeat,
+    }
+
+
+def open_database(mongo_uri, rows):
+    """
+    Retorna um banco vazio: no mongod informado ou em memória (mongomock)
+    """
+    name = f'benchmark_{rows}_{int(time.time())}'
+    if mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(mongo_uri)
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock não está instalado; instale-o ou informe --mongo-uri")
+        client = mongomock.MongoClient()
+    return client, client[name]
+
+
+def run_size(rows, users, repeat, mongo_uri):
+    """
+    Popula um banco com rows transações e mede cada operação para o usuário mais ativo
+    """
+    from financial_advisor import FinancialAdvisor
+    from financial_tracker import FinancialTracker
+    from transaction_cache import transaction_cache
+    from purchase_scenarios import feasible_frontier, scenario_grid
+
+    client, db = open_database(mongo_uri, rows)
+    try:
+        start = time.perf_counter()
+        user_ids = populate(db, rows, users, years=(YEAR - 1, YEAR))
+        populate_time = time.perf_counter() - start
+
+        counts = {user_id: db['transactions'].count_documents({'user_id': user_id}) for user_id in user_ids}
+        user_id = max(counts, key=counts.get)
+        tracker = FinancialTracker(user_id=user_id, db=db)
+
+        def cold():
+            transaction_cache.invalidate(user_id)
+
+        frame = tracker.get_transactions(YEAR)
+        summary = tracker.monthly_summary(YEAR)
+
+        def purchase_math():
+            grid = scenario_grid(5000.0, method='SAC')
+            feasible_frontier(grid, 800.0, 1000.0)
+
+        results = {
+            'get_transactions': timed(lambda: tracker.get_transactions(YEAR), repeat, cold),
+            'get_transactions (cache)': timed(lambda: tracker.get_transactions(YEAR), repeat),
+            'get_transactions_for_display': timed(lambda: tracker.get_transactions_for_display(YEAR), repeat, cold),
+            'financial_analysis (rollups)': timed(lambda: tracker.financial_analysis(year=YEAR), repeat),
+            'financial_analysis (DataFrame)': timed(lambda: tracker.financial_analysis(frame), repeat),
+            'analyze_financial_health': timed(
+                lambda: FinancialAdvisor(monthly_summary=summary).analyze_financial_health(), repeat),
+            'purchase_scenarios': timed(purchase_math, repeat),
+            'get_transactions (ano anterior)': timed(lambda: tracker.get_transactions(YEAR - 1), repeat, cold),
+        }
+        # Mesmo ano depois de compactado em um documento colunar
+        tracker.archive_year(YEAR - 1)
+        results['get_transactions (ano arquivado)'] = timed(lambda: tracker.get_transactions(YEAR - 1), repeat, cold)
+        return {
+            'rows': rows,
+            'users': users,
+            'user_rows': counts[user_id],
+            'populate_s': populate_time,
+            'results': results,
+        }
+    finally:
+        client.drop_database(db.name)
+        transaction_cache.clear()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """
+    Imprime a razão entre as medianas atuais e as de uma execução anterior
+    """
+    previous = {(size['rows'], name): result['median_s']
+                for size in baseline['sizes'] for name, result in size['results'].items()}
+    print(f"Comparação com {baseline.get('revision')} ({baseline.get('timestamp')}):", file=sys.stderr)
+    for size in current['sizes']:
+        for name, result in size['results'].items():
+            before = previous.get((size['rows'], name))
+            if before:
+                print(f"  {size['rows']:>8} {name:<32} {result['median_s'] / before:6.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mongo-uri', help='mongod local; por padrão usa o mongomock em memória')
+    parser.add_argument('--output', help='arquivo JSON de saída; por padrão, a saída padrão')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar as medianas')
+    args = parser.parse_args()
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': 'mongod' if args.mongo_uri else 'mongomock',
+        'sizes': [],
+    }
+    for rows in args.rows:
+        print(f"Medindo {rows} linhas...", file=sys.stderr)
+        report['sizes'].append(run_size(rows, args.users, args.repeat, args.mongo_uri))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Gerador determinístico de transações sintéticas para benchmarks
+"""
+from datetime import datetime
+import numpy as np
+from bson.objectid import ObjectId
+from financial_tracker import CATEGORIAS, MESES, TIPOS
+
+OBSERVACOES = ['', '', '', 'Pagamento adiantado', 'Despesa extra', 'Bônus especial',
+               'Parcela referente ao financiamento do apartamento no centro da cidade']
+
+
+def synthetic_user_ids(n_users, seed=42):
+    """
+    IDs (str) determinísticos dos usuários sintéticos
+    """
+    raw = np.random.default_rng([seed, 1]).bytes(12 * n_users)
+    return [str(ObjectId(raw[12 * i:12 * (i + 1)])) for i in range(n_users)]
+
+
+def generate_users(n_users, seed=42):
+    """
+    Gera documentos da coleção users para os IDs de synthetic_user_ids
+    """
+    return [{
+        '_id': ObjectId(user_id),
+        'name': f'Usuário {index}',
+        'email': f'usuario{index}@example.com',
+        'password': b'',
+        'created_at': datetime(2024, 1, 1),
+    } for index, user_id in enumerate(synthetic_user_ids(n_users, seed))]
+
+
+def populate(db, n_rows, n_users=1, years=(2023, 2024), seed=42, batch_size=50_000):
+    """
+    Grava usuários e transações sintéticas no banco e prepara índices e rollups
+
+    Returns:
+        list[str]: IDs dos usuários
+    """
+    from db_indexes import ensure_indexes
+    from monthly_rollups import rebuild_rollups
+
+    db['users'].insert_many(generate_users(n_users, seed))
+    documents = generate_transactions(n_rows, n_users, years, seed)
+    for start in range(0, len(documents), batch_size):
+        db['transactions'].insert_many(documents[start:start + batch_size], ordered=False)
+    ensure_indexes(db)
+    rebuild_rollups(db)
+    return synthetic_user_ids(n_users, seed)
+
+
+def generate_transactions(n_rows, n_users=1, years=(2023, 2024), seed=42):
+    """
+    Gera documentos no mesmo formato de FinancialTracker._build_transaction
+
+    Args:
+        n_rows (int): Quantidade total de transações
+        n_users (int): Quantidade de usuários entre os quais as linhas são distribuídas
+        years (tuple[int]): Anos possíveis
+        seed (int): Semente do gerador
+
+    Returns:
+        list[dict]: Documentos de transação
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = synthetic_user_ids(n_users, seed)
+    object_ids = rng.bytes(12 * n_rows)
+    types = rng.choice(TIPOS, size=n_rows, p=[0.2, 0.7, 0.1])
+    months = rng.integers(0, 12, size=n_rows)
+    year_values = rng.choice(years, size=n_rows)
+    users = rng.integers(0, n_users, size=n_rows)
+    paid = rng.random(n_rows) < 0.6
+    observations = rng.integers(0, len(OBSERVACOES), size=n_rows)
+    scale = {'Receita': 4000.0, 'Despesa': 300.0, 'Investimento': 800.0}
+
+    documents = []
+    for i in range(n_rows):
+        type_ = str(types[i])
+        categories = CATEGORIAS[type_]
+        documents.append({
+            '_id': ObjectId(object_ids[12 * i:12 * (i + 1)]),
+            'month': MESES[months[i]],
+            'month_num': int(months[i]) + 1,
+            'year': int(year_values[i]),
+            'category': categories[int(rng.integers(0, len(categories)))],
+            'type': type_,
+            'value': round(float(rng.gamma(2.0, scale[type_] / 2)), 2),
+            'observation': OBSERVACOES[observations[i]],
+            'created_at': datetime(2024, 1, 1),
+            'paid': bool(paid[i]),
+            'payment_date': datetime(2024, 1, 15) if paid[i] else None,
+            'user_id': user_ids[users[i]],
+        })
+    return documents
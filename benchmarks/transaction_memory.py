@@ -0,0 +1,65 @@
+"""
+Compara a memória do DataFrame de transações atual com o do carregador tipado
+
+Uso: python -m benchmarks.transaction_memory [--rows 100000]
+"""
+import argparse
+import time
+import pandas as pd
+from financial_tracker import DISPLAY_COLUMNS, build_transactions_frame
+from benchmarks.synthetic import generate_transactions
+
+
+def legacy_frame(documents):
+    """
+    Reproduz o DataFrame montado por get_transactions (documentos completos, dtype object)
+    """
+    df = pd.DataFrame(documents)
+    df['_id'] = df['_id'].astype(str)
+    return df
+
+
+def project(documents, columns):
+    """
+    Simula a projeção do MongoDB, mantendo apenas as colunas pedidas
+    """
+    return [{col: doc[col] for col in columns if col in doc} for doc in documents]
+
+
+def run(rows):
+    documents = generate_transactions(rows)
+
+    start = time.perf_counter()
+    legacy = legacy_frame(documents)
+    legacy_time = time.perf_counter() - start
+
+    projected = project(documents, DISPLAY_COLUMNS)
+    start = time.perf_counter()
+    typed = build_transactions_frame(projected, DISPLAY_COLUMNS)
+    typed_time = time.perf_counter() - start
+
+    legacy_bytes = legacy.memory_usage(deep=True).sum()
+    typed_bytes = typed.memory_usage(deep=True).sum()
+    return {
+        'rows': rows,
+        'legacy_mb': legacy_bytes / 2 ** 20,
+        'typed_mb': typed_bytes / 2 ** 20,
+        'ratio': legacy_bytes / typed_bytes,
+        'legacy_build_s': legacy_time,
+        'typed_build_s': typed_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    result = run(parser.parse_args().rows)
+
+    print(f"Linhas: {result['rows']}")
+    print(f"DataFrame atual:  {result['legacy_mb']:8.2f} MB ({result['legacy_build_s']:.3f}s)")
+    print(f"Carregador tipado: {result['typed_mb']:8.2f} MB ({result['typed_build_s']:.3f}s)")
+    print(f"Redução: {result['ratio']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+import bson
+from pymongo import monitoring
+from instrumentation import current_metrics
+
+DEFAULT_SLOW_QUERY_MS = 100
+
+# Comandos cujo valor na própria chave é o nome da coleção
+_COLLECTION_COMMANDS = {
+    'find', 'aggregate', 'count', 'distinct', 'insert', 'update', 'delete',
+    'findAndModify', 'createIndexes', 'listIndexes', 'dropIndexes',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def redact(value):
+    """
+    Forma do filtro sem os valores: chaves e operadores são mantidos, valores viram '?'
+
+    Listas de valores (ex.: $in) viram ['?'] independentemente do tamanho, para
+    que consultas iguais com parâmetros diferentes tenham a mesma forma.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = redact(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return '?'
+
+
+def _collection(command_name, command):
+    if command_name == 'getMore':
+        return command.get('collection')
+    if command_name in _COLLECTION_COMMANDS:
+        return command.get(command_name)
+    return None
+
+
+def _filter(command_name, command):
+    """
+    Filtro do comando, onde quer que o protocolo o coloque
+    """
+    if command_name == 'find':
+        return command.get('filter', {})
+    if command_name in ('count', 'distinct', 'findAndModify'):
+        return command.get('query', {})
+    if command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        return statements[0].get('q', {})
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or [{}]
+        return pipeline[0].get('$match', {})
+    return None
+
+
+def filter_shape(command_name, command):
+    """
+    Forma redigida do filtro como texto (None para comandos sem filtro)
+    """
+    query = _filter(command_name, command)
+    if query is None:
+        return None
+    return json.dumps(redact(query), sort_keys=True, default=str)
+
+
+def _documents_returned(command_name, reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return int(reply.get('value') is not None)
+    return 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Listener de comandos do pymongo com estatísticas agregadas e log de consultas lentas
+
+    Para cada comando registra nome, coleção, duração, documentos devolvidos e
+    bytes da resposta, agregados por (comando, coleção, forma do filtro). Medir
+    os bytes exige serializar a resposta de novo, então só é feito para
+    consultas lentas, ou para todas com measure_bytes; respostas não medidas
+    ficam fora da soma de bytes (None se nenhuma foi medida). Os
+    eventos são publicados na thread que executa a operação, então cada comando
+    também entra como span no rerun em andamento (ver instrumentation).
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, measure_bytes=False):
+        self.slow_query_ms = slow_query_ms
+        self.measure_bytes = measure_bytes
+        self._pending = {}  # (conexão, request_id) -> (comando, coleção, forma)
+        self._stats = {}    # (comando, coleção, forma) -> [chamadas, ms total, maior ms, documentos, bytes medidos, falhas]
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        command_name = event.command_name
+        key = (event.connection_id, event.request_id)
+        self._pending[key] = (command_name, _collection(command_name, event.command),
+                              filter_shape(command_name, event.command))
+
+    def succeeded(self, event):
+        documents = _documents_returned(event.command_name, event.reply)
+        size = None
+        if self.measure_bytes or self._is_slow(event.duration_micros / 1000):
+            size = len(bson.encode(event.reply))
+        self._record(event, documents, size, failed=False)
+
+    def failed(self, event):
+        self._record(event, 0, None, failed=True)
+
+    def _is_slow(self, elapsed_ms):
+        return self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms
+
+    def _record(self, event, documents, size, failed):
+        info = self._pending.pop((event.connection_id, event.request_id), None)
+        if info is None:
+            return
+        command_name, collection, shape = info
+        elapsed_ms = event.duration_micros / 1000
+
+        with self._lock:
+            entry = self._stats.setdefault(info, [0, 0.0, 0.0, 0, None, 0])
+            entry[0] += 1
+            entry[1] += elapsed_ms
+            entry[2] = max(entry[2], elapsed_ms)
+            entry[3] += documents
+            if size is not None:
+                entry[4] = (entry[4] or 0) + size
+            entry[5] += failed
+
+        metrics = current_metrics()
+        if metrics is not None and collection is not None:
+            metrics.add(f"mongo.{command_name} {collection} {shape or ''}".rstrip(), elapsed_ms / 1000)
+
+        if failed:
+            logger.warning("Comando falhou: %s %s (%.1f ms) filtro=%s: %s",
+                           command_name, collection, elapsed_ms, shape, event.failure)
+        elif self._is_slow(elapsed_ms):
+            logger.warning("Consulta lenta: %s %s %.1f ms, %d documentos, %d bytes, filtro=%s",
+                           command_name, collection, elapsed_ms, documents, size, shape)
+
+    def stats(self):
+        """
+        Estatísticas acumuladas, ordenadas pelo tempo total
+
+        Returns:
+            list[dict]: Uma linha por (comando, coleção, forma do filtro)
+        """
+        with self._lock:
+            items = list(self._stats.items())
+        rows = [{
+            'command': command_name, 'collection': collection, 'filter': shape,
+            'calls': calls, 'total_ms': total, 'max_ms': longest,
+            'documents': documents, 'bytes': size, 'failures': failures,
+        } for (command_name, collection, shape), (calls, total, longest, documents, size, failures) in items]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+command_monitor = CommandMonitor()
@@ -0,0 +1,176 @@
+import threading
+import time
+import streamlit as st
+from pymongo import MongoClient
+from command_monitor import command_monitor
+
+# Configurações padrão do pool (podem ser sobrescritas em st.secrets)
+DEFAULT_POOL_SETTINGS = {
+    'maxPoolSize': 50,
+    'minPoolSize': 0,
+    'maxIdleTimeMS': 300000,
+    'connectTimeoutMS': 5000,
+    'serverSelectionTimeoutMS': 5000,
+    'socketTimeoutMS': 20000,
+}
+
+# Mapeia as chaves opcionais em st.secrets para as opções do MongoClient
+_SECRET_KEYS = {
+    'mongo_max_pool_size': 'maxPoolSize',
+    'mongo_min_pool_size': 'minPoolSize',
+    'mongo_max_idle_time_ms': 'maxIdleTimeMS',
+    'mongo_connect_timeout_ms': 'connectTimeoutMS',
+    'mongo_server_selection_timeout_ms': 'serverSelectionTimeoutMS',
+    'mongo_socket_timeout_ms': 'socketTimeoutMS',
+}
+
+HEALTH_CHECK_TTL = 30          # segundos entre pings quando a conexão está saudável
+HEALTH_CHECK_BACKOFF_BASE = 1  # primeiro intervalo de espera após uma falha
+HEALTH_CHECK_BACKOFF_MAX = 60  # intervalo máximo de espera entre tentativas
+
+_clients = {}
+_clients_lock = threading.Lock()
+_health = {'ok': None, 'checked_at': 0.0, 'failures': 0, 'error': None, 'checking': False}
+_health_lock = threading.Lock()
+
+
+def _secret(key, default=None):
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
+
+def _pool_settings():
+    """
+    Monta as opções do pool a partir dos padrões e de st.secrets
+    """
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    for secret_key, option in _SECRET_KEYS.items():
+        value = _secret(secret_key)
+        if value is not None:
+            settings[option] = int(value)
+    return settings
+
+
+def _event_listeners():
+    """
+    Listeners de comandos do cliente: o monitor compartilhado, salvo se desativado em st.secrets
+
+    O limite do log de consultas lentas vem de st.secrets["slow_query_ms"];
+    st.secrets["mongo_reply_bytes"] mede os bytes de todas as respostas, não só das lentas.
+    """
+    if not _secret('mongo_command_monitoring', True):
+        return []
+    slow_query_ms = _secret('slow_query_ms')
+    if slow_query_ms is not None:
+        command_monitor.slow_query_ms = float(slow_query_ms)
+    command_monitor.measure_bytes = bool(_secret('mongo_reply_bytes', False))
+    return [command_monitor]
+
+
+def get_client(mongo_uri=None) -> MongoClient:
+    """
+    Retorna o MongoClient compartilhado pelo processo para a URI informada
+
+    O cliente é criado uma única vez e reutilizado por todas as sessões e
+    reruns do Streamlit, evitando novos pools, handshakes TLS e threads de
+    monitoramento a cada interação.
+
+    Os comandos do cliente são acompanhados por command_monitor (duração,
+    documentos, bytes e log de consultas lentas).
+
+    Args:
+        mongo_uri (str, optional): Connection string; usa st.secrets["mongo_uri"] se omitida
+
+    Returns:
+        MongoClient: Cliente com pool de conexões compartilhado
+    """
+    if mongo_uri is None:
+        mongo_uri = st.secrets["mongo_uri"]
+
+    client = _clients.get(mongo_uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(mongo_uri)
+        if client is None:
+            client = MongoClient(mongo_uri, event_listeners=_event_listeners(), **_pool_settings())
+            _clients[mongo_uri] = client
+    return client
+
+
+def get_database(mongo_uri=None, name='financial_tracker'):
+    """
+    Retorna o banco de dados da aplicação usando o cliente compartilhado
+    """
+    return get_client(mongo_uri)[name]
+
+
+def supports_transactions(client) -> bool:
+    """
+    Indica se o deployment aceita transações multi-documento (replica set ou cluster shardado)
+
+    A topologia só é conhecida depois da primeira operação do cliente; até lá
+    (ou em clientes que não a expõem) devolve False.
+    """
+    try:
+        return client.topology_description.topology_type_name in ('ReplicaSetWithPrimary', 'Sharded')
+    except Exception:
+        return False
+
+
+def check_connection(mongo_uri=None):
+    """
+    Verifica a conexão com o MongoDB com cache e backoff exponencial
+
+    Enquanto a conexão está saudável, o ping só é repetido a cada
+    HEALTH_CHECK_TTL segundos. Após falhas, novas tentativas esperam um
+    intervalo que dobra a cada erro, até HEALTH_CHECK_BACKOFF_MAX.
+
+    O ping roda fora do lock; enquanto um está em andamento, as demais
+    chamadas devolvem o último estado conhecido em vez de pingar também.
+
+    Returns:
+        tuple[bool, str | None]: (conexão ok, mensagem do último erro)
+    """
+    now = time.monotonic()
+    with _health_lock:
+        elapsed = now - _health['checked_at']
+        if _health['ok'] is True and elapsed < HEALTH_CHECK_TTL:
+            return True, None
+        if _health['ok'] is False:
+            backoff = min(HEALTH_CHECK_BACKOFF_BASE * 2 ** (_health['failures'] - 1),
+                          HEALTH_CHECK_BACKOFF_MAX)
+            if elapsed < backoff:
+                return False, _health['error']
+        if _health['checking'] and _health['ok'] is not None:
+            return _health['ok'], _health['error']
+        _health['checking'] = True
+
+    try:
+        get_client(mongo_uri).admin.command('ping')
+        error = None
+    except Exception as e:
+        error = str(e)
+
+    with _health_lock:
+        if error is None:
+            _health.update(ok=True, checked_at=time.monotonic(), failures=0, error=None, checking=False)
+        else:
+            _health.update(ok=False, checked_at=time.monotonic(),
+                           failures=_health['failures'] + 1, error=error, checking=False)
+        return _health['ok'], _health['error']
+
+
+def close_clients():
+    """
+    Fecha todos os clientes compartilhados (útil em testes e scripts)
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+    with _health_lock:
+        _health.update(ok=None, checked_at=0.0, failures=0, error=None, checking=False)
@@ -0,0 +1,206 @@
+import sys
+import threading
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from db_connection import get_database
+from financial_tracker import MESES, PAGE_PROJECTION, PAGE_SORT, page_query
+
+# Índices declarados por coleção. Os nomes fixos tornam ensure_indexes idempotente.
+INDEXES = {
+    'transactions': [
+        # Consultas por usuário/ano/mês; o _id no final cobre as listagens de IDs
+        IndexModel([('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING), ('_id', ASCENDING)],
+                   name='user_year_month_id'),
+        # Ordenação cronológica e cursor da paginação por chave
+        IndexModel([('user_id', ASCENDING), ('year', ASCENDING), ('month_num', ASCENDING), ('_id', ASCENDING)],
+                   name='user_year_month_num_id'),
+    ],
+    'monthly_rollups': [
+        IndexModel([('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING), ('type', ASCENDING)],
+                   name='user_year_month_type_unique', unique=True),
+    ],
+    'investments': [
+        # Carteira do usuário; o ticker no índice cobre a lista de tickers do serviço de cotações
+        IndexModel([('user_id', ASCENDING), ('ticker', ASCENDING)], name='user_ticker'),
+        IndexModel([('ticker', ASCENDING)], name='ticker'),
+    ],
+    'recurrences': [
+        # Regras do usuário que têm ocorrências no ano pedido
+        IndexModel([('user_id', ASCENDING), ('start_year', ASCENDING), ('end_year', ASCENDING)],
+                   name='user_start_end_year'),
+    ],
+    'transaction_buckets': [
+        IndexModel([('user_id', ASCENDING), ('year', ASCENDING)], name='user_year_unique', unique=True),
+    ],
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    ],
+}
+
+_ensured = False
+_ensured_lock = threading.Lock()
+
+
+def backfill_month_num(db):
+    """
+    Preenche month_num (1-12) nas transações antigas que só têm o nome do mês
+
+    Returns:
+        int: Quantidade de documentos atualizados
+    """
+    result = db['transactions'].update_many(
+        {'month_num': {'$exists': False}, 'month': {'$in': MESES}},
+        [{'$set': {'month_num': {'$add': [{'$indexOfArray': [MESES, '$month']}, 1]}}}]
+    )
+    return result.modified_count
+
+
+def ensure_indexes(db=None):
+    """
+    Cria os índices declarados em INDEXES, caso ainda não existam
+
+    Args:
+        db: Banco de dados; usa o banco compartilhado se omitido
+
+    Returns:
+        dict: {coleção: [nomes dos índices] ou mensagem de erro}
+    """
+    if db is None:
+        db = get_database()
+
+    # Campo exigido pelo índice de paginação
+    backfill_month_num(db)
+
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            report[collection_name] = db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Ex.: emails duplicados impedem a criação do índice único
+            report[collection_name] = f"Erro ao criar índices: {e}"
+    return report
+
+
+def ensure_indexes_once(db=None):
+    """
+    Executa ensure_indexes uma única vez por processo (chamado na inicialização do app)
+    """
+    global _ensured
+    if _ensured:
+        return
+    with _ensured_lock:
+        if not _ensured:
+            ensure_indexes(db)
+            _ensured = True
+
+
+def _find(collection_name, query, projection=None, sort=None, limit=None):
+    command = {'find': collection_name, 'filter': query}
+    if projection is not None:
+        command['projection'] = projection
+    if sort is not None:
+        command['sort'] = dict(sort)
+    if limit is not None:
+        command['limit'] = limit
+    return command
+
+
+def app_queries(user_id='000000000000000000000000', year=2024):
+    """
+    Lista os comandos emitidos pela aplicação, com valores de exemplo
+
+    A paginação usa page_query, PAGE_SORT e PAGE_PROJECTION, os mesmos de
+    get_transactions_page; held_tickers é o distinct de price_service.
+
+    Returns:
+        list[tuple[str, str, dict]]: (descrição, coleção, comando)
+    """
+    object_id = ObjectId()
+    cursor = (year, 3, str(object_id))
+    page_limit = 51  # limit padrão de get_transactions_page + 1
+    return [
+        ('get_transactions', 'transactions', _find('transactions', {'user_id': user_id})),
+        ('get_transactions(year)', 'transactions', _find('transactions', {'user_id': user_id, 'year': year})),
+        ('get_transactions_ids', 'transactions', _find('transactions', {'user_id': user_id}, {'_id': 1})),
+        ('get_transactions_ids(year)', 'transactions',
+         _find('transactions', {'user_id': user_id, 'year': year}, {'_id': 1})),
+        ('get_transactions_page', 'transactions',
+         _find('transactions', page_query(user_id, after=cursor), PAGE_PROJECTION, PAGE_SORT, page_limit)),
+        ('get_transactions_page(year)', 'transactions',
+         _find('transactions', page_query(user_id, year=year, after=cursor), PAGE_PROJECTION, PAGE_SORT, page_limit)),
+        ('update/delete por _id', 'transactions', _find('transactions', {'_id': object_id, 'user_id': user_id})),
+        ('recorrências do ano', 'recurrences',
+         _find('recurrences', {'user_id': user_id, 'start_year': {'$lte': year}, 'end_year': {'$gte': year}})),
+        ('ano arquivado', 'transaction_buckets', _find('transaction_buckets', {'user_id': user_id, 'year': year})),
+        ('monthly_summary', 'monthly_rollups',
+         _find('monthly_rollups', {'user_id': user_id, 'year': year, 'count': {'$gt': 0}},
+               {'_id': 0, 'month': 1, 'type': 1, 'sum': 1, 'paid_sum': 1})),
+        ('investment_positions', 'investments', _find('investments', {'user_id': user_id})),
+        ('held_tickers', 'investments', {'distinct': 'investments', 'key': 'ticker', 'query': {}}),
+        ('login_user', 'users', _find('users', {'email': 'usuario@example.com'})),
+        ('get_current_user', 'users', _find('users', {'_id': object_id})),
+    ]
+
+
+def _plan_stages(plan):
+    """
+    Percorre a árvore do plano vencedor retornando os nomes dos estágios
+    """
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_report(db=None, queries=None):
+    """
+    Executa explain em cada comando da aplicação e verifica o uso de índices
+
+    Returns:
+        list[dict]: Uma entrada por consulta com os estágios do plano, se usa
+            índice ('indexed') e se é coberta pelo índice ('covered')
+    """
+    if db is None:
+        db = get_database()
+    if queries is None:
+        queries = app_queries()
+
+    report = []
+    for name, collection_name, command in queries:
+        explain = db.command('explain', command, verbosity='queryPlanner')
+        stages = _plan_stages(explain['queryPlanner']['winningPlan'])
+        report.append({
+            'query': name,
+            'collection': collection_name,
+            'stages': stages,
+            'indexed': 'COLLSCAN' not in stages,
+            'covered': 'COLLSCAN' not in stages and 'FETCH' not in stages,
+        })
+    return report
+
+
+def main():
+    """
+    Garante os índices e falha (código 1) se alguma consulta não usar índice
+
+    Uso: python -m db_indexes
+    """
+    for collection_name, result in ensure_indexes().items():
+        print(f"{collection_name}: {result}")
+
+    failures = 0
+    for entry in explain_report():
+        status = 'OK' if entry['indexed'] else 'SEM ÍNDICE'
+        covered = ' (coberta)' if entry['covered'] else ''
+        print(f"[{status}] {entry['collection']}.{entry['query']}: {' > '.join(entry['stages'])}{covered}")
+        failures += not entry['indexed']
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
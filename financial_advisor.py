@@ -1,56 +1,120 @@
+import threading
 import streamlit as st
 import pandas as pd
-import google.generativeai as genai 
+from ai_cache import DEFAULT_TTL, CachedModel, get_response_cache, stream_with_budget
+from financial_metrics import compute_metrics, summary_to_matrix
+from instrumentation import instrument, span
+
+MODEL_NAME = "gemini-1.5-flash"
+DEFAULT_LATENCY_BUDGET = 8  # segundos
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _response_cache():
+    return get_response_cache(
+        st.secrets.get("ai_cache_path"),
+        int(st.secrets.get("ai_cache_ttl", DEFAULT_TTL))
+    )
+
+
+def _latency_budget():
+    return float(st.secrets.get("ai_latency_budget", DEFAULT_LATENCY_BUDGET))
+
+
+def get_model() -> CachedModel:
+    """
+    Retorna o modelo Gemini compartilhado pelo processo, configurado no primeiro uso
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Import pesado, feito apenas quando o modelo é usado pela primeira vez
+                import google.generativeai as genai
+                genai.configure(api_key=st.secrets["api_key"])
+                _model = CachedModel(genai.GenerativeModel(MODEL_NAME), _response_cache(), MODEL_NAME,
+                                     timeout=_latency_budget())
+    return _model
+
 
 class FinancialAdvisor:
-    def __init__(self, transactions_df: pd.DataFrame):
+    def __init__(self, transactions_df: pd.DataFrame = None, monthly_summary: pd.DataFrame = None,
+                 model=None):
         """
         Inicializa o conselheiro financeiro com dados de transações
         
+        O modelo Gemini só é configurado quando usado pela primeira vez.
+        
         Args:
-            transactions_df (pd.DataFrame): DataFrame com transações financeiras
+            transactions_df (pd.DataFrame, optional): DataFrame com transações financeiras
+            monthly_summary (pd.DataFrame, optional): Matriz mês × tipo já agregada
+                (ex.: FinancialTracker.monthly_summary), dispensa o groupby local
+            model (optional): Modelo generativo a usar no lugar do Gemini (ex.: ai_cache.FakeModel)
+        """
+        self.transactions_df = transactions_df if transactions_df is not None else pd.DataFrame()
+        self.monthly_summary = monthly_summary
+        self.latency_budget = _latency_budget()
+        self._model = CachedModel(model, _response_cache(), timeout=self.latency_budget) if model is not None else None
+        self._model_failed = False
+    
+    @property
+    def model(self):
+        """
+        Modelo compartilhado, inicializado sob demanda (None se a configuração falhar)
         """
-        self.transactions_df = transactions_df
+        if self._model is None and not self._model_failed:
+            try:
+                self._model = get_model()
+            except Exception as e:
+                # Fallback se a configuração falhar
+                st.warning(f"Não foi possível configurar o modelo Gemini: {e}")
+                self._model_failed = True
+        return self._model
+    
+    def stream_advice(self, prompt: str, fallback: str, prefix: str = ''):
+        """
+        Gera a resposta do modelo em stream, dentro do orçamento de latência
+        
+        Args:
+            prompt (str): Prompt enviado ao modelo
+            fallback (str): Texto baseado em regras usado se o modelo falhar ou demorar
+            prefix (str): Emitido antes da resposta do modelo, mas não antes do fallback
         
-        # Inicializa gerador de texto com Gemini 1.5 Flash
-        try:
-            genai.configure(api_key=st.secrets["api_key"])
-            self.model = genai.GenerativeModel("gemini-1.5-flash")
-        except Exception as e:
-            # Fallback se a configuração falhar
-            st.warning(f"Não foi possível configurar o modelo Gemini: {e}")
-            self.model = None
+        Yields:
+            str: Trechos da resposta (para st.write_stream)
+        """
+        model = self.model
+        if model is None:
+            yield fallback
+            return
+        with span('FinancialAdvisor.model_stream'):
+            yield from stream_with_budget(lambda: model.stream_content(prompt), fallback,
+                                          self.latency_budget, prefix)
     
+    def get_monthly_summary(self) -> pd.DataFrame:
+        """
+        Retorna a matriz mês × tipo, agregando as transações apenas se necessário
+        """
+        if self.monthly_summary is None:
+            if self.transactions_df.empty:
+                self.monthly_summary = pd.DataFrame()
+            else:
+                self.monthly_summary = self.transactions_df.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
+        return self.monthly_summary
+
+    @instrument()
     def analyze_financial_health(self) -> dict:
-        if self.transactions_df.empty:
+        monthly_summary = self.get_monthly_summary()
+        if monthly_summary.empty:
             return {}
-        
-        # Expanded monthly summary
-        monthly_summary = self.transactions_df.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
-        
-        
-        # Advanced metrics calculation
-        metrics = {
-            'total_revenue': monthly_summary.get('Receita', pd.Series(0)).sum(),
-            'total_expenses': monthly_summary.get('Despesa', pd.Series(0)).sum(),
-            'total_investments': monthly_summary.get('Investimento', pd.Series(0)).sum(),
-            'net_cashflow': monthly_summary.get('Receita', pd.Series(0)).sum() - 
-                            monthly_summary.get('Despesa', pd.Series(0)).sum(),
-            
-            # New advanced metrics
-            'average_monthly_revenue': monthly_summary.get('Receita', pd.Series(0)).mean(),
-            'average_monthly_expenses': monthly_summary.get('Despesa', pd.Series(0)).mean(),
-            'investment_ratio': monthly_summary.get('Investimento', pd.Series(0)).sum() / 
-                                max(monthly_summary.get('Receita', pd.Series(0)).sum(), 1) * 100,
-            'expense_to_income_ratio': monthly_summary.get('Despesa', pd.Series(0)).sum() / 
-                                        max(monthly_summary.get('Receita', pd.Series(0)).sum(), 1) * 100,
-            'revenue_volatility': monthly_summary.get('Receita', pd.Series(0)).std() / 
-                                   max(monthly_summary.get('Receita', pd.Series(0)).mean(), 1) * 100
-        }
-        
-        return metrics
+
+        # Todas as métricas em uma única passada vetorizada sobre a matriz mês × tipo
+        return compute_metrics(*summary_to_matrix(monthly_summary))
         
     
+    @instrument()
     def generate_contextual_tips(self) -> list:
         metrics = self.analyze_financial_health()
         tips = []
@@ -95,16 +159,20 @@ class FinancialAdvisor:
             else:
                 tips.append("🌟 Excelente! Sua taxa de poupança está acima de 20%.")
     
-    # AI-powered tip (if available)
-        if st.button("Dica do HeroAI") and self.model and tips:
-            try:
-                context = " ".join(tips)
-                response = self.model.generate_content(
-                    f"Considerando esta análise financeira: {context}. "
-                    "Dê uma dica personalizada de gestão financeira em até 3 linhas."
-                )
-                tips.append(f"🤖 HeroAI: {response.text.strip()}")
-            except Exception:
-                pass
-    
         return tips[:5]
+    
+    def stream_ai_tip(self, tips: list):
+        """
+        Gera em stream a dica personalizada do HeroAI a partir das dicas baseadas em regras
+        
+        Se o modelo não responder dentro do orçamento, a dica principal das regras
+        é usada, identificada como tal e sem a assinatura do HeroAI.
+        """
+        context = " ".join(tips)
+        yield from self.stream_advice(
+            f"Considerando esta análise financeira: {context}. "
+            "Dê uma dica personalizada de gestão financeira em até 3 linhas.",
+            fallback="📋 Dica baseada na sua análise: " + (
+                tips[0] if tips else "Mantenha seu orçamento sob controle e revise seus gastos mensalmente."),
+            prefix="🤖 HeroAI: "
+        )
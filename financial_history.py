@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = (3, 6, 12)
+YOY_COLUMNS = ['Receita', 'Despesa', 'Net']
+ACCUMULATED_COLUMN = 'Patrimônio Acumulado'
+# Meses anteriores necessários para recalcular médias móveis e comparações anuais
+LOOKBACK = max(max(ROLLING_WINDOWS), 12)
+
+
+def extend_history(base, raw):
+    """
+    Estende o histórico já calculado com as somas mensais a partir do primeiro período novo
+
+    Só os últimos LOOKBACK meses de base são relidos, então o custo depende dos
+    meses novos e não do tamanho do histórico. Com base vazia, o histórico é
+    calculado do zero pelo mesmo caminho.
+
+    Args:
+        base (pd.DataFrame): Histórico calculado até o período anterior ao primeiro de raw
+        raw (pd.DataFrame): Somas por período (PeriodIndex mensal) e tipo
+
+    Returns:
+        pd.DataFrame: Histórico contínuo (meses sem transações com zero), com as
+            colunas de raw, 'Net', médias móveis, variações anuais e o patrimônio acumulado
+    """
+    types = list(raw.columns)
+    has_base = base is not None and not base.empty
+    tail = base[types].iloc[-LOOKBACK:] if has_base else raw.iloc[:0]
+    combined = pd.concat([tail, raw])
+    if combined.empty:
+        return base if has_base else pd.DataFrame(columns=types, dtype=float)
+
+    periods = pd.period_range(combined.index.min(), combined.index.max(), freq='M', name='period')
+    combined = combined.groupby(level=0).sum().reindex(periods, fill_value=0.0).astype(float)
+    combined['Net'] = combined['Receita'] - combined['Despesa']
+
+    for window in ROLLING_WINDOWS:
+        combined[f'Net Média {window}m'] = combined['Net'].rolling(window).mean()
+
+    for column in YOY_COLUMNS:
+        previous = combined[column].shift(12)
+        combined[f'{column} YoY (%)'] = (combined[column] - previous) / previous.abs().replace(0, np.nan) * 100
+
+    first_new = base.index[-1] + 1 if has_base else periods[0]
+    new = combined.loc[combined.index >= first_new].copy()
+    start = base[ACCUMULATED_COLUMN].iloc[-1] if has_base else 0.0
+    new[ACCUMULATED_COLUMN] = start + new['Net'].cumsum()
+
+    return pd.concat([base, new]) if has_base else new
+
+
+class HistoryCache:
+    """
+    Histórico mensal calculado de cada usuário, compartilhado pelo processo
+
+    As escritas marcam o período mais antigo alterado (mark_dirty); a próxima
+    leitura recalcula apenas a partir dele, reaproveitando os meses anteriores.
+    """
+
+    def __init__(self):
+        self._entries = {}  # user_id -> (histórico, período sujo ou None, versão)
+        self._lock = threading.Lock()
+        self.full_builds = 0
+        self.incremental_updates = 0
+
+    def get(self, user_id):
+        """
+        Retorna (histórico ou None, período mais antigo a recalcular ou None, versão)
+        """
+        with self._lock:
+            return self._entries.get(user_id, (None, None, 0))
+
+    def put(self, user_id, history, version, incremental=False):
+        """
+        Armazena o histórico recalculado
+
+        Se o usuário recebeu escritas depois da leitura (versão diferente), a
+        marca de período sujo é mantida para o próximo recálculo.
+        """
+        with self._lock:
+            _, dirty_from, current = self._entries.get(user_id, (None, None, 0))
+            self._entries[user_id] = (history, dirty_from if current != version else None, current)
+            if incremental:
+                self.incremental_updates += 1
+            else:
+                self.full_builds += 1
+
+    def mark_dirty(self, user_id, period):
+        """
+        Registra que os meses a partir de period mudaram
+        """
+        with self._lock:
+            history, dirty_from, version = self._entries.get(user_id, (None, None, 0))
+            if dirty_from is not None:
+                period = min(period, dirty_from)
+            self._entries[user_id] = (history, period, version + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Retorna contadores de uso
+        """
+        return {
+            'entries': len(self._entries),
+            'full_builds': self.full_builds,
+            'incremental_updates': self.incremental_updates,
+        }
+
+
+# Instância compartilhada por todas as sessões do processo
+history_cache = HistoryCache()
@@ -0,0 +1,129 @@
+import argparse
+import json
+import sys
+import numpy as np
+import pandas as pd
+from financial_tracker import MESES, TIPOS
+
+# Posição de cada tipo no último eixo das matrizes (ordem de TIPOS)
+RECEITA, DESPESA, INVESTIMENTO = range(3)
+
+
+def compute_metrics(matrix, present=None) -> dict:
+    """
+    Calcula todas as métricas financeiras em uma única passada vetorizada
+
+    Reproduz FinancialAdvisor.analyze_financial_health: médias e desvios
+    consideram apenas os meses com transações, e um tipo sem nenhuma
+    transação tem média 0 e volatilidade indefinida (NaN).
+
+    Args:
+        matrix (array-like): Somas mês × tipo, com forma (meses, 3) ou em lote
+            (usuários, meses, 3), tipos na ordem de TIPOS
+        present (array-like, optional): Máscara booleana (..., meses) dos meses
+            com transações; por padrão, meses com algum valor diferente de zero
+
+    Returns:
+        dict: Métricas; escalares para uma matriz 2D, arrays (usuários,) em lote
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if present is None:
+        present = (matrix != 0).any(axis=-1)
+    present = np.asarray(present, dtype=bool)
+
+    values = np.where(present[..., None], matrix, 0.0)
+    n_months = present.sum(axis=-1)[..., None]
+    has_type = (values != 0).any(axis=-2)
+
+    totals = values.sum(axis=-2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(has_type, totals / np.maximum(n_months, 1), 0.0)
+        # Desvio padrão amostral (ddof=1), como o pandas
+        squared = np.where(present[..., None], (values - means[..., None, :]) ** 2, 0.0).sum(axis=-2)
+        stds = np.where(has_type & (n_months > 1), np.sqrt(squared / (n_months - 1)), np.nan)
+
+    revenue, expenses, investments = totals[..., RECEITA], totals[..., DESPESA], totals[..., INVESTIMENTO]
+    revenue_base = np.maximum(revenue, 1)
+
+    metrics = {
+        'total_revenue': revenue,
+        'total_expenses': expenses,
+        'total_investments': investments,
+        'net_cashflow': revenue - expenses,
+        'average_monthly_revenue': means[..., RECEITA],
+        'average_monthly_expenses': means[..., DESPESA],
+        'average_monthly_investments': means[..., INVESTIMENTO],
+        'average_monthly_savings': means[..., RECEITA] - means[..., DESPESA] - means[..., INVESTIMENTO],
+        'investment_ratio': investments / revenue_base * 100,
+        'expense_to_income_ratio': expenses / revenue_base * 100,
+        'revenue_volatility': stds[..., RECEITA] / np.maximum(means[..., RECEITA], 1) * 100,
+    }
+    if matrix.ndim == 2:
+        return {name: float(value) for name, value in metrics.items()}
+    return metrics
+
+
+def summary_to_matrix(monthly_summary: pd.DataFrame):
+    """
+    Converte a matriz mês × tipo do pandas em (array (meses, 3), máscara de meses presentes)
+
+    Cada linha do DataFrame é um mês com transações, como em FinancialTracker.monthly_summary.
+    """
+    matrix = monthly_summary.reindex(columns=TIPOS, fill_value=0).to_numpy(dtype=np.float64)
+    return matrix, np.ones(len(matrix), dtype=bool)
+
+
+def rollups_to_tensor(rollups):
+    """
+    Empilha documentos de monthly_rollups em um tensor usuários × meses × tipos
+
+    Args:
+        rollups (iterable[dict]): Documentos com user_id, month, type, sum e count
+
+    Returns:
+        tuple[list[str], np.ndarray, np.ndarray]: (IDs dos usuários, tensor
+            (usuários, 12, 3), máscara (usuários, 12) dos meses com transações)
+    """
+    frame = pd.DataFrame(list(rollups), columns=['user_id', 'month', 'type', 'sum', 'count'])
+    frame = frame[(frame['count'] > 0) & frame['month'].isin(MESES) & frame['type'].isin(TIPOS)]
+
+    user_codes, user_ids = pd.factorize(frame['user_id'])
+    month_codes = pd.Categorical(frame['month'], categories=MESES).codes
+    type_codes = pd.Categorical(frame['type'], categories=TIPOS).codes
+
+    tensor = np.zeros((len(user_ids), len(MESES), len(TIPOS)))
+    present = np.zeros((len(user_ids), len(MESES)), dtype=bool)
+    np.add.at(tensor, (user_codes, month_codes, type_codes), frame['sum'].to_numpy(dtype=np.float64))
+    present[user_codes, month_codes] = True
+    return list(user_ids), tensor, present
+
+
+def main():
+    """
+    Job noturno: calcula as métricas de todos os usuários de um ano em lote
+
+    Uso: python -m financial_metrics --year 2024 > metricas.jsonl
+    """
+    from db_connection import get_database
+    from monthly_rollups import ROLLUP_COLLECTION
+
+    parser = argparse.ArgumentParser(description='Calcula as métricas financeiras de todos os usuários')
+    parser.add_argument('--year', type=int, required=True)
+    args = parser.parse_args()
+
+    rollups = get_database()[ROLLUP_COLLECTION].find(
+        {'year': args.year, 'count': {'$gt': 0}},
+        {'_id': 0, 'user_id': 1, 'month': 1, 'type': 1, 'sum': 1, 'count': 1}
+    )
+    user_ids, tensor, present = rollups_to_tensor(rollups)
+    metrics = compute_metrics(tensor, present)
+
+    for index, user_id in enumerate(user_ids):
+        row = {name: None if np.isnan(values[index]) else round(float(values[index]), 4)
+               for name, values in metrics.items()}
+        print(json.dumps({'user_id': user_id, 'year': args.year, **row}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,32 +1,373 @@
+import logging
+import os
+import bson
+import numpy as np
 import pandas as pd
-from pymongo import MongoClient
 from datetime import datetime
-import plotly.express as px
 import streamlit as st
+from pymongo import ASCENDING, ReturnDocument, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+from db_connection import get_client, supports_transactions
+from instrumentation import count, instrument
+from transaction_cache import transaction_cache
+from monthly_rollups import ROLLUP_COLLECTION, apply_rollup_deltas, rollup_deltas
+from financial_history import extend_history, history_cache
+from price_service import FixtureProvider, get_price_service, held_tickers
+from fixed_income import get_cdi_accrual
+from price_history import get_price_history_store, portfolio_value
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+TIPOS = ['Receita', 'Despesa', 'Investimento']
+CATEGORIAS = {
+    'Receita': ['Salário - 1ª Parcela', 'Salário - 2ª Parcela', '13º Salário', 'Férias', 'Outros'],
+    'Despesa': ['Cartão', 'Internet', 'Tv a Cabo', 'Manutenção do carro', 'Combustível', 'Gás',
+                'Financiamento', 'Aluguel', 'Condomínio', 'Mercado', 'Cursos', 'Anuidade', 'Outros'],
+    'Investimento': ['Renda Fixa', 'Renda Variável'],
+}
+
+# Colunas exibidas na interface (sem created_at e user_id)
+DISPLAY_COLUMNS = ['_id', 'month', 'year', 'category', 'type', 'value',
+                   'observation', 'paid', 'payment_date']
+
+# Ordenação e projeção da paginação por chave (ver page_query)
+PAGE_SORT = [('year', ASCENDING), ('month_num', ASCENDING), ('_id', ASCENDING)]
+PAGE_PROJECTION = {**{column: 1 for column in DISPLAY_COLUMNS}, 'month_num': 1}
+
+# Campos necessários para calcular os incrementos dos rollups mensais
+ROLLUP_PROJECTION = {'_id': 1, 'user_id': 1, 'year': 1, 'month': 1, 'type': 1, 'value': 1, 'paid': 1}
+
+RECURRENCE_COLLECTION = 'recurrences'
+# Campos que uma ocorrência pode sobrescrever sem deixar de ser virtual;
+# mudar mês, ano ou tipo materializa a ocorrência em transactions
+OCCURRENCE_FIELDS = ('value', 'paid', 'payment_date', 'observation', 'category')
+# Campos da regra que update_recurrence aceita
+RECURRENCE_FIELDS = ('value', 'category', 'type', 'observation', 'count')
+
+# Anos encerrados compactados em um documento colunar por (usuário, ano)
+ARCHIVE_COLLECTION = 'transaction_buckets'
+MAX_BUCKET_BYTES = 15 * 1024 * 1024  # margem abaixo do limite de 16 MB do BSON
+# Campos guardados no documento arquivado; uma linha só é removida se ainda tiver esses valores
+ARCHIVED_FIELDS = ('month', 'year', 'category', 'type', 'value', 'observation', 'paid', 'payment_date')
+
+logger = logging.getLogger(__name__)
+
+# Tipos compactos usados pelo carregador com projeção
+COLUMN_DTYPES = {
+    'month': pd.CategoricalDtype(MESES, ordered=True),
+    'type': pd.CategoricalDtype(TIPOS),
+    'category': 'category',
+    'year': 'int16',
+    'value': 'float64',
+}
+
+
+def build_transactions_frame(documents, columns, buckets=()):
+    """
+    Monta um DataFrame compacto e tipado a partir de documentos de transação
+
+    month/type/category viram categóricas, value float64, paid bool real,
+    payment_date datetime e _id string.
+
+    Args:
+        documents (iterable[dict]): Documentos retornados pelo MongoDB
+        columns (list[str]): Colunas desejadas, na ordem de saída
+        buckets (iterable[dict], optional): Anos arquivados, lidos coluna a coluna (ver bucket_frame)
+
+    Returns:
+        pd.DataFrame: Transações com apenas as colunas pedidas
+    """
+    df = pd.DataFrame.from_records(list(documents), columns=list(columns))
+    archived = [bucket_frame(bucket)[list(columns)] for bucket in buckets]
+    if archived:
+        df = pd.concat(([df] if not df.empty else []) + archived, ignore_index=True)
+        if '_id' in df.columns:
+            df = df.drop_duplicates('_id', ignore_index=True)
+
+    if '_id' in df.columns:
+        df['_id'] = df['_id'].astype(str)
+    if 'paid' in df.columns:
+        df['paid'] = df['paid'].fillna(False).astype(bool)
+    if 'payment_date' in df.columns:
+        df['payment_date'] = pd.to_datetime(df['payment_date'])
+    if 'observation' in df.columns:
+        df['observation'] = df['observation'].fillna('')
+
+    return df.astype({col: dtype for col, dtype in COLUMN_DTYPES.items() if col in df.columns})
+
+
+def expand_recurrence(month, year, repeat_months=1):
+    """
+    Expande uma recorrência mensal em pares (mês, ano), virando o ano quando necessário
+
+    Args:
+        month (str): Mês inicial (nome em português)
+        year (int): Ano inicial
+        repeat_months (int): Quantidade de meses
+
+    Returns:
+        list[tuple[str, int]]: Meses e anos de cada ocorrência
+    """
+    start = MESES.index(month)
+    return [(MESES[(start + i) % 12], int(year) + (start + i) // 12)
+            for i in range(int(repeat_months))]
+
+
+def page_key(doc):
+    """
+    Chave (year, month_num, _id) da paginação; month_num é derivado do nome do
+    mês em documentos gravados antes do campo existir
+    """
+    return doc['year'], doc.get('month_num') or MESES.index(doc['month']) + 1, str(doc['_id'])
+
+
+def page_query(user_id, year=None, month=None, type=None, category=None, paid=None, after=None):
+    """
+    Filtro de get_transactions_page: os filtros da interface e, com um cursor
+    (year, month_num, _id), o keyset das linhas posteriores a ele
+    """
+    from bson.objectid import ObjectId
+
+    query = {'user_id': user_id}
+    if year is not None:
+        query['year'] = year
+    if month is not None:
+        query['month'] = month
+    if type is not None:
+        query['type'] = type
+    if category is not None:
+        query['category'] = category
+    if paid is not None:
+        # Documentos antigos podem não ter o campo paid
+        query['paid'] = True if paid else {'$ne': True}
+
+    if after is not None:
+        after_year, after_month, after_id = after
+        # Um cursor virtual é comparado pelo ObjectId da sua regra
+        after_id = ObjectId(str(after_id)[:24])
+        query['$or'] = [
+            {'year': {'$gt': after_year}},
+            {'year': after_year, 'month_num': {'$gt': after_month}},
+            {'year': after_year, 'month_num': after_month, '_id': {'$gt': after_id}},
+        ]
+    return query
+
+
+def split_occurrence_id(transaction_id):
+    """
+    Separa o _id de uma transação virtual ('<recorrência>:AAAA-MM') em (recorrência, chave)
+
+    Returns:
+        tuple[str, str] | None: None para transações materializadas (ObjectId)
+    """
+    recurrence_id, _, key = str(transaction_id).partition(':')
+    return (recurrence_id, key) if key else None
+
+
+def recurrence_occurrences(recurrence, year=None):
+    """
+    Expande uma regra de recorrência em transações virtuais
+
+    Os overrides esparsos da regra ({'AAAA-MM': {campo: valor}}) são aplicados
+    sobre cada ocorrência; ocorrências com 'deleted' são omitidas.
+
+    Args:
+        recurrence (dict): Documento da coleção recurrences
+        year (int, optional): Expande apenas as ocorrências desse ano
+
+    Returns:
+        list[dict]: Transações com o mesmo formato dos documentos de transactions
+    """
+    first = int(recurrence['start_year']) * 12 + MESES.index(recurrence['start_month'])
+    last = first + int(recurrence['count']) - 1
+    if year is not None:
+        first, last = max(first, int(year) * 12), min(last, int(year) * 12 + 11)
+
+    recurrence_id = str(recurrence['_id'])
+    overrides = recurrence.get('overrides') or {}
+    occurrences = []
+    for index in range(first, last + 1):
+        occurrence_year, month_index = divmod(index, 12)
+        key = f"{occurrence_year:04d}-{month_index + 1:02d}"
+        override = overrides.get(key, {})
+        if override.get('deleted'):
+            continue
+        occurrence = {
+            '_id': f"{recurrence_id}:{key}",
+            'month': MESES[month_index],
+            'month_num': month_index + 1,
+            'year': occurrence_year,
+            'category': recurrence['category'],
+            'type': recurrence['type'],
+            'value': float(recurrence['value']),
+            'observation': recurrence.get('observation', ''),
+            'created_at': recurrence.get('created_at'),
+            'paid': False,
+            'payment_date': None,
+            'user_id': recurrence.get('user_id'),
+            'recurrence_id': recurrence_id,
+        }
+        occurrence.update((field, override[field]) for field in OCCURRENCE_FIELDS if field in override)
+        occurrences.append(occurrence)
+    return occurrences
+
+
+def build_year_bucket(documents, user_id, year):
+    """
+    Compacta as transações de um ano em um único documento colunar
+
+    Cada campo vira um array alinhado por posição; type e category são
+    codificados como índices em listas de valores distintos.
+
+    Args:
+        documents (list[dict]): Transações do ano (com _id)
+        user_id: Dono das transações
+        year (int): Ano arquivado
+
+    Returns:
+        dict: Documento da coleção transaction_buckets
+    """
+    types = sorted({doc.get('type') for doc in documents}, key=str)
+    categories = sorted({doc.get('category') for doc in documents}, key=str)
+    type_codes = {value: code for code, value in enumerate(types)}
+    category_codes = {value: code for code, value in enumerate(categories)}
+    return {
+        'user_id': user_id,
+        'year': int(year),
+        'count': len(documents),
+        'archived_at': datetime.now(),
+        'ids': [doc['_id'] for doc in documents],
+        'month_num': [doc.get('month_num') or MESES.index(doc['month']) + 1 for doc in documents],
+        'types': types,
+        'type': [type_codes[doc.get('type')] for doc in documents],
+        'categories': categories,
+        'category': [category_codes[doc.get('category')] for doc in documents],
+        'value': [float(doc.get('value') or 0) for doc in documents],
+        'paid': [bool(doc.get('paid')) for doc in documents],
+        'observation': [doc.get('observation') or '' for doc in documents],
+        'payment_date': [doc.get('payment_date') for doc in documents],
+        'created_at': [doc.get('created_at') for doc in documents],
+    }
+
+
+def bucket_frame(bucket):
+    """
+    Converte um documento de ano arquivado em DataFrame, coluna a coluna, via arrays NumPy
+
+    Returns:
+        pd.DataFrame: As mesmas colunas de uma leitura de transactions
+    """
+    month_num = np.asarray(bucket['month_num'], dtype=np.int8)
+    return pd.DataFrame({
+        '_id': [str(object_id) for object_id in bucket['ids']],
+        'month': np.asarray(MESES, dtype=object)[month_num - 1],
+        'month_num': month_num,
+        'year': np.full(len(month_num), bucket['year'], dtype=np.int16),
+        'category': np.asarray(bucket['categories'], dtype=object)[np.asarray(bucket['category'], dtype=np.intp)],
+        'type': np.asarray(bucket['types'], dtype=object)[np.asarray(bucket['type'], dtype=np.intp)],
+        'value': np.asarray(bucket['value'], dtype=np.float64),
+        'observation': np.asarray(bucket['observation'], dtype=object),
+        'created_at': pd.to_datetime(bucket['created_at']),
+        'paid': np.asarray(bucket['paid'], dtype=bool),
+        'payment_date': pd.to_datetime(bucket['payment_date']),
+        'user_id': bucket['user_id'],
+    })
+
+
+def bucket_documents(bucket):
+    """
+    Reconstrói os documentos de transação de um ano arquivado (desarquivamento, rollups)
+    """
+    categories, types = bucket['categories'], bucket['types']
+    return [
+        {
+            '_id': object_id,
+            'month': MESES[month_num - 1],
+            'month_num': month_num,
+            'year': bucket['year'],
+            'category': categories[category],
+            'type': types[type],
+            'value': value,
+            'observation': observation,
+            'created_at': created_at,
+            'paid': paid,
+            'payment_date': payment_date,
+            'user_id': bucket['user_id'],
+        }
+        for object_id, month_num, category, type, value, observation, created_at, paid, payment_date in zip(
+            bucket['ids'], bucket['month_num'], bucket['category'], bucket['type'], bucket['value'],
+            bucket['observation'], bucket['created_at'], bucket['paid'], bucket['payment_date'])
+    ]
+
+
+def shared_price_service():
+    """
+    Serviço de cotações do processo, configurado pelos secrets opcionais
+    price_cache_path (cache em SQLite) e price_fixture_path (preços fixos, sem rede)
+    """
+    fixture = st.secrets.get("price_fixture_path")
+    return get_price_service(
+        st.secrets.get("price_cache_path"),
+        provider=FixtureProvider(fixture) if fixture else None,
+        universe=lambda: held_tickers(get_client()['financial_tracker'])
+    )
+
+
+def shared_cdi_accrual():
+    """
+    Avaliador de renda fixa do processo; usa o secret opcional cdi_series_path
+    (CSV com a série do DI) ou baixa a série do Banco Central
+    """
+    return get_cdi_accrual(st.secrets.get("cdi_series_path"))
+
+
+def shared_price_history_store():
+    """
+    Séries históricas do processo, no diretório do secret price_history_dir
+    ou em 'price_history' ao lado do cache de cotações
+    """
+    root = st.secrets.get("price_history_dir") or os.path.join(
+        os.path.dirname(st.secrets.get("price_cache_path") or ''), 'price_history')
+    return get_price_history_store(root)
 
-mongo_uri = st.secrets["mongo_uri"]
 
 class FinancialTracker:
-    def __init__(self, user_id=None):
+    def __init__(self, user_id=None, db=None):
         """
         Inicializa o rastreador financeiro com conexão ao MongoDB e carregamento de ativos
         
         Args:
             user_id: ID do usuário atual para filtrar transações
+            db (optional): Banco de dados a usar (ex.: em benchmarks); por padrão,
+                o banco financial_tracker do cliente compartilhado
         """
-        # Conexão com MongoDB
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client['financial_tracker']
+        if db is None:
+            # Conexão com MongoDB (cliente compartilhado pelo processo)
+            self.client = get_client()
+            self.db = self.client['financial_tracker']
+        else:
+            self.client = db.client
+            self.db = db
         self.transactions_collection = self.db['transactions']
         self.investments_collection = self.db['investments']
+        self.rollups_collection = self.db[ROLLUP_COLLECTION]
+        self.recurrences_collection = self.db[RECURRENCE_COLLECTION]
+        self.buckets_collection = self.db[ARCHIVE_COLLECTION]
         self.user_id = user_id
+        # Cache de transações compartilhado pelo processo, invalidado a cada escrita
+        self.cache = transaction_cache
+        # Histórico mensal calculado, recalculado a partir do mês mais antigo alterado
+        self.history_cache = history_cache
+        # Meses alterados por uma transação ainda não confirmada (ver _write)
+        self._pending_dirty = []
         
-    def add_transaction(self, month, year, category, type, value, observation=''):
+    def _build_transaction(self, month, year, category, type, value, observation=''):
         """
-        Adiciona uma nova transação ao MongoDB com status de pagamento e observação
+        Monta o documento de uma transação com status de pagamento e observação
         """
-        transaction = {
+        return {
             'month': month,
+            'month_num': MESES.index(month) + 1,  # Ordem cronológica para paginação
             'year': year,
             'category': category,
             'type': type,
@@ -37,35 +378,512 @@ class FinancialTracker:
             'payment_date': None,
             'user_id': self.user_id  # Adiciona user_id à transação
         }
-        self.transactions_collection.insert_one(transaction)
 
+    def _write(self, operation):
+        """
+        Executa operation(session) com a escrita e o $inc dos rollups na mesma transação
+
+        Em replica sets e clusters shardados, operation roda em
+        session.with_transaction (repetida em conflitos transitórios) e o
+        cache só é invalidado após a confirmação. Em um servidor standalone,
+        recebe session=None e as escritas são separadas: se o processo falhar
+        entre elas, a divergência é detectada e corrigida por
+        ensure_rollups_once no próximo início do app (ou por `python -m monthly_rollups`).
+        """
+        if not supports_transactions(self.client):
+            return operation(None)
+        self._pending_dirty = []
+        with self.client.start_session() as session:
+            result = session.with_transaction(operation)
+        self.cache.invalidate(self.user_id)
+        if self._pending_dirty:
+            self.history_cache.mark_dirty(self.user_id, min(self._pending_dirty))
+        return result
+
+    def _update_rollups(self, old_transactions=(), new_transactions=(), session=None):
+        """
+        Aplica em monthly_rollups os incrementos ($inc) da escrita e invalida o cache
+
+        Dentro de uma transação (session), a invalidação fica para depois da confirmação (ver _write).
+        """
+        deltas = rollup_deltas(old_transactions, new_transactions)
+        apply_rollup_deltas(self.rollups_collection, deltas, session=session)
+
+        periods = [pd.Period(year=year, month=MESES.index(month) + 1, freq='M')
+                   for _, year, month, _ in deltas if month in MESES]
+        if session is not None:
+            self._pending_dirty.extend(periods)
+            return
+        self.cache.invalidate(self.user_id)
+        if periods:
+            self.history_cache.mark_dirty(self.user_id, min(periods))
+
+    def _update_rollups_for_written(self, documents):
+        """
+        Aplica os rollups apenas dos documentos que de fato foram gravados (após uma falha parcial)
+
+        Se nem a conferência for possível, a falha é registrada no log e no rerun
+        (FinancialTracker.rollup_drift) e os rollups ficam defasados até serem
+        corrigidos por `python -m monthly_rollups`.
+        """
+        try:
+            written = {doc['_id'] for doc in self.transactions_collection.find(
+                {'_id': {'$in': [doc['_id'] for doc in documents if '_id' in doc]}}, {'_id': 1})}
+            self._update_rollups(new_transactions=[doc for doc in documents if doc.get('_id') in written])
+        except Exception:
+            count('FinancialTracker.rollup_drift')
+            logger.exception("Rollups do usuário %s não corrigidos após falha parcial na inserção; "
+                             "execute python -m monthly_rollups", self.user_id)
+
+    @instrument()
+    def add_transaction(self, month, year, category, type, value, observation=''):
+        """
+        Adiciona uma nova transação ao MongoDB com status de pagamento e observação
+        """
+        transaction = self._build_transaction(month, year, category, type, value, observation)
+
+        def write(session):
+            self.transactions_collection.insert_one(transaction, session=session)
+            self._update_rollups(new_transactions=[transaction], session=session)
+
+        self._write(write)
+
+    @instrument()
+    def add_transactions(self, transactions, repeat_months=1):
+        """
+        Adiciona várias transações em uma única ida ao banco (insert_many não ordenado)
+
+        Cada transação é repetida por repeat_months meses a partir do seu mês/ano,
+        então uma despesa recorrente de 36 meses gera um único round trip.
+
+        Args:
+            transactions (list[dict]): Dicionários com month, year, category, type,
+                value e, opcionalmente, observation
+            repeat_months (int): Quantidade de meses de recorrência de cada transação
+
+        Returns:
+            list[dict]: Um resultado por documento, com month, year, inserted_id
+                (str ou None) e error (mensagem ou None)
+        """
+        documents = []
+        for transaction in transactions:
+            for month, year in expand_recurrence(transaction['month'], transaction['year'], repeat_months):
+                documents.append(self._build_transaction(
+                    month=month,
+                    year=year,
+                    category=transaction['category'],
+                    type=transaction['type'],
+                    value=transaction['value'],
+                    observation=transaction.get('observation', '')
+                ))
+
+        if not documents:
+            return []
+
+        def write(session):
+            errors = {}
+            try:
+                self.transactions_collection.insert_many(documents, ordered=False, session=session)
+            except BulkWriteError as e:
+                if session is not None:
+                    raise
+                errors = {err['index']: err.get('errmsg', 'Erro ao inserir')
+                          for err in e.details.get('writeErrors', [])}
+            except Exception:
+                # Falha no meio do lote (ex.: rede): os rollups recebem o que chegou a ser gravado
+                if session is None:
+                    self._update_rollups_for_written(documents)
+                raise
+            self._update_rollups(new_transactions=[
+                doc for index, doc in enumerate(documents) if index not in errors
+            ], session=session)
+            return errors
+
+        try:
+            errors = self._write(write)
+        except BulkWriteError as e:
+            # Em uma transação, o erro de um documento desfaz o lote inteiro
+            failed = {err['index']: err.get('errmsg', 'Erro ao inserir') for err in e.details.get('writeErrors', [])}
+            errors = {index: failed.get(index, 'Lote desfeito por erro em outro documento')
+                      for index in range(len(documents))}
+        finally:
+            self.cache.invalidate(self.user_id)
+
+        # insert_many atribui o _id no próprio documento antes do envio
+        return [
+            {
+                'month': doc['month'],
+                'year': doc['year'],
+                'inserted_id': None if index in errors else str(doc['_id']),
+                'error': errors.get(index)
+            }
+            for index, doc in enumerate(documents)
+        ]
+
+    def _recurrence_query(self, year=None):
+        query = {'user_id': self.user_id}
+        if year is not None:
+            query['start_year'] = {'$lte': year}
+            query['end_year'] = {'$gte': year}
+        return query
+
+    def _virtual_transactions(self, year=None):
+        """
+        Ocorrências das recorrências do usuário, expandidas apenas para o ano pedido
+        """
+        return [occurrence
+                for recurrence in self.recurrences_collection.find(self._recurrence_query(year))
+                for occurrence in recurrence_occurrences(recurrence, year)]
+
+    @instrument()
+    def add_recurrence(self, month, year, category, type, value, observation='', count=None, end=None):
+        """
+        Grava uma transação recorrente como uma única regra em recurrences
+
+        As ocorrências não viram documentos: são expandidas na leitura
+        (ver recurrence_occurrences). Apenas os rollups mensais recebem a
+        contribuição de cada mês, em um único bulk_write.
+
+        Args:
+            month (str): Mês da primeira ocorrência
+            year (int): Ano da primeira ocorrência
+            count (int, optional): Quantidade de meses
+            end (tuple[str, int], optional): (mês, ano) da última ocorrência, se count não for informado
+
+        Returns:
+            str: ID da recorrência
+        """
+        if count is None:
+            if end is None:
+                raise ValueError("Informe a quantidade de meses ou o mês final da recorrência")
+            end_month, end_year = end
+            count = (int(end_year) - int(year)) * 12 + MESES.index(end_month) - MESES.index(month) + 1
+        if int(count) < 1:
+            raise ValueError("A recorrência precisa de ao menos uma ocorrência")
+
+        recurrence = {
+            'start_month': month,
+            'start_year': int(year),
+            'count': int(count),
+            'end_year': int(year) + (MESES.index(month) + int(count) - 1) // 12,
+            'category': category,
+            'type': type,
+            'value': float(value),
+            'observation': observation,
+            'overrides': {},
+            'created_at': datetime.now(),
+            'user_id': self.user_id
+        }
+
+        def write(session):
+            self.recurrences_collection.insert_one(recurrence, session=session)
+            self._update_rollups(new_transactions=recurrence_occurrences(recurrence), session=session)
 
+        self._write(write)
+        return str(recurrence['_id'])
+
+    def get_recurrences(self):
+        """
+        Regras de recorrência do usuário, sem os overrides
+
+        Returns:
+            pd.DataFrame: Uma linha por regra, com '_id' em texto
+        """
+        columns = ['_id', 'start_month', 'start_year', 'count', 'category', 'type', 'value', 'observation']
+        recurrences = pd.DataFrame(
+            list(self.recurrences_collection.find({'user_id': self.user_id}, {'overrides': 0})),
+            columns=columns
+        )
+        recurrences['_id'] = recurrences['_id'].astype(str)
+        return recurrences
+
+    @instrument()
+    def update_recurrence(self, recurrence_id, updates):
+        """
+        Altera a regra de uma recorrência (valor, categoria, tipo, observação ou quantidade de meses)
+
+        É uma única escrita, qualquer que seja a quantidade de ocorrências; os
+        overrides de cada ocorrência são preservados.
+
+        Returns:
+            bool: True se a regra mudou
+        """
+        from bson.objectid import ObjectId
+
+        updates = {field: value for field, value in updates.items() if field in RECURRENCE_FIELDS}
+        if 'value' in updates:
+            updates['value'] = float(updates['value'])
+        if not updates:
+            return False
+
+        recurrence = self.recurrences_collection.find_one({'_id': ObjectId(recurrence_id), 'user_id': self.user_id})
+        if not recurrence:
+            raise ValueError("Recorrência não encontrada ou não pertence ao usuário")
+        if 'count' in updates:
+            updates['count'] = int(updates['count'])
+            if updates['count'] < 1:
+                raise ValueError("A recorrência precisa de ao menos uma ocorrência")
+            updates['end_year'] = recurrence['start_year'] + (
+                MESES.index(recurrence['start_month']) + updates['count'] - 1) // 12
+
+        updated = {**recurrence, **updates}
+        if updated == recurrence:
+            return False
+
+        def write(session):
+            self.recurrences_collection.update_one({'_id': recurrence['_id'], 'user_id': self.user_id},
+                                                   {'$set': updates}, session=session)
+            self._update_rollups(recurrence_occurrences(recurrence), recurrence_occurrences(updated),
+                                 session=session)
+
+        self._write(write)
+        return True
+
+    @instrument()
+    def delete_recurrence(self, recurrence_id):
+        """
+        Exclui uma recorrência e todas as suas ocorrências
+        """
+        from bson.objectid import ObjectId
 
+        def write(session):
+            recurrence = self.recurrences_collection.find_one_and_delete(
+                {'_id': ObjectId(recurrence_id), 'user_id': self.user_id}, session=session)
+            if recurrence:
+                self._update_rollups(old_transactions=recurrence_occurrences(recurrence), session=session)
+            return recurrence
+
+        return self._write(write) is not None
+
+    def _apply_occurrence_changes(self, updates=None, deletes=None):
+        """
+        Aplica alterações e exclusões em ocorrências virtuais como overrides esparsos
+
+        Campos de OCCURRENCE_FIELDS são gravados em overrides.AAAA-MM da regra;
+        uma ocorrência que muda de mês, ano ou tipo é marcada como excluída na
+        regra e gravada como transação comum em transactions.
+
+        Args:
+            updates (dict, optional): {id virtual: {campo: valor}}
+            deletes (list, optional): IDs virtuais a excluir
+
+        Returns:
+            dict: Contagens 'matched', 'modified' e 'deleted'
+        """
+        from bson.objectid import ObjectId
+
+        deletes = list(deletes or [])
+        updates = {transaction_id: fields for transaction_id, fields in (updates or {}).items()
+                   if transaction_id not in deletes}
+        targets = {transaction_id: split_occurrence_id(transaction_id)
+                   for transaction_id in list(updates) + deletes}
+        recurrence_ids = {ObjectId(recurrence_id) for recurrence_id, _ in targets.values()}
+        recurrences = {
+            str(doc['_id']): doc
+            for doc in self.recurrences_collection.find({'_id': {'$in': list(recurrence_ids)}, 'user_id': self.user_id})
+        }
+
+        def current(transaction_id):
+            recurrence_id, key = targets[transaction_id]
+            recurrence = recurrences.get(recurrence_id)
+            if recurrence is None:
+                return None
+            year, month_num = map(int, key.split('-'))
+            return next((occurrence for occurrence in recurrence_occurrences(recurrence, year)
+                         if occurrence['month_num'] == month_num), None)
+
+        operations, materialized, old, new = [], [], [], []
+        counts = {'matched': 0, 'modified': 0, 'deleted': 0}
+
+        for transaction_id, fields in updates.items():
+            occurrence = current(transaction_id)
+            if occurrence is None:
+                continue
+            recurrence_id, key = targets[transaction_id]
+            counts['matched'] += 1
+            if any(field in fields and fields[field] != occurrence[field] for field in ('month', 'year', 'type')):
+                merged = {**occurrence, **fields}
+                document = self._build_transaction(merged['month'], merged['year'], merged['category'],
+                                                   merged['type'], merged['value'], merged['observation'])
+                document.update(paid=merged['paid'], payment_date=merged['payment_date'])
+                operations.append(UpdateOne({'_id': ObjectId(recurrence_id), 'user_id': self.user_id},
+                                            {'$set': {f'overrides.{key}': {'deleted': True}}}))
+                materialized.append(document)
+            else:
+                overrides = {field: value for field, value in fields.items()
+                             if field in OCCURRENCE_FIELDS and value != occurrence[field]}
+                if not overrides:
+                    continue
+                operations.append(UpdateOne(
+                    {'_id': ObjectId(recurrence_id), 'user_id': self.user_id},
+                    {'$set': {f'overrides.{key}.{field}': value for field, value in overrides.items()}}))
+                document = {**occurrence, **overrides}
+            counts['modified'] += 1
+            old.append(occurrence)
+            new.append(document)
+
+        for transaction_id in deletes:
+            occurrence = current(transaction_id)
+            if occurrence is None:
+                continue
+            recurrence_id, key = targets[transaction_id]
+            operations.append(UpdateOne({'_id': ObjectId(recurrence_id), 'user_id': self.user_id},
+                                        {'$set': {f'overrides.{key}': {'deleted': True}}}))
+            counts['deleted'] += 1
+            old.append(occurrence)
+
+        def write(session):
+            if operations:
+                self.recurrences_collection.bulk_write(operations, ordered=True, session=session)
+            if materialized:
+                self.transactions_collection.insert_many(materialized, session=session)
+            if old:
+                self._update_rollups(old, new, session=session)
+
+        if operations or materialized or old:
+            self._write(write)
+        return counts
+
+    @instrument()
     def update_payment_status(self, transaction_id, paid=True):
         """
         Atualiza o status de pagamento de uma transação
         """
         from bson.objectid import ObjectId
         
-        # Adiciona verificação de propriedade
-        transaction = self.transactions_collection.find_one({
-            '_id': ObjectId(transaction_id),
-            'user_id': self.user_id
-        })
-        
-        if not transaction:
-            raise ValueError("Transação não encontrada ou não pertence ao usuário")
-            
         updates = {
             'paid': paid,
             'payment_date': datetime.now() if paid else None
         }
+
+        if split_occurrence_id(transaction_id):
+            if not self._apply_occurrence_changes(updates={transaction_id: updates})['matched']:
+                raise ValueError("Transação não encontrada ou não pertence ao usuário")
+            return
         
-        self.transactions_collection.update_one(
-            {'_id': ObjectId(transaction_id), 'user_id': self.user_id},
-            {'$set': updates}
-        )
+        # O filtro com user_id faz a verificação de propriedade; o documento
+        # anterior é usado para atualizar os rollups
+        def write(session):
+            transaction = self.transactions_collection.find_one_and_update(
+                {'_id': ObjectId(transaction_id), 'user_id': self.user_id},
+                {'$set': updates},
+                projection=ROLLUP_PROJECTION,
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if transaction:
+                self._update_rollups([transaction], [{**transaction, **updates}], session=session)
+            return transaction
+        
+        if not self._write(write):
+            if self._unarchive_containing([ObjectId(transaction_id)]):
+                return self.update_payment_status(transaction_id, paid)
+            raise ValueError("Transação não encontrada ou não pertence ao usuário")
+
+    def _buckets(self, year=None):
+        """
+        Documentos dos anos arquivados do usuário (o ano corrente nunca é arquivado)
+        """
+        if year is not None and year >= datetime.now().year:
+            return []
+        query = {'user_id': self.user_id}
+        if year is not None:
+            query['year'] = year
+        return list(self.buckets_collection.find(query))
+
+    @instrument()
+    def archive_year(self, year):
+        """
+        Compacta as transações de um ano encerrado em um único documento colunar
+
+        O documento é gravado antes de as transações serem removidas, e linhas
+        inseridas no ano depois de um arquivamento anterior são incorporadas ao
+        documento existente. Os rollups não mudam: os valores são os mesmos.
+
+        Cada linha só é removida se ainda for igual à lida (filtro pelos campos
+        arquivados). Uma linha editada durante o arquivamento continua em
+        transactions, com o valor novo, e sai do documento; uma excluída nesse
+        meio-tempo também sai. Basta arquivar o ano de novo para incluí-las.
+
+        Args:
+            year (int): Ano a arquivar (anterior ao ano corrente)
+
+        Returns:
+            int: Quantidade de transações movidas para o arquivo
+        """
+        year = int(year)
+        if year >= datetime.now().year:
+            raise ValueError("Apenas anos encerrados podem ser arquivados")
+
+        documents = list(self.transactions_collection.find({'user_id': self.user_id, 'year': year}))
+        if not documents:
+            return 0
+        existing = self.buckets_collection.find_one({'user_id': self.user_id, 'year': year})
+        rows = {doc['_id']: doc for doc in bucket_documents(existing)} if existing else {}
+        rows.update((doc['_id'], doc) for doc in documents)
 
+        ordered = sorted(rows.values(), key=lambda doc: (doc.get('month_num') or MESES.index(doc['month']) + 1,
+                                                         doc['_id']))
+        bucket = build_year_bucket(ordered, self.user_id, year)
+        if len(bson.encode(bucket)) > MAX_BUCKET_BYTES:
+            raise ValueError(f"O ano {year} tem transações demais para um único documento")
+
+        self.buckets_collection.replace_one({'user_id': self.user_id, 'year': year}, bucket, upsert=True)
+        try:
+            deleted = {doc['_id'] for doc in documents if self.transactions_collection.delete_one(
+                {'_id': doc['_id'], 'user_id': self.user_id,
+                 **{field: doc.get(field) for field in ARCHIVED_FIELDS}}).deleted_count}
+        finally:
+            self.cache.invalidate(self.user_id)
+
+        if len(deleted) < len(documents):
+            # Linhas alteradas ou excluídas por outra escrita depois da leitura saem do documento
+            snapshot = {doc['_id'] for doc in documents}
+            kept = [doc for doc in ordered if doc['_id'] in deleted or doc['_id'] not in snapshot]
+            if kept:
+                self.buckets_collection.replace_one({'user_id': self.user_id, 'year': year},
+                                                    build_year_bucket(kept, self.user_id, year))
+            else:
+                self.buckets_collection.delete_one({'user_id': self.user_id, 'year': year})
+        return len(deleted)
+
+    @instrument()
+    def unarchive_year(self, year):
+        """
+        Devolve as transações de um ano arquivado à coleção transactions
+
+        Returns:
+            int: Quantidade de transações restauradas
+        """
+        bucket = self.buckets_collection.find_one({'user_id': self.user_id, 'year': int(year)})
+        if not bucket:
+            return 0
+
+        documents = bucket_documents(bucket)
+        try:
+            self.transactions_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Linhas já restauradas por uma execução interrompida mantêm o mesmo _id
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+        self.buckets_collection.delete_one({'_id': bucket['_id']})
+        self.cache.invalidate(self.user_id)
+        return len(documents)
+
+    def _unarchive_containing(self, object_ids):
+        """
+        Desarquiva os anos que contêm alguma das transações (para permitir editá-las)
+
+        Returns:
+            bool: True se algum ano foi desarquivado
+        """
+        years = self.buckets_collection.distinct(
+            'year', {'user_id': self.user_id, 'ids': {'$in': list(object_ids)}})
+        for year in years:
+            self.unarchive_year(year)
+        return bool(years)
+
+    @instrument()
     def get_transactions(self, year=None):
         """
         Recupera transações, opcionalmente filtradas por ano
@@ -76,6 +894,12 @@ class FinancialTracker:
         Returns:
             pd.DataFrame: DataFrame contendo as transações
         """
+        # Evita nova consulta se nada mudou desde a última leitura
+        cached = self.cache.get(self.user_id, year)
+        if cached is not None:
+            return cached
+        version = self.cache.version(self.user_id)
+
         # Base query com filtro de usuário
         query = {'user_id': self.user_id}
         
@@ -85,22 +909,167 @@ class FinancialTracker:
             
         # Recupera transações do MongoDB
         transactions = list(self.transactions_collection.find(query))
+        # Ocorrências das recorrências, expandidas só para o período pedido
+        transactions += self._virtual_transactions(year)
         
         # Converte para DataFrame
         df = pd.DataFrame(transactions)
+
+        # Anos arquivados: um único documento por ano, convertido coluna a coluna
+        archived = [bucket_frame(bucket) for bucket in self._buckets(year)]
+        if archived:
+            df = pd.concat(([df] if not df.empty else []) + archived, ignore_index=True)
         
         if not df.empty:
             # Converte _id para string no próprio DataFrame
             df['_id'] = df['_id'].astype(str)
+            if archived:
+                # Um arquivamento interrompido pode deixar a linha nos dois lugares
+                df = df.drop_duplicates('_id', ignore_index=True)
             
             # Adiciona colunas faltantes se necessário
             if 'paid' not in df.columns:
                 df['paid'] = False
             if 'payment_date' not in df.columns:
                 df['payment_date'] = None
-                
+
+        self.cache.put(self.user_id, year, df, version)
         return df
     
+    @instrument()
+    def load_transactions(self, columns, year=None):
+        """
+        Carrega apenas as colunas pedidas, com projeção no MongoDB e tipos compactos
+
+        Args:
+            columns (list[str]): Colunas necessárias ao chamador
+            year (int, optional): Ano para filtrar as transações
+
+        Returns:
+            pd.DataFrame: DataFrame tipado (ver build_transactions_frame)
+        """
+        columns = list(columns)
+        cache_key = (year, tuple(columns))
+        cached = self.cache.get(self.user_id, cache_key)
+        if cached is not None:
+            return cached
+        version = self.cache.version(self.user_id)
+
+        query = {'user_id': self.user_id}
+        if year is not None:
+            query['year'] = year
+
+        projection = {col: 1 for col in columns}
+        if '_id' not in columns:
+            projection['_id'] = 0
+
+        documents = list(self.transactions_collection.find(query, projection)) + self._virtual_transactions(year)
+        df = build_transactions_frame(documents, columns, self._buckets(year))
+        self.cache.put(self.user_id, cache_key, df, version)
+        return df
+
+    @instrument()
+    def get_transactions_page(self, year=None, month=None, type=None, category=None,
+                              paid=None, after=None, limit=50):
+        """
+        Recupera uma página de transações com paginação por chave (keyset)
+
+        A ordenação é feita no servidor por (year, month_num, _id) e a próxima
+        página começa logo após o cursor, sem skip, então o custo de cada
+        página não cresce com o tamanho do histórico. As ocorrências das
+        recorrências e os anos arquivados entram na mesma ordem: o _id virtual
+        começa pelo ObjectId da regra, então a comparação dos _ids como texto
+        segue a do servidor.
+
+        Args:
+            year (int, optional): Ano para filtrar as transações
+            month (str, optional): Mês para filtrar as transações
+            type (str, optional): Tipo (Receita, Despesa ou Investimento)
+            category (str, optional): Categoria
+            paid (bool, optional): Status de pagamento
+            after (tuple, optional): Cursor (year, month_num, _id) da última linha da página anterior
+            limit (int): Tamanho da página
+
+        Returns:
+            tuple[pd.DataFrame, tuple | None]: (página formatada para exibição,
+                cursor da próxima página ou None se esta for a última)
+        """
+        query = page_query(self.user_id, year, month, type, category, paid, after)
+        documents = list(
+            self.transactions_collection.find(query, PAGE_PROJECTION)
+            .sort(PAGE_SORT)
+            .limit(limit + 1)
+        )
+
+        def matches(doc):
+            return ((month is None or doc['month'] == month)
+                    and (type is None or doc['type'] == type)
+                    and (category is None or doc['category'] == category)
+                    and (paid is None or bool(doc['paid']) == bool(paid))
+                    and (after is None or page_key(doc) > tuple(after)))
+
+        # Com a página cheia de linhas vivas, nada depois do ano da última entra nela
+        last_year = documents[-1]['year'] if len(documents) > limit else None
+        first_year = year if year is not None else (after[0] if after is not None else None)
+        extra = self._page_extras(first_year, year if year is not None else last_year, matches, limit)
+        if extra:
+            documents = sorted(documents + extra,
+                               key=page_key)[:limit + 1]
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            last = documents[-1]
+            next_cursor = page_key(last)
+
+        return build_transactions_frame(documents, DISPLAY_COLUMNS), next_cursor
+
+    def _page_extras(self, first_year, last_year, matches, limit):
+        """
+        Ocorrências de recorrências e linhas arquivadas candidatas a uma página
+
+        Só são expandidos os anos em [first_year, last_year] (None = sem limite),
+        em ordem crescente, e cada fonte para assim que reúne mais de limit
+        linhas: as seguintes ficariam depois delas na ordenação da página.
+        """
+        years = {}
+        if first_year is not None:
+            years['$gte'] = first_year
+        if last_year is not None:
+            years['$lte'] = last_year
+
+        extra = []
+        archived = 0
+        bucket_query = {'user_id': self.user_id}
+        if years:
+            bucket_query['year'] = years
+        for bucket in self.buckets_collection.find(bucket_query).sort('year', ASCENDING):
+            if archived > limit:
+                break
+            rows = [doc for doc in bucket_documents(bucket) if matches(doc)]
+            archived += len(rows)
+            extra.extend(rows)
+
+        rule_query = {'user_id': self.user_id}
+        if first_year is not None:
+            rule_query['end_year'] = {'$gte': first_year}
+        if last_year is not None:
+            rule_query['start_year'] = {'$lte': last_year}
+        for recurrence in self.recurrences_collection.find(rule_query):
+            start = max(int(recurrence['start_year']), first_year or 0)
+            end = int(recurrence['end_year'])
+            if last_year is not None:
+                end = min(end, last_year)
+            found = 0
+            for occurrence_year in range(start, end + 1):
+                if found > limit:
+                    break
+                rows = [doc for doc in recurrence_occurrences(recurrence, occurrence_year) if matches(doc)]
+                found += len(rows)
+                extra.extend(rows)
+        return extra
+
+    @instrument()
     def get_transactions_for_display(self, year=None):
         """
         Recupera transações formatadas para exibição na interface
@@ -111,32 +1080,154 @@ class FinancialTracker:
         Returns:
             pd.DataFrame: DataFrame formatado para exibição
         """
-        # Usa o método existente para obter as transações
-        df = self.get_transactions(year)
-        
-        if not df.empty:
-            # Os IDs já estão como strings desde o get_transactions
-            # Seleciona apenas as colunas necessárias para exibição
-            display_columns = ['_id', 'month', 'year', 'category', 'type', 'value', 
-                             'observation', 'paid', 'payment_date']
-            df = df[display_columns]
-        
-        return df
+        # Apenas as colunas exibidas são trazidas do banco
+        df = self.load_transactions(DISPLAY_COLUMNS, year)
+        return df if not df.empty else pd.DataFrame()
     
     
-    def financial_analysis(self, df):
+    def _rollups(self, year=None, month=None):
+        """
+        Lê os documentos de monthly_rollups do usuário (poucos documentos, independente do histórico)
+        """
+        query = {'user_id': self.user_id, 'count': {'$gt': 0}}
+        if year is not None:
+            query['year'] = year
+        if month is not None:
+            query['month'] = month
+        return list(self.rollups_collection.find(query, {'_id': 0, 'month': 1, 'type': 1, 'sum': 1, 'paid_sum': 1}))
+
+    @staticmethod
+    def _monthly_frame(rollups):
+        """
+        Converte rollups (mês, tipo, soma) na matriz mês × tipo
+
+        Apenas os meses com transações são retornados, na ordem do calendário,
+        e as três colunas de tipo estão sempre presentes.
+        """
+        if not rollups:
+            return pd.DataFrame(columns=TIPOS, dtype=float)
+
+        summary = pd.DataFrame(rollups).pivot_table(
+            index='month', columns='type', values='sum', aggfunc='sum', fill_value=0)
+
+        months = [m for m in MESES if m in summary.index] + [m for m in summary.index if m not in MESES]
+        summary = summary.reindex(index=months, columns=TIPOS, fill_value=0).astype(float)
+        summary.columns.name = 'type'
+        return summary
+
+    @instrument()
+    def monthly_summary(self, year=None):
+        """
+        Retorna a soma de valores por mês e tipo a partir dos rollups mensais
+
+        Args:
+            year (int, optional): Ano para filtrar as transações
+
+        Returns:
+            pd.DataFrame: Matriz mês × (Receita, Despesa, Investimento)
+        """
+        return self._monthly_frame(self._rollups(year))
+
+    @instrument()
+    def dashboard_summary(self, year=None, month=None):
+        """
+        Retorna a matriz mensal e os totais pagos/pendentes a partir de uma leitura de monthly_rollups
+
+        Args:
+            year (int, optional): Ano para filtrar as transações
+            month (str, optional): Mês para filtrar as transações
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: (matriz mês × tipo, totais por tipo
+                com as colunas 'total', 'paid' e 'pending')
+        """
+        rollups = self._rollups(year, month)
+
+        totals = pd.DataFrame(rollups, columns=['type', 'sum', 'paid_sum'])
+        totals = (totals.groupby('type')[['sum', 'paid_sum']].sum()
+                  .rename(columns={'sum': 'total', 'paid_sum': 'paid'})
+                  .reindex(TIPOS, fill_value=0).astype(float))
+        totals['pending'] = totals['total'] - totals['paid']
+
+        return self._monthly_frame(rollups), totals
+
+    def _period_frame(self, since=None):
+        """
+        Soma por período (PeriodIndex mensal) e tipo a partir dos rollups, desde o período informado
+        """
+        query = {'user_id': self.user_id, 'count': {'$gt': 0}}
+        if since is not None:
+            query['year'] = {'$gte': since.year}
+        rollups = pd.DataFrame(
+            list(self.rollups_collection.find(query, {'_id': 0, 'year': 1, 'month': 1, 'type': 1, 'sum': 1})),
+            columns=['year', 'month', 'type', 'sum']
+        )
+        rollups = rollups[rollups['month'].isin(MESES) & rollups['type'].isin(TIPOS)]
+
+        periods = pd.PeriodIndex(
+            pd.to_datetime(pd.DataFrame({
+                'year': rollups['year'].astype(int),
+                'month': rollups['month'].map(MESES.index).astype(int) + 1,
+                'day': 1
+            })).dt.to_period('M'),
+            name='period'
+        )
+        raw = (rollups.assign(period=periods)
+               .pivot_table(index='period', columns='type', values='sum', aggfunc='sum', fill_value=0)
+               .reindex(columns=TIPOS, fill_value=0).astype(float))
+        raw.columns.name = None
+        if since is not None:
+            raw = raw[raw.index >= since]
+        return raw
+
+    @instrument()
+    def history(self):
+        """
+        Histórico mensal de todos os anos do usuário, indexado por período (ano, mês)
+
+        Inclui o saldo (Net), médias móveis de 3, 6 e 12 meses, variações em
+        relação ao mesmo mês do ano anterior e o patrimônio acumulado. O
+        resultado fica em cache e é recalculado apenas a partir do último mês
+        calculado (ou do mês mais antigo alterado desde então).
+
+        Returns:
+            pd.DataFrame: Uma linha por mês, do primeiro ao último com transações
+        """
+        cached, dirty_from, version = self.history_cache.get(self.user_id)
+
+        if cached is None or cached.empty:
+            history = extend_history(None, self._period_frame())
+            self.history_cache.put(self.user_id, history, version)
+            return history.copy()
+
+        since = cached.index[-1] if dirty_from is None else min(dirty_from, cached.index[-1])
+        history = extend_history(cached[cached.index < since], self._period_frame(since))
+        self.history_cache.put(self.user_id, history, version, incremental=True)
+        return history.copy()
+
+    @instrument()
+    def financial_analysis(self, df=None, year=None):
         """
         Análise financeira consolidada com tratamento de dados
+
+        Args:
+            df (pd.DataFrame, optional): Transações já carregadas; se omitido, a
+                soma por mês e tipo vem dos rollups via monthly_summary
+            year (int, optional): Ano usado quando df não é informado
         """
-        if df.empty:
-            return pd.DataFrame()
-        
         # Garante que todos os meses estejam presentes
-        meses_ordem = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
-                       'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-        
-        # Agrupa por mês e tipo, preenchendo com zero para meses sem transações
-        summary = df.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
+        meses_ordem = MESES
+
+        if df is None:
+            summary = self.monthly_summary(year)
+        elif df.empty:
+            return pd.DataFrame()
+        else:
+            # Agrupa por mês e tipo, preenchendo com zero para meses sem transações
+            summary = df.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
+
+        if summary.empty:
+            return pd.DataFrame()
         
         # Reordena os meses
         summary = summary.reindex(meses_ordem)
@@ -149,10 +1240,13 @@ class FinancialTracker:
         return summary
 
     # Função de plotagem atualizada na interface Streamlit
+    @instrument()
     def plot_financial_analysis(self, analysis):
         """
         Cria gráfico de análise financeira com tratamento de dados
         """
+        import plotly.express as px
+        
         # Prepara dados para plotagem
         plot_data = analysis.reset_index()
         
@@ -178,52 +1272,284 @@ class FinancialTracker:
         Recupera uma transação específica pelo seu ID
         """
         from bson.objectid import ObjectId
+
+        occurrence = split_occurrence_id(transaction_id)
+        if occurrence:
+            recurrence_id, key = occurrence
+            recurrence = self.recurrences_collection.find_one({'_id': ObjectId(recurrence_id)})
+            year, month_num = map(int, key.split('-'))
+            return next((transaction for transaction in (recurrence_occurrences(recurrence, year) if recurrence else [])
+                         if transaction['month_num'] == month_num), None)
         
         transaction = self.transactions_collection.find_one({'_id': ObjectId(transaction_id)})
+        if transaction is None:
+            bucket = self.buckets_collection.find_one({'user_id': self.user_id, 'ids': ObjectId(transaction_id)})
+            if bucket:
+                transaction = next(doc for doc in bucket_documents(bucket) if doc['_id'] == ObjectId(transaction_id))
         return transaction
     
+    @instrument()
     def update_transaction(self, transaction_id, updates):
         """
         Atualiza uma transação existente
         """
         from bson.objectid import ObjectId
         
-        # Verifica propriedade da transação
-        transaction = self.transactions_collection.find_one({
-            '_id': ObjectId(transaction_id),
-            'user_id': self.user_id
-        })
-        
-        if not transaction:
-            raise ValueError("Transação não encontrada ou não pertence ao usuário")
-        
         # Remove campos sensíveis dos updates
         updates.pop('_id', None)
         updates.pop('user_id', None)
+        if 'month' in updates:
+            updates['month_num'] = MESES.index(updates['month']) + 1
+
+        if split_occurrence_id(transaction_id):
+            result = self._apply_occurrence_changes(updates={transaction_id: updates})
+            if not result['matched']:
+                raise ValueError("Transação não encontrada ou não pertence ao usuário")
+            return result['modified'] > 0
         
-        result = self.transactions_collection.update_one(
-            {'_id': ObjectId(transaction_id), 'user_id': self.user_id}, 
-            {'$set': updates}
-        )
-        return result.modified_count > 0
+        # Verifica propriedade da transação no próprio filtro
+        def write(session):
+            transaction = self.transactions_collection.find_one_and_update(
+                {'_id': ObjectId(transaction_id), 'user_id': self.user_id}, 
+                {'$set': updates},
+                projection=ROLLUP_PROJECTION,
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if transaction:
+                self._update_rollups([transaction], [{**transaction, **updates}], session=session)
+            return transaction
+        
+        transaction = self._write(write)
+        if not transaction:
+            if self._unarchive_containing([ObjectId(transaction_id)]):
+                return self.update_transaction(transaction_id, updates)
+            raise ValueError("Transação não encontrada ou não pertence ao usuário")
+
+        return {**transaction, **updates} != transaction
     
+    @instrument()
     def delete_transaction(self, transaction_id):
         """
         Deleta uma transação específica
         """
         from bson.objectid import ObjectId
+
+        if split_occurrence_id(transaction_id):
+            return self._apply_occurrence_changes(deletes=[transaction_id])['deleted'] > 0
         
         # Verifica propriedade antes de deletar
-        result = self.transactions_collection.delete_one({
-            '_id': ObjectId(transaction_id),
-            'user_id': self.user_id
-        })
-        return result.deleted_count > 0
+        def write(session):
+            transaction = self.transactions_collection.find_one_and_delete(
+                {'_id': ObjectId(transaction_id), 'user_id': self.user_id},
+                projection=ROLLUP_PROJECTION,
+                session=session
+            )
+            self._update_rollups(old_transactions=[transaction] if transaction else [], session=session)
+            return transaction
+
+        transaction = self._write(write)
+        if transaction is None and self._unarchive_containing([ObjectId(transaction_id)]):
+            return self.delete_transaction(transaction_id)
+        return transaction is not None
+
+    @instrument()
+    def apply_changes(self, updates=None, deletes=None):
+        """
+        Aplica atualizações e exclusões em um único bulk_write restrito ao usuário
+
+        O filtro de cada operação inclui o user_id, então a verificação de
+        propriedade acontece no próprio servidor, sem um find_one por linha.
+        Uma única leitura prévia das linhas afetadas alimenta os rollups mensais.
+        Ocorrências de recorrências viram overrides na regra (ver _apply_occurrence_changes).
+
+        Args:
+            updates (dict, optional): {transaction_id: {campo: valor}}
+            deletes (list, optional): IDs das transações a excluir
+
+        Returns:
+            dict: Contagens 'matched', 'modified' e 'deleted'
+        """
+        from bson.objectid import ObjectId
+
+        operations = []
+        cleaned = {}
+        virtual_updates = {}
+        for transaction_id, fields in (updates or {}).items():
+            fields = dict(fields)
+            # Remove campos sensíveis dos updates
+            fields.pop('_id', None)
+            fields.pop('user_id', None)
+            if 'paid' in fields:
+                fields['payment_date'] = datetime.now() if fields['paid'] else None
+            if 'month' in fields:
+                fields['month_num'] = MESES.index(fields['month']) + 1
+            if fields and split_occurrence_id(transaction_id):
+                virtual_updates[str(transaction_id)] = fields
+            elif fields:
+                cleaned[str(transaction_id)] = fields
+                operations.append(UpdateOne(
+                    {'_id': ObjectId(transaction_id), 'user_id': self.user_id},
+                    {'$set': fields}
+                ))
+
+        virtual_deletes = [str(transaction_id) for transaction_id in deletes or []
+                           if split_occurrence_id(transaction_id)]
+        deletes = [transaction_id for transaction_id in deletes or [] if not split_occurrence_id(transaction_id)]
+        for transaction_id in deletes:
+            operations.append(DeleteOne({'_id': ObjectId(transaction_id), 'user_id': self.user_id}))
+
+        counts = {'matched': 0, 'modified': 0, 'deleted': 0}
+        if virtual_updates or virtual_deletes:
+            counts = self._apply_occurrence_changes(virtual_updates, virtual_deletes)
+        if not operations:
+            return counts
+
+        # Estado anterior das transações afetadas, para os incrementos dos rollups
+        ids = [ObjectId(transaction_id) for transaction_id in list(cleaned) + deletes]
+        previous = {
+            str(doc['_id']): doc
+            for doc in self.transactions_collection.find(
+                {'_id': {'$in': ids}, 'user_id': self.user_id}, ROLLUP_PROJECTION)
+        }
+        # Linhas de anos arquivados: o ano volta para transactions antes da escrita
+        missing = [object_id for object_id in ids if str(object_id) not in previous]
+        if missing and self._unarchive_containing(missing):
+            previous.update(
+                (str(doc['_id']), doc)
+                for doc in self.transactions_collection.find(
+                    {'_id': {'$in': missing}, 'user_id': self.user_id}, ROLLUP_PROJECTION))
+
+        deleted = set(map(str, deletes)) & set(previous)
+        changed = [transaction_id for transaction_id in cleaned
+                   if transaction_id in previous and transaction_id not in deleted]
+
+        def write(session):
+            result = self.transactions_collection.bulk_write(operations, ordered=False, session=session)
+            self._update_rollups(
+                old_transactions=[previous[transaction_id] for transaction_id in changed + sorted(deleted)],
+                new_transactions=[{**previous[transaction_id], **cleaned[transaction_id]}
+                                  for transaction_id in changed],
+                session=session
+            )
+            return result
+
+        try:
+            result = self._write(write)
+        finally:
+            self.cache.invalidate(self.user_id)
+        return {
+            'matched': counts['matched'] + result.matched_count,
+            'modified': counts['modified'] + result.modified_count,
+            'deleted': counts['deleted'] + result.deleted_count
+        }
+
+    @instrument()
+    def investment_positions(self, price_service=None):
+        """
+        Posições em renda variável do usuário, avaliadas pela cotação atual
+
+        As cotações vêm do serviço compartilhado; quando alguma está vencida,
+        um único download atualiza os tickers de todas as carteiras.
+
+        Args:
+            price_service (PriceService, optional): Serviço de cotações; usa o compartilhado se omitido
+
+        Returns:
+            pd.DataFrame: Uma linha por ticker, com 'quantity', 'price' e 'market_value'
+                (NaN quando não há cotação)
+        """
+        holdings = pd.DataFrame(
+            list(self.investments_collection.find(
+                {'user_id': self.user_id, 'ticker': {'$gt': ''}}, {'_id': 0, 'ticker': 1, 'quantity': 1})),
+            columns=['ticker', 'quantity']
+        )
+        positions = holdings.groupby('ticker')['quantity'].sum().astype(float).to_frame()
+        if positions.empty:
+            return positions.assign(price=pd.Series(dtype=float), market_value=pd.Series(dtype=float))
+
+        prices = (price_service or shared_price_service()).get_prices(positions.index)
+        positions['price'] = positions.index.map(prices).astype(float)
+        positions['market_value'] = positions['quantity'] * positions['price']
+        return positions
+
+    @instrument()
+    def portfolio_history(self, start=None, store=None, provider=None):
+        """
+        Valor diário da carteira de renda variável do usuário
+
+        Os preços vêm das séries mapeadas em memória; quando faltam tickers ou
+        pregões recentes, todas as carteiras são atualizadas em um único download.
+
+        Args:
+            start (date, optional): Primeira data do gráfico; desde a primeira compra se omitida
+            store (PriceHistoryStore, optional): Séries de preços; usa as compartilhadas se omitido
+            provider (optional): Provedor de histórico; usa o do serviço de cotações se omitido
+
+        Returns:
+            pd.Series: Valor da carteira por data (vazia se não houver posições)
+        """
+        holdings = pd.DataFrame(
+            list(self.investments_collection.find(
+                {'user_id': self.user_id, 'ticker': {'$gt': ''}},
+                {'_id': 0, 'ticker': 1, 'quantity': 1, 'purchase_date': 1})),
+            columns=['ticker', 'quantity', 'purchase_date']
+        )
+        if holdings.empty:
+            return pd.Series(dtype=float, name='Valor da Carteira')
+
+        store = store or shared_price_history_store()
+        tickers = sorted(holdings['ticker'].unique())
+        dates = store.dates()
+        last_session = (pd.Timestamp.now().normalize() - pd.offsets.BDay(1)).to_datetime64()
+        if not len(dates) or dates[-1] < last_session or not store.has_series(tickers):
+            store.refresh(held_tickers(self.db), provider or shared_price_service().provider)
+
+        if start is None and holdings['purchase_date'].notna().any():
+            start = pd.to_datetime(holdings['purchase_date']).min()
+        dates, prices = store.matrix(tickers, start=start)
+        return portfolio_value(dates, prices, tickers, holdings)
+
+    @instrument()
+    def fixed_income_positions(self, accrual=None, as_of=None):
+        """
+        Posições pós-fixadas (% do CDI) do usuário, avaliadas em lote
+
+        Cada documento de renda fixa em investments tem 'name', 'principal',
+        'start_date', 'cdi_percent' e, opcionalmente, 'maturity_date'.
+
+        Args:
+            accrual (CDIAccrual, optional): Avaliador; usa o compartilhado se omitido
+            as_of (date, optional): Data de avaliação; hoje se omitida
+
+        Returns:
+            pd.DataFrame: Uma linha por posição, com valor bruto, rendimento, IR e valor líquido
+        """
+        positions = pd.DataFrame(
+            list(self.investments_collection.find(
+                {'user_id': self.user_id, 'cdi_percent': {'$exists': True}},
+                {'name': 1, 'principal': 1, 'start_date': 1, 'cdi_percent': 1, 'maturity_date': 1})),
+            columns=['_id', 'name', 'principal', 'start_date', 'cdi_percent', 'maturity_date']
+        )
+        if positions.empty:
+            return positions
+
+        values = (accrual or shared_cdi_accrual()).value(
+            positions['principal'], positions['start_date'], positions['cdi_percent'],
+            as_of=as_of, maturity_date=positions['maturity_date']
+        )
+        positions['_id'] = positions['_id'].astype(str)
+        return positions.assign(**values)
 
     def get_transactions_ids(self, year=None):
         """
-        Recupera os IDs das transações
+        Recupera os IDs das transações do usuário (consulta coberta pelo índice user_year_month_id),
+        incluindo os anos arquivados e os IDs virtuais das ocorrências de recorrências
         """
-        query = {} if year is None else {'year': year}
+        query = {'user_id': self.user_id}
+        if year is not None:
+            query['year'] = year
         transactions = list(self.transactions_collection.find(query, {'_id': 1}))
-        return [str(trans['_id']) for trans in transactions]
+        archived = [str(object_id) for bucket in self._buckets(year) for object_id in bucket['ids']]
+        return [str(trans['_id']) for trans in transactions] + archived + [
+            occurrence['_id'] for occurrence in self._virtual_transactions(year)]
@@ -0,0 +1,189 @@
+import json
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Série 12 do SGS do Banco Central: taxa DI diária, em % ao dia, por dia útil
+BCB_CDI_URL = ('https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados'
+               '?formato=json&dataInicial={start}&dataFinal={end}')
+
+# Tabela regressiva do IR sobre o rendimento, por prazo em dias corridos
+IR_BRACKETS = [(180, 0.225), (360, 0.20), (720, 0.175)]
+IR_FLOOR = 0.15
+
+_accruals = {}
+_accruals_lock = threading.Lock()
+_accruals_inflight = {}  # chave -> Future da montagem em andamento
+
+
+def fetch_cdi_series(start, end=None, timeout=30) -> pd.Series:
+    """
+    Baixa a taxa DI diária (% ao dia) do Banco Central entre start e end
+
+    Returns:
+        pd.Series: Taxas indexadas pela data (dias úteis)
+    """
+    from urllib.request import urlopen
+
+    end = end or datetime.now()
+    url = BCB_CDI_URL.format(start=pd.Timestamp(start).strftime('%d/%m/%Y'),
+                             end=pd.Timestamp(end).strftime('%d/%m/%Y'))
+    with urlopen(url, timeout=timeout) as response:
+        rows = json.load(response)
+    return pd.Series(
+        [float(row['valor']) for row in rows],
+        index=pd.to_datetime([row['data'] for row in rows], format='%d/%m/%Y'),
+        name='cdi'
+    )
+
+
+def ir_rate(days):
+    """
+    Alíquota de IR da tabela regressiva para cada prazo em dias corridos (vetorizado)
+    """
+    days = np.asarray(days)
+    limits = np.array([limit for limit, _ in IR_BRACKETS])
+    rates = np.array([rate for _, rate in IR_BRACKETS] + [IR_FLOOR])
+    return rates[np.searchsorted(limits, days, side='left')]
+
+
+class CDIAccrual:
+    """
+    Avalia posições pós-fixadas (% do CDI) em lote a partir da série diária do DI
+
+    O fator acumulado de cada percentual distinto é calculado uma única vez
+    com cumprod sobre os dias úteis; cada posição é então avaliada por busca
+    de índice (data de início e de avaliação) na matriz de fatores.
+
+    O fator diário de um título a p% do CDI é 1 + p × TDI, onde TDI é a taxa
+    DI do dia. Como (1 + p × TDI) não é uma potência do fator do CDI, há uma
+    linha de fatores por percentual distinto, e não um único fator elevado a p.
+    """
+
+    def __init__(self, daily_rates: pd.Series):
+        """
+        Args:
+            daily_rates (pd.Series): Taxa DI em % ao dia, indexada pelos dias úteis
+        """
+        daily_rates = daily_rates.sort_index()
+        self.dates = daily_rates.index.values.astype('datetime64[D]')
+        self.rates = daily_rates.to_numpy(dtype=np.float64) / 100
+        self._factors = {}
+
+    def cumulative_factors(self, percents):
+        """
+        Retorna a matriz (percentuais, dias + 1) de fatores acumulados, com a primeira coluna igual a 1
+
+        As linhas ficam em cache por percentual; os percentuais novos são
+        calculados juntos em um único cumprod.
+
+        Args:
+            percents (array-like): Percentuais do CDI distintos (ex.: 100, 110)
+        """
+        percents = [float(percent) for percent in percents]
+        new = [percent for percent in percents if percent not in self._factors]
+        if new:
+            daily = 1 + np.array(new)[:, None] / 100 * self.rates[None, :]
+            factors = np.ones((len(new), len(self.rates) + 1))
+            np.cumprod(daily, axis=1, out=factors[:, 1:])
+            self._factors.update(zip(new, factors))
+        return np.stack([self._factors[percent] for percent in percents])
+
+    def value(self, principal, start_date, cdi_percent, as_of=None, maturity_date=None) -> dict:
+        """
+        Avalia todas as posições de uma vez
+
+        O rendimento corre do dia da aplicação (inclusive) até a data de
+        avaliação ou o vencimento, o que vier antes (exclusive).
+
+        Args:
+            principal (array-like): Valores aplicados
+            start_date (array-like): Datas de aplicação
+            cdi_percent (array-like): Percentual do CDI de cada posição (ex.: 110)
+            as_of (date, optional): Data de avaliação; hoje se omitida
+            maturity_date (array-like, optional): Vencimentos (NaT quando não houver)
+
+        Returns:
+            dict: Arrays por posição: 'gross', 'gain', 'days', 'ir_rate', 'ir' e 'net'
+        """
+        principal = np.asarray(principal, dtype=np.float64)
+        start = pd.to_datetime(np.asarray(start_date)).values.astype('datetime64[D]')
+        as_of = np.datetime64(pd.Timestamp(as_of or datetime.now()).date(), 'D')
+        end = np.full(start.shape, as_of)
+        if maturity_date is not None:
+            maturity = pd.to_datetime(np.asarray(maturity_date)).values.astype('datetime64[D]')
+            end = np.where(~np.isnat(maturity) & (maturity < end), maturity, end)
+        end = np.maximum(end, start)
+
+        percents, percent_index = np.unique(np.asarray(cdi_percent, dtype=np.float64), return_inverse=True)
+        factors = self.cumulative_factors(percents)
+        start_index = np.searchsorted(self.dates, start, side='left')
+        end_index = np.searchsorted(self.dates, end, side='left')
+        factor = factors[percent_index, end_index] / factors[percent_index, start_index]
+
+        gross = principal * factor
+        gain = gross - principal
+        days = (end - start).astype(np.int64)
+        rates = ir_rate(days)
+        ir = np.maximum(gain, 0) * rates
+        return {
+            'gross': gross,
+            'gain': gain,
+            'days': days,
+            'ir_rate': rates,
+            'ir': ir,
+            'net': gross - ir,
+        }
+
+
+def load_cdi_series(path) -> pd.Series:
+    """
+    Lê a série do DI de um CSV com as colunas 'data' e 'valor' (% ao dia)
+    """
+    frame = pd.read_csv(path, parse_dates=['data'])
+    return pd.Series(frame['valor'].to_numpy(dtype=np.float64), index=pd.DatetimeIndex(frame['data']), name='cdi')
+
+
+def get_cdi_accrual(path=None, start=None) -> CDIAccrual:
+    """
+    Retorna o avaliador compartilhado pelo processo, montado uma vez por dia
+
+    Args:
+        path (str, optional): CSV com a série do DI; se omitido, a série é baixada do Banco Central
+        start: Primeira data da série baixada; por padrão, os últimos 10 anos
+            (limite do Banco Central para séries diárias)
+
+    A série é lida ou baixada fora do lock: a primeira chamada de cada chave
+    monta o avaliador e as concorrentes aguardam o mesmo Future.
+    """
+    key = (path, datetime.now().date())
+    with _accruals_lock:
+        accrual = _accruals.get(key)
+        if accrual is not None:
+            return accrual
+        future = _accruals_inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _accruals_inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        if path:
+            series = load_cdi_series(path)
+        else:
+            series = fetch_cdi_series(start or pd.Timestamp.now() - pd.DateOffset(years=10) + pd.Timedelta(days=1))
+        accrual = CDIAccrual(series)
+    except BaseException as e:
+        with _accruals_lock:
+            del _accruals_inflight[key]
+        future.set_exception(e)
+        raise
+    with _accruals_lock:
+        _accruals.clear()
+        _accruals[key] = accrual
+        del _accruals_inflight[key]
+    future.set_result(accrual)
+    return accrual
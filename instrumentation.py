@@ -0,0 +1,155 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+METRIC_PREFIX = 'financial_app'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+_current = ContextVar('rerun_metrics', default=None)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class RerunMetrics:
+    """
+    Tempos e contagens de cada span durante um rerun do script Streamlit
+    """
+
+    def __init__(self, **labels):
+        self.labels = labels
+        self.spans = {}  # nome -> [chamadas, tempo total, maior tempo]
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def add(self, name, elapsed):
+        entry = self.spans.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def rows(self):
+        """
+        Spans ordenados pelo tempo total: (nome, chamadas, total, maior)
+        """
+        return sorted(((name, *entry) for name, entry in self.spans.items()),
+                      key=lambda row: row[2], reverse=True)
+
+
+def current_metrics():
+    """
+    Retorna as métricas do rerun em andamento nesta thread, ou None
+    """
+    return _current.get()
+
+
+def label_rerun(**labels):
+    """
+    Acrescenta rótulos (ex.: page) às métricas do rerun em andamento
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.labels.update(labels)
+
+
+@contextmanager
+def span(name):
+    """
+    Mede o bloco e o registra no rerun em andamento (sem efeito fora de um rerun)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add(name, time.perf_counter() - start)
+
+
+def count(name):
+    """
+    Registra uma ocorrência do evento no rerun em andamento, como span de duração zero
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(name, 0.0)
+
+
+def instrument(name=None):
+    """
+    Decorador que mede cada chamada da função como um span (por padrão, Classe.método)
+    """
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure_metrics_file(path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    Ativa a gravação das métricas de cada rerun em um arquivo rotativo (chamadas seguintes são ignoradas)
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None and path:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            writer = logging.getLogger(f'{__name__}.prometheus')
+            writer.propagate = False
+            writer.setLevel(logging.INFO)
+            writer.addHandler(handler)
+            _writer = writer
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_lines(metrics):
+    """
+    Converte as métricas de um rerun em amostras no formato texto do Prometheus, com timestamp em ms
+    """
+    timestamp = int(metrics.started_at * 1000)
+    labels = ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(metrics.labels.items()))
+    prefix = f'{labels},' if labels else ''
+
+    lines = [f'{METRIC_PREFIX}_rerun_seconds{{{labels}}} {metrics.duration:.6f} {timestamp}']
+    for name, calls, total, longest in metrics.rows():
+        span_labels = f'{prefix}span="{_escape(name)}"'
+        lines.append(f'{METRIC_PREFIX}_span_seconds{{{span_labels}}} {total:.6f} {timestamp}')
+        lines.append(f'{METRIC_PREFIX}_span_max_seconds{{{span_labels}}} {longest:.6f} {timestamp}')
+        lines.append(f'{METRIC_PREFIX}_span_calls{{{span_labels}}} {calls} {timestamp}')
+    return lines
+
+
+@contextmanager
+def rerun(**labels):
+    """
+    Delimita um rerun: os spans registrados dentro dele são agregados e,
+    ao final, gravados no arquivo de métricas (se configurado)
+
+    Yields:
+        RerunMetrics: Métricas do rerun, para o painel de depuração
+    """
+    metrics = RerunMetrics(**labels)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        metrics.finish()
+        if _writer is not None:
+            _writer.info('\n'.join(prometheus_lines(metrics)))
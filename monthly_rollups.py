@@ -0,0 +1,193 @@
+import argparse
+import logging
+import sys
+import threading
+from collections import defaultdict
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from db_connection import get_database, supports_transactions
+
+ROLLUP_COLLECTION = 'monthly_rollups'
+ROLLUP_KEY = ('user_id', 'year', 'month', 'type')
+DRIFT_TOLERANCE = 0.005
+
+_ensured = False
+_ensured_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _rollup_key(transaction):
+    """
+    Retorna a chave (user_id, year, month, type) de uma transação
+    """
+    return tuple(transaction.get(field) for field in ROLLUP_KEY)
+
+
+def rollup_deltas(old_transactions=(), new_transactions=()):
+    """
+    Calcula os incrementos de soma, soma paga e contagem por chave de rollup
+
+    A contribuição das versões antigas é subtraída e a das novas somada, então
+    inserções, edições e exclusões usam a mesma função.
+
+    Args:
+        old_transactions (iterable[dict]): Transações antes da escrita
+        new_transactions (iterable[dict]): Transações depois da escrita
+
+    Returns:
+        dict: {chave: {'sum': float, 'paid_sum': float, 'count': int}}
+    """
+    deltas = defaultdict(lambda: {'sum': 0.0, 'paid_sum': 0.0, 'count': 0})
+    for sign, transactions in ((-1, old_transactions), (1, new_transactions)):
+        for transaction in transactions:
+            value = float(transaction.get('value') or 0)
+            delta = deltas[_rollup_key(transaction)]
+            delta['sum'] += sign * value
+            delta['paid_sum'] += sign * value if transaction.get('paid') else 0.0
+            delta['count'] += sign
+
+    return {key: delta for key, delta in deltas.items()
+            if delta['count'] or abs(delta['sum']) > 0 or abs(delta['paid_sum']) > 0}
+
+
+def apply_rollup_deltas(collection, deltas, session=None):
+    """
+    Aplica os incrementos com $inc (upsert) em um único bulk_write, na sessão informada
+    """
+    operations = []
+    for key, delta in deltas.items():
+        operations.append(UpdateOne(dict(zip(ROLLUP_KEY, key)), {'$inc': delta}, upsert=True))
+    if operations:
+        collection.bulk_write(operations, ordered=False, session=session)
+
+
+def _rollups_from_transactions(db, user_id=None):
+    """
+    Recalcula os rollups a partir das transações brutas, das ocorrências das recorrências e dos anos arquivados
+    """
+    pipeline = []
+    if user_id is not None:
+        pipeline.append({'$match': {'user_id': user_id}})
+    pipeline.append({'$group': {
+        '_id': {field: f'${field}' for field in ROLLUP_KEY},
+        'sum': {'$sum': '$value'},
+        'paid_sum': {'$sum': {'$cond': [{'$eq': ['$paid', True]}, '$value', 0]}},
+        'count': {'$sum': 1}
+    }})
+    expected = {
+        tuple(row['_id'].get(field) for field in ROLLUP_KEY): row
+        for row in db['transactions'].aggregate(pipeline, allowDiskUse=True)
+    }
+
+    # Recorrências contribuem com cada ocorrência expandida e anos arquivados com
+    # cada linha do documento colunar (import tardio: financial_tracker importa este módulo)
+    from financial_tracker import (ARCHIVE_COLLECTION, RECURRENCE_COLLECTION, bucket_documents,
+                                   recurrence_occurrences)
+    query = {} if user_id is None else {'user_id': user_id}
+    occurrences = [occurrence for recurrence in db[RECURRENCE_COLLECTION].find(query)
+                   for occurrence in recurrence_occurrences(recurrence)]
+    archived = []
+    for bucket in db[ARCHIVE_COLLECTION].find(query):
+        # Um (des)arquivamento interrompido deixa a linha nos dois lugares: conta só a de transactions
+        live = {doc['_id'] for doc in db['transactions'].find({'_id': {'$in': bucket['ids']}}, {'_id': 1})}
+        archived.extend(doc for doc in bucket_documents(bucket) if doc['_id'] not in live)
+    for key, delta in rollup_deltas(new_transactions=occurrences + archived).items():
+        row = expected.setdefault(key, {'sum': 0.0, 'paid_sum': 0.0, 'count': 0})
+        for field in ('sum', 'paid_sum', 'count'):
+            row[field] += delta[field]
+    return expected
+
+
+def rebuild_rollups(db=None, user_id=None, verify_only=False):
+    """
+    Recalcula os rollups a partir das transações e reporta divergências
+
+    Args:
+        db: Banco de dados; usa o banco compartilhado se omitido
+        user_id (str, optional): Restringe a um usuário
+        verify_only (bool): Apenas compara, sem reescrever os rollups
+
+    Returns:
+        list[dict]: Uma entrada por chave divergente, com 'key', 'expected' e 'stored'
+    """
+    if db is None:
+        db = get_database()
+    collection = db[ROLLUP_COLLECTION]
+
+    expected = _rollups_from_transactions(db, user_id)
+    stored_query = {} if user_id is None else {'user_id': user_id}
+    stored = {_rollup_key(doc): doc for doc in collection.find(stored_query)}
+
+    drift = []
+    for key in set(expected) | set(stored):
+        exp = expected.get(key, {'sum': 0.0, 'paid_sum': 0.0, 'count': 0})
+        got = stored.get(key, {'sum': 0.0, 'paid_sum': 0.0, 'count': 0})
+        if (exp['count'] != got['count']
+                or abs(exp['sum'] - got['sum']) > DRIFT_TOLERANCE
+                or abs(exp['paid_sum'] - got['paid_sum']) > DRIFT_TOLERANCE):
+            drift.append({
+                'key': dict(zip(ROLLUP_KEY, key)),
+                'expected': {field: exp[field] for field in ('sum', 'paid_sum', 'count')},
+                'stored': {field: got[field] for field in ('sum', 'paid_sum', 'count')},
+            })
+
+    if not verify_only:
+        # Substituição por chave (upsert) em vez de apagar e reinserir: não há janela
+        # sem rollups nem conflito com o índice único se outro processo escrever ao mesmo tempo
+        operations = []
+        for key, row in expected.items():
+            doc = dict(zip(ROLLUP_KEY, key))
+            doc.update(sum=row['sum'], paid_sum=row['paid_sum'], count=row['count'])
+            operations.append(ReplaceOne(dict(zip(ROLLUP_KEY, key)), doc, upsert=True))
+        operations.extend(DeleteOne(dict(zip(ROLLUP_KEY, key))) for key in set(stored) - set(expected))
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+    return drift
+
+
+def ensure_rollups_once(db=None):
+    """
+    Gera os rollups na primeira execução, quando a coleção ainda está vazia
+
+    Sem suporte a transações (servidor standalone), a escrita e o $inc dos
+    rollups são separados; os rollups são então conferidos uma vez por
+    processo e reconstruídos se divergirem das transações.
+    """
+    global _ensured
+    if _ensured:
+        return
+    with _ensured_lock:
+        if not _ensured:
+            if db is None:
+                db = get_database()
+            if db[ROLLUP_COLLECTION].estimated_document_count() == 0:
+                rebuild_rollups(db)
+            elif not supports_transactions(db.client):
+                drift = rebuild_rollups(db, verify_only=True)
+                if drift:
+                    logger.warning("%d rollups divergentes das transações; reconstruindo", len(drift))
+                    rebuild_rollups(db)
+            _ensured = True
+
+
+def main():
+    """
+    Uso: python -m monthly_rollups [--verify] [--user USER_ID]
+    """
+    parser = argparse.ArgumentParser(description='Reconstrói ou verifica os rollups mensais')
+    parser.add_argument('--verify', action='store_true', help='apenas reporta divergências')
+    parser.add_argument('--user', help='restringe a um usuário')
+    args = parser.parse_args()
+
+    drift = rebuild_rollups(user_id=args.user, verify_only=args.verify)
+    for entry in drift:
+        print(f"{entry['key']}: esperado {entry['expected']}, armazenado {entry['stored']}")
+    action = 'encontradas' if args.verify else 'corrigidas'
+    print(f"{len(drift)} divergências {action}")
+
+    return 1 if drift and args.verify else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
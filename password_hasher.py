@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+DEFAULT_TIMEOUT = 10  # segundos
+DEFAULT_MAX_WORKERS = os.cpu_count() or 2
+PENDING_PER_WORKER = 4  # pedidos aguardando na fila por processo do pool
+
+_executor = None
+_executor_lock = threading.Lock()
+_max_workers = DEFAULT_MAX_WORKERS
+_max_pending = None
+_slots = None
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def configure(max_workers=None, max_pending=None):
+    """
+    Define o tamanho do pool de processos e o limite de pedidos em andamento
+    (executando ou na fila; padrão PENDING_PER_WORKER por processo), antes do primeiro uso
+    """
+    global _max_workers, _max_pending
+    if max_workers:
+        _max_workers = int(max_workers)
+    if max_pending:
+        _max_pending = int(max_pending)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos compartilhado, criado no primeiro uso
+
+    O bcrypt é CPU-bound; rodá-lo em processos separados evita que logins
+    simultâneos disputem a thread do script Streamlit com a renderização.
+    """
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(_max_pending or _max_workers * PENDING_PER_WORKER)
+                # spawn evita herdar as threads do servidor Streamlit via fork
+                _executor = ProcessPoolExecutor(
+                    max_workers=_max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def shutdown():
+    """
+    Encerra o pool de processos
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _submit(fn, *args, timeout=None):
+    """
+    Agenda fn no pool se houver vaga entre os pedidos em andamento
+
+    A vaga é esperada por no máximo timeout segundos (0 = não espera) e é
+    devolvida quando o pedido termina ou é cancelado, então uma rajada de
+    logins não acumula trabalho que ninguém mais vai esperar.
+
+    Raises:
+        concurrent.futures.TimeoutError: Se não houver vaga a tempo
+    """
+    executor = get_executor()
+    if not _slots.acquire(timeout=timeout):
+        raise TimeoutError("Fila de hash de senhas cheia")
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def _call(submit, *args, timeout=None):
+    """
+    Agenda e aguarda o pedido com um único prazo para a vaga na fila e o resultado;
+    no timeout o pedido ainda na fila é cancelado
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    future = submit(*args, timeout=_remaining(deadline))
+    try:
+        return future.result(timeout=_remaining(deadline))
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def submit_hash(password: str, rounds=DEFAULT_ROUNDS, timeout=None):
+    """
+    Agenda o hash da senha no pool e retorna um concurrent.futures.Future
+
+    Raises:
+        concurrent.futures.TimeoutError: Se a fila do pool estiver cheia por mais de timeout segundos
+    """
+    return _submit(_hashpw, password.encode('utf-8'), rounds, timeout=timeout)
+
+
+def submit_verify(password: str, hashed: bytes, timeout=None):
+    """
+    Agenda a verificação da senha no pool e retorna um concurrent.futures.Future
+
+    Raises:
+        concurrent.futures.TimeoutError: Se a fila do pool estiver cheia por mais de timeout segundos
+    """
+    return _submit(_checkpw, password.encode('utf-8'), bytes(hashed), timeout=timeout)
+
+
+def hash_password(password: str, rounds=DEFAULT_ROUNDS, timeout=DEFAULT_TIMEOUT) -> bytes:
+    """
+    Gera o hash bcrypt da senha, aguardando no máximo timeout segundos no total
+    (vaga na fila e execução)
+
+    Raises:
+        concurrent.futures.TimeoutError: Se o pool não responder a tempo
+    """
+    return _call(submit_hash, password, rounds, timeout=timeout)
+
+
+def verify_password(password: str, hashed: bytes, timeout=DEFAULT_TIMEOUT) -> bool:
+    """
+    Verifica a senha contra o hash, aguardando no máximo timeout segundos no total
+    (vaga na fila e execução)
+
+    Raises:
+        concurrent.futures.TimeoutError: Se o pool não responder a tempo
+    """
+    return _call(submit_verify, password, hashed, timeout=timeout)
+
+
+async def ahash_password(password: str, rounds=DEFAULT_ROUNDS, timeout=DEFAULT_TIMEOUT) -> bytes:
+    """
+    Versão awaitable de hash_password (não espera por vaga na fila, para não bloquear o loop)
+    """
+    # wait_for cancela o Future do pool junto com a tarefa no timeout
+    return await asyncio.wait_for(asyncio.wrap_future(submit_hash(password, rounds, timeout=0)), timeout)
+
+
+async def averify_password(password: str, hashed: bytes, timeout=DEFAULT_TIMEOUT) -> bool:
+    """
+    Versão awaitable de verify_password (não espera por vaga na fila, para não bloquear o loop)
+    """
+    return await asyncio.wait_for(asyncio.wrap_future(submit_verify(password, hashed, timeout=0)), timeout)
+
+
+def get_rounds(hashed: bytes) -> int:
+    """
+    Extrai o fator de custo de um hash bcrypt ($2b$<custo>$...)
+    """
+    return int(bytes(hashed).split(b'$')[2])
+
+
+def needs_rehash(hashed: bytes, rounds=DEFAULT_ROUNDS) -> bool:
+    """
+    Indica se o hash foi gerado com um custo diferente do configurado
+    """
+    return get_rounds(hashed) != rounds
@@ -0,0 +1,243 @@
+import os
+import re
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+DATES_FILE = 'dates.npy'
+CURRENT_FILE = 'CURRENT'  # nome da versão (subdiretório) em uso
+REFRESH_INTERVAL = 60 * 60  # segundos entre downloads pedidos pelo mesmo processo
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _ticker_file(ticker):
+    """
+    Nome de arquivo seguro para o ticker (ex.: 'PETR4.SA' -> 'PETR4.SA.npy')
+    """
+    return re.sub(r'[^A-Za-z0-9._-]', '_', ticker) + '.npy'
+
+
+class PriceHistoryStore:
+    """
+    Séries históricas de fechamento em arrays NumPy mapeados em memória
+
+    Cada versão é um subdiretório com um índice de datas (dates.npy,
+    datetime64[D]) e um arquivo por ticker, alinhado a esse índice e já
+    preenchido para frente (NaN antes da primeira cotação). O arquivo CURRENT
+    aponta a versão em uso e é trocado atomicamente depois que a nova versão
+    está completa, então um leitor sempre vê datas e séries da mesma
+    atualização. Os arquivos são abertos com mmap_mode='r', então sessões e
+    processos diferentes compartilham as mesmas páginas do sistema operacional
+    e nada é carregado por inteiro em DataFrames.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._arrays = {}  # arquivo -> (mtime, memmap)
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._last_refresh = {}  # tickers -> momento do último download
+
+    def _version(self):
+        """
+        Diretório da versão em uso (a própria raiz no formato antigo, sem CURRENT)
+        """
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return os.path.join(self.root, f.read().strip())
+        except FileNotFoundError:
+            return self.root
+
+    def _open(self, version, name):
+        """
+        Abre (ou reaproveita) o memmap do arquivo, reabrindo-o se foi regravado
+        """
+        path = os.path.join(version, name)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._arrays.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            # Memmaps de versões anteriores saem do cache junto com elas
+            for stale in [key for key in self._arrays if os.path.dirname(key) != version]:
+                del self._arrays[stale]
+            array = np.load(path, mmap_mode='r')
+            self._arrays[path] = (mtime, array)
+            return array
+
+    def _dates(self, version):
+        if not os.path.exists(os.path.join(version, DATES_FILE)):
+            return np.array([], dtype='datetime64[D]')
+        return self._open(version, DATES_FILE)
+
+    def _names(self, version):
+        return [name for name in os.listdir(version) if name.endswith('.npy') and name != DATES_FILE]
+
+    def dates(self):
+        """
+        Índice de datas compartilhado por todas as séries (vazio se ainda não houver dados)
+        """
+        return self._dates(self._version())
+
+    def tickers(self):
+        """
+        Tickers com série gravada
+        """
+        return sorted(name[:-4] for name in self._names(self._version()))
+
+    def has_series(self, tickers):
+        """
+        Indica se todos os tickers têm série gravada (comparando pelo nome de arquivo, ex.: '^BVSP' -> '_BVSP')
+        """
+        known = set(self._names(self._version()))
+        return all(_ticker_file(ticker) in known for ticker in tickers)
+
+    def _publish(self, arrays):
+        """
+        Grava os pares (arquivo, array) em uma versão nova e troca CURRENT atomicamente
+
+        A versão anterior é mantida para leitores que já a resolveram; as mais
+        antigas são removidas.
+        """
+        previous = self._version()
+        name = f"v{time.time_ns()}"
+        temp = os.path.join(self.root, f".{name}.{os.getpid()}.tmp")
+        os.makedirs(temp)
+        for file_name, array in arrays:
+            np.save(os.path.join(temp, file_name), array)
+        os.rename(temp, os.path.join(self.root, name))
+
+        pointer = os.path.join(self.root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(pointer, 'w') as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(self.root, CURRENT_FILE))
+
+        keep = {name, os.path.basename(previous)}
+        for entry in os.listdir(self.root):
+            if entry.startswith('v') and entry not in keep and os.path.isdir(os.path.join(self.root, entry)):
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+    def update(self, closes: pd.DataFrame):
+        """
+        Incorpora novos fechamentos (datas × tickers) às séries gravadas
+
+        As datas novas são unidas ao índice; as séries são realinhadas,
+        preenchidas para frente e regravadas em uma versão nova.
+        """
+        if closes.empty:
+            return
+        closes = closes.copy()
+        closes.index = pd.DatetimeIndex(closes.index).tz_localize(None).normalize()
+        version = self._version()
+        stored_dates = pd.DatetimeIndex(np.asarray(self._dates(version)))
+        dates = stored_dates.union(closes.index)
+
+        stored = set(self._names(version))
+
+        def arrays():
+            yield DATES_FILE, dates.values.astype('datetime64[D]')
+            for name in sorted(stored | {_ticker_file(ticker) for ticker in closes.columns}):
+                series = pd.Series(np.nan, index=dates)
+                if name in stored:
+                    series.loc[stored_dates] = np.asarray(self._open(version, name))
+                column = next((ticker for ticker in closes.columns if _ticker_file(ticker) == name), None)
+                if column is not None:
+                    new = closes[column].dropna()
+                    series.loc[new.index] = new.to_numpy(dtype=np.float64)
+                yield name, series.ffill().to_numpy(dtype=np.float64)
+
+        self._publish(arrays())
+
+    def refresh(self, tickers, provider, start='2015-01-01'):
+        """
+        Baixa, em um único lote, os fechamentos desde a última data gravada
+
+        Args:
+            tickers (iterable[str]): Tickers a atualizar
+            provider: Provedor com history(tickers, start) -> DataFrame datas × tickers
+            start: Data inicial quando ainda não há histórico
+        """
+        tickers = tuple(sorted(set(tickers)))
+        if not tickers:
+            return
+        with self._update_lock:
+            # Em feriados o download não traz pregões novos; evita repeti-lo a cada rerun
+            now = time.monotonic()
+            if now - self._last_refresh.get(tickers, -REFRESH_INTERVAL) < REFRESH_INTERVAL:
+                return
+            self._last_refresh[tickers] = now
+
+            dates = self.dates()
+            if len(dates) and self.has_series(tickers):
+                start = pd.Timestamp(dates[-1]) + pd.Timedelta(days=1)
+            self.update(provider.history(list(tickers), start))
+
+    def matrix(self, tickers, start=None, end=None):
+        """
+        Matriz de preços (datas × tickers) no intervalo pedido
+
+        Apenas a janela de datas de cada memmap é lida; tickers sem série viram colunas NaN.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (datas, matriz de preços)
+        """
+        version = self._version()
+        dates = self._dates(version)
+        first = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), 'D'))
+        last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date(), 'D'),
+                                                              side='right')
+        prices = np.full((last - first, len(tickers)), np.nan)
+        for column, ticker in enumerate(tickers):
+            name = _ticker_file(ticker)
+            if os.path.exists(os.path.join(version, name)):
+                prices[:, column] = self._open(version, name)[first:last]
+        return np.asarray(dates[first:last]), prices
+
+
+def portfolio_value(dates, prices, tickers, holdings):
+    """
+    Valor diário da carteira por produto matricial de preços e quantidades
+
+    Args:
+        dates (np.ndarray): Datas da matriz de preços
+        prices (np.ndarray): Matriz datas × tickers
+        tickers (list[str]): Ordem das colunas de prices
+        holdings (pd.DataFrame): Colunas 'ticker', 'quantity' e, opcionalmente,
+            'purchase_date' (a quantidade conta a partir dessa data)
+
+    Returns:
+        pd.Series: Valor da carteira por data
+    """
+    column = {ticker: index for index, ticker in enumerate(tickers)}
+    holdings = holdings[holdings['ticker'].isin(column)]
+
+    # Variação de quantidade na data de compra, acumulada ao longo do tempo
+    changes = np.zeros((len(dates) + 1, len(tickers)))
+    if 'purchase_date' in holdings:
+        purchase = pd.to_datetime(holdings['purchase_date']).values.astype('datetime64[D]')
+        rows = np.where(np.isnat(purchase), 0, np.searchsorted(dates, purchase))
+    else:
+        rows = np.zeros(len(holdings), dtype=int)
+    np.add.at(changes, (rows, holdings['ticker'].map(column).to_numpy(dtype=int)),
+              holdings['quantity'].to_numpy(dtype=np.float64))
+    quantities = np.cumsum(changes, axis=0)[:-1]
+
+    values = np.einsum('dt,dt->d', np.nan_to_num(prices), quantities)
+    return pd.Series(values, index=pd.DatetimeIndex(dates), name='Valor da Carteira')
+
+
+def get_price_history_store(root) -> PriceHistoryStore:
+    """
+    Retorna o repositório de séries compartilhado pelo processo para o diretório informado
+    """
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = PriceHistoryStore(root)
+            _stores[root] = store
+        return store
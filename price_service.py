@@ -0,0 +1,292 @@
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+MARKET_TZ = ZoneInfo('America/Sao_Paulo')
+MARKET_OPEN = dtime(10, 0)
+MARKET_CLOSE = dtime(18, 0)  # fim do pregão regular da B3 com folga para o fechamento
+OPEN_TTL = 15 * 60  # segundos; as cotações do Yahoo Finance já têm atraso de ~15 min
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def market_is_open(now=None) -> bool:
+    """
+    Indica se o pregão está aberto (dias úteis, entre MARKET_OPEN e MARKET_CLOSE; feriados não são considerados)
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def next_market_open(now=None) -> datetime:
+    """
+    Retorna o próximo horário de abertura do pregão
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    candidate = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def quote_expires_at(fetched_at, open_ttl=OPEN_TTL) -> float:
+    """
+    Calcula até quando uma cotação obtida em fetched_at (timestamp) continua válida
+
+    Com o pregão aberto, vale por open_ttl segundos (sem passar do fechamento,
+    para que o preço final seja buscado uma vez). Com o pregão fechado, o
+    preço não muda, então vale até a próxima abertura.
+    """
+    now = datetime.fromtimestamp(fetched_at, MARKET_TZ)
+    if market_is_open(now):
+        close = now.replace(hour=MARKET_CLOSE.hour, minute=MARKET_CLOSE.minute, second=0, microsecond=0)
+        return min(fetched_at + open_ttl, close.timestamp())
+    return next_market_open(now).timestamp()
+
+
+class YFinanceProvider:
+    """
+    Provedor de cotações do Yahoo Finance; todos os tickers em um único download
+    """
+
+    def fetch(self, tickers):
+        """
+        Retorna {ticker: último preço de fechamento disponível} para os tickers encontrados
+        """
+        # Import pesado, feito apenas quando cotações são realmente buscadas
+        import yfinance as yf
+
+        data = yf.download(sorted(tickers), period='5d', interval='1d', group_by='column',
+                           auto_adjust=False, progress=False, threads=True)
+        if data.empty:
+            return {}
+        closes = data['Close']
+        if not hasattr(closes, 'columns'):
+            closes = closes.to_frame(name=next(iter(tickers)))
+        last = closes.ffill().iloc[-1].dropna()
+        return {str(ticker): float(price) for ticker, price in last.items()}
+
+    def history(self, tickers, start):
+        """
+        Retorna os fechamentos diários (datas × tickers) desde start, em um único download
+        """
+        import yfinance as yf
+
+        data = yf.download(sorted(tickers), start=pd.Timestamp(start).strftime('%Y-%m-%d'), interval='1d',
+                           group_by='column', auto_adjust=True, progress=False, threads=True)
+        if data.empty:
+            return pd.DataFrame()
+        closes = data['Close']
+        if not hasattr(closes, 'columns'):
+            closes = closes.to_frame(name=next(iter(tickers)))
+        return closes
+
+
+class FixtureProvider:
+    """
+    Provedor offline para testes e benchmarks, com preços fixos (dict ou arquivo JSON)
+    e, opcionalmente, um histórico de fechamentos (DataFrame datas × tickers)
+
+    delay simula a latência de uma chamada à rede; calls conta as chamadas recebidas.
+    """
+
+    def __init__(self, prices, delay=0.0, history=None):
+        if isinstance(prices, str):
+            with open(prices, encoding='utf-8') as f:
+                prices = json.load(f)
+        self.prices = {ticker: float(price) for ticker, price in prices.items()}
+        self.closes = history if history is not None else pd.DataFrame()
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, tickers):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return {ticker: self.prices[ticker] for ticker in tickers if ticker in self.prices}
+
+    def history(self, tickers, start):
+        with self._lock:
+            self.calls += 1
+        columns = [ticker for ticker in tickers if ticker in self.closes.columns]
+        return self.closes.loc[self.closes.index >= pd.Timestamp(start), columns]
+
+
+class PriceService:
+    """
+    Cotações em cache (memória e, opcionalmente, SQLite), compartilhadas por todas as sessões
+
+    Cotações vencidas ou ausentes são buscadas juntas em uma única chamada ao
+    provedor, e apenas uma atualização roda por vez: sessões que pedem os
+    mesmos tickers ao mesmo tempo aguardam e reaproveitam o resultado.
+
+    Se universe for informado (função que lista todos os tickers em carteira),
+    cada atualização inclui também os demais tickers vencidos, então um único
+    download atende às carteiras de todos os usuários.
+    """
+
+    def __init__(self, provider=None, path=None, open_ttl=OPEN_TTL, universe=None):
+        self.provider = provider or YFinanceProvider()
+        self.path = path
+        self.open_ttl = open_ttl
+        self.universe = universe
+        self._quotes = {}  # ticker -> (preço, obtido_em, expira_em)
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        if path:
+            with sqlite3.connect(path) as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS quotes (ticker TEXT PRIMARY KEY, price REAL, '
+                    'fetched_at REAL NOT NULL, expires_at REAL NOT NULL)'
+                )
+
+    def _fresh(self, tickers, now):
+        """
+        Separa os tickers com cotação válida (memória e depois SQLite) dos que precisam ser buscados
+        """
+        found, missing = {}, []
+        with self._lock:
+            for ticker in tickers:
+                quote = self._quotes.get(ticker)
+                if quote is None or now >= quote[2]:
+                    missing.append(ticker)
+                elif quote[0] is not None:
+                    found[ticker] = quote[0]
+
+        if missing and self.path:
+            placeholders = ','.join('?' * len(missing))
+            with sqlite3.connect(self.path) as conn:
+                rows = conn.execute(
+                    f'SELECT ticker, price, fetched_at, expires_at FROM quotes WHERE ticker IN ({placeholders})',
+                    missing
+                ).fetchall()
+            fresh = set()
+            with self._lock:
+                for ticker, price, fetched_at, expires_at in rows:
+                    if now < expires_at:
+                        self._quotes[ticker] = (price, fetched_at, expires_at)
+                        fresh.add(ticker)
+                        if price is not None:
+                            found[ticker] = price
+            missing = [ticker for ticker in missing if ticker not in fresh]
+        return found, missing
+
+    def _store(self, tickers, prices, fetched_at):
+        """
+        Grava as cotações; tickers sem cotação ficam em cache como None até o mesmo vencimento
+        """
+        expires_at = quote_expires_at(fetched_at, self.open_ttl)
+        rows = [(ticker, prices.get(ticker), fetched_at, expires_at) for ticker in tickers]
+        with self._lock:
+            for ticker, price, fetched, expires in rows:
+                self._quotes[ticker] = (price, fetched, expires)
+        if self.path and rows:
+            with sqlite3.connect(self.path) as conn:
+                conn.executemany('INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?)', rows)
+
+    def _count(self, counter, amount=1):
+        """
+        Incrementa um contador de uso ('hits', 'misses' ou 'fetches') sob o lock
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_prices(self, tickers):
+        """
+        Retorna {ticker: preço} para os tickers pedidos, buscando os vencidos em um único lote
+
+        Tickers que o provedor não reconhece ficam de fora do resultado.
+        """
+        tickers = sorted({ticker for ticker in tickers if ticker})
+        found, missing = self._fresh(tickers, time.time())
+        self._count('hits', len(found))
+        if not missing:
+            return found
+
+        with self._fetch_lock:
+            # Outra sessão pode ter atualizado as cotações enquanto esperávamos
+            refreshed, missing = self._fresh(missing, time.time())
+            found.update(refreshed)
+            if missing:
+                self._count('misses', len(missing))
+                batch = set(missing)
+                if self.universe is not None:
+                    batch.update(self._fresh(sorted(set(self.universe()) - batch), time.time())[1])
+                self._count('fetches')
+                prices = self.provider.fetch(sorted(batch))
+                self._store(batch, prices, time.time())
+                found.update({ticker: prices[ticker] for ticker in missing if ticker in prices})
+        return found
+
+    def stats(self):
+        """
+        Retorna contadores de uso do cache
+        """
+        with self._lock:
+            return {
+                'quotes': len(self._quotes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'fetches': self.fetches,
+            }
+
+
+def held_tickers(db):
+    """
+    Lista os tickers distintos presentes na coleção de investimentos (todos os usuários)
+    """
+    return [ticker for ticker in db['investments'].distinct('ticker') if ticker]
+
+
+def get_price_service(path=None, provider=None, universe=None) -> PriceService:
+    """
+    Retorna o serviço de cotações compartilhado pelo processo para o arquivo informado (ou só em memória)
+    """
+    with _services_lock:
+        service = _services.get(path)
+        if service is None:
+            service = PriceService(provider=provider, path=path, universe=universe)
+            _services[path] = service
+        return service
+
+
+def main():
+    """
+    Aquece o cache com as cotações de todas as carteiras (ex.: em um cron antes da abertura)
+
+    Uso: python -m price_service [--cache precos.sqlite] [--fixture precos.json]
+    """
+    from db_connection import get_database
+
+    parser = argparse.ArgumentParser(description='Atualiza as cotações de todos os tickers em carteira')
+    parser.add_argument('--cache', help='arquivo SQLite do cache de cotações')
+    parser.add_argument('--fixture', help='arquivo JSON {ticker: preço} usado no lugar do Yahoo Finance')
+    args = parser.parse_args()
+
+    provider = FixtureProvider(args.fixture) if args.fixture else None
+    service = get_price_service(args.cache, provider)
+    tickers = held_tickers(get_database())
+    prices = service.get_prices(tickers)
+
+    for ticker in tickers:
+        print(f"{ticker}: {prices[ticker]:.2f}" if ticker in prices else f"{ticker}: sem cotação")
+    print(f"{len(prices)} de {len(tickers)} cotações atualizadas")
+    return 0 if len(prices) == len(tickers) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from financial_advisor import FinancialAdvisor
+from purchase_scenarios import (MAX_INSTALLMENTS, METODOS, amortization_schedule, feasible_frontier,
+                                frontier_heatmap, scenario_grid)
 
 def purchase_intelligence_interface(tracker):
     """
@@ -10,23 +12,20 @@ def purchase_intelligence_interface(tracker):
     """
     st.subheader("🧠 Consultor Financeiro Inteligente")
     
-    # Recupera transações para análise
+    # Recupera o resumo mensal já agregado no MongoDB
     current_year = datetime.now().year
-    df_transactions = tracker.get_transactions(current_year)
+    monthly_summary = tracker.monthly_summary(current_year)
     
-    if not df_transactions.empty:
+    if not monthly_summary.empty:
         # Cria o conselheiro financeiro
-        advisor = FinancialAdvisor(df_transactions)
+        advisor = FinancialAdvisor(monthly_summary=monthly_summary)
         metrics = advisor.analyze_financial_health()
         
-        # Calcula métricas mensais corretas
-        monthly_summary = df_transactions.groupby(['month', 'type'])['value'].sum().unstack(fill_value=0)
-        
-        # Calcula médias mensais reais
-        monthly_revenue = monthly_summary.get('Receita', pd.Series([0])).mean()
-        monthly_expenses = monthly_summary.get('Despesa', pd.Series([0])).mean()
-        monthly_investments = monthly_summary.get('Investimento', pd.Series([0])).mean()
-        monthly_savings = monthly_revenue - monthly_expenses - monthly_investments
+        # Médias mensais reais, já calculadas junto com as demais métricas
+        monthly_revenue = metrics['average_monthly_revenue']
+        monthly_expenses = metrics['average_monthly_expenses']
+        monthly_investments = metrics['average_monthly_investments']
+        monthly_savings = metrics['average_monthly_savings']
         
         # Obtém dados do mês atual
         current_month = datetime.now().strftime('%B')  # Gets month name
@@ -89,7 +88,43 @@ def purchase_intelligence_interface(tracker):
             if purchase_type == "Recorrente":
                 duration_months = st.number_input("Duração (meses)", min_value=1, max_value=60, value=12)
         
-        # Seção 3: Análise de Viabilidade
+        current_month_savings = (current_month_data.get('Receita', 0) - 
+                               current_month_data.get('Despesa', 0) - 
+                               current_month_data.get('Investimento', 0))
+        max_installment = max(monthly_savings * 0.3, 0)  # Máximo 30% da reserva mensal
+        
+        # Seção 3: Simulador de Financiamento (grade completa, recalculada a cada ajuste)
+        st.write("### 🧮 Simulador de Financiamento")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            juros = st.slider("Taxa de Juros Mensal (%)", 0.0, 5.0, 2.0, 0.25)
+        with col2:
+            entrada = st.slider("Entrada (%)", 0, 50, 0, 5)
+        with col3:
+            metodo = st.radio("Amortização", METODOS, horizontal=True,
+                              help="Price: parcelas fixas. SAC: amortização fixa e parcelas decrescentes.")
+        
+        grid = scenario_grid(purchase_value, method=metodo)
+        feasible, frontier = feasible_frontier(grid, max_installment, max(current_month_savings, 0))
+        down_index = int(np.abs(grid['down_payments'] - entrada / 100).argmin())
+        rate_index = int(np.abs(grid['rates'] - juros).argmin())
+        min_installments = int(frontier[down_index, rate_index])
+        
+        st.plotly_chart(frontier_heatmap(grid, feasible, down_index))
+        if min_installments:
+            n_index = min_installments - 1
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Parcelas Mínimas", f"{min_installments}x")
+            col2.metric("Maior Parcela", f"R$ {grid['max_installment'][down_index, rate_index, n_index]:.2f}")
+            col3.metric("Custo dos Juros", f"R$ {grid['total_interest'][down_index, rate_index, n_index]:.2f}")
+            with st.expander("Tabela de Amortização"):
+                st.dataframe(amortization_schedule(purchase_value, juros, min_installments, entrada / 100, metodo)
+                             .style.format("R$ {:.2f}"))
+        else:
+            st.info(f"Nenhum parcelamento de até {MAX_INSTALLMENTS}x cabe em 30% da sua reserva mensal "
+                    f"(R$ {max_installment:.2f}) com essa taxa e entrada.")
+        
+        # Seção 4: Análise de Viabilidade
         if st.button("Analisar Viabilidade"):
             st.write("### 📈 Análise de Viabilidade")
             
@@ -107,10 +142,6 @@ def purchase_intelligence_interface(tracker):
             scenarios = []
             
             # Cenário 1: Compra à vista
-            current_month_savings = (current_month_data.get('Receita', 0) - 
-                                   current_month_data.get('Despesa', 0) - 
-                                   current_month_data.get('Investimento', 0))
-            
             if purchase_value <= current_month_savings:
                 scenarios.append({
                     "tipo": "À Vista",
@@ -126,17 +157,17 @@ def purchase_intelligence_interface(tracker):
                     "descricao": f"Você pode fazer a compra à vista em 2 meses, economizando {purchase_value/2:.2f} por mês."
                 })
             
-            # Cenário 2: Parcelamento
-            max_installment = monthly_savings * 0.3  # Máximo 30% da reserva mensal
-            recommended_installments = min(12, max(1, int(np.ceil(purchase_value / max_installment))))
-            
-            if recommended_installments <= 12:
-                installment_value = purchase_value / recommended_installments
+            # Cenário 2: Parcelamento, pela fronteira viável na taxa e entrada escolhidas
+            if 0 < min_installments <= 12:
+                n_index = min_installments - 1
+                installment_value = grid['max_installment'][down_index, rate_index, n_index]
                 scenarios.append({
                     "tipo": "Parcelado",
-                    "viabilidade": "Média" if recommended_installments <= 6 else "Baixa",
+                    "viabilidade": "Média" if min_installments <= 6 else "Baixa",
                     "impacto": "Médio",
-                    "descricao": f"Parcelamento em {recommended_installments}x de R$ {installment_value:.2f}, comprometendo {(installment_value/monthly_savings)*100:.1f}% da sua reserva média mensal."
+                    "descricao": f"Parcelamento ({metodo}) em {min_installments}x com parcela de até R$ {installment_value:.2f} "
+                                 f"a {juros:.2f}% a.m., comprometendo {(installment_value/monthly_savings)*100:.1f}% da sua reserva média mensal. "
+                                 f"Custo dos juros: R$ {grid['total_interest'][down_index, rate_index, n_index]:.2f}."
                 })
             
             # Cenário 3: Economia programada
@@ -155,21 +186,6 @@ def purchase_intelligence_interface(tracker):
             for scenario in scenarios:
                 with st.expander(f"{scenario['tipo']} - Viabilidade {scenario['viabilidade']}"):
                     st.write(scenario['descricao'])
-                    
-                    if scenario['tipo'] == "Parcelado":
-                        # Adiciona simulação de juros
-                        st.write("##### Simulação com Juros")
-                        juros = st.slider("Taxa de Juros Mensal (%)", 0.0, 5.0, 2.0, 0.1)
-                        valor_final = purchase_value * (1 + juros/100) ** recommended_installments
-                        parcela_com_juros = valor_final / recommended_installments
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Valor Final", f"R$ {valor_final:.2f}")
-                            st.metric("Custo dos Juros", f"R$ {(valor_final - purchase_value):.2f}")
-                        with col2:
-                            st.metric("Parcela sem Juros", f"R$ {installment_value:.2f}")
-                            st.metric("Parcela com Juros", f"R$ {parcela_com_juros:.2f}")
             
             # Alertas e Recomendações
             st.write("#### ⚠️ Alertas e Considerações")
@@ -185,27 +201,36 @@ def purchase_intelligence_interface(tracker):
                 alerts.append("Sua taxa média de investimento está abaixo do recomendado (10%). Considere priorizar investimentos.")
             
             
-            # Solicita recomendação do modelo de IA
-            if advisor.model:
-                try:
-                    context = (
-                        f"Valor da compra: R$ {purchase_value}, "
-                        f"Prioridade: {purchase_priority}, "
-                        f"Renda mensal média: R$ {monthly_revenue:.2f}, "
-                       # f"Reserva mensal média: R$ {monthly_savings:.2f}, "
-                        f"Reserva atual: R$ {current_month_savings:.2f}, "
-                        f"Comprometimento atual: {expense_ratio:.1f}%, "
-                        f"Taxa de investimento: {investment_ratio:.1f}%"
-                    )
-                    
-                    response = advisor.model.generate_content(
-                        f"Analise esta situação financeira: {context}. "
-                        "Dê uma recomendação estratégica e personalizada sobre a melhor forma de proceder com esta compra, "
-                        "considerando a diferença entre a reserva média e atual, o impacto no orçamento, prioridades financeiras e saúde financeira de longo prazo. "
-                        "A resposta deve ser objetiva e prática, em até 4 linhas."
-                    )
-                    st.info(f"🤖 Recomendação Estratégica: {response.text.strip()}")
-                except Exception as e:
-                    st.error(f"Erro ao gerar recomendação: {e}")
+            # Solicita recomendação do modelo de IA (em stream, com fallback baseado em regras)
+            context = (
+                f"Valor da compra: R$ {purchase_value}, "
+                f"Prioridade: {purchase_priority}, "
+                f"Renda mensal média: R$ {monthly_revenue:.2f}, "
+               # f"Reserva mensal média: R$ {monthly_savings:.2f}, "
+                f"Reserva atual: R$ {current_month_savings:.2f}, "
+                f"Comprometimento atual: {expense_ratio:.1f}%, "
+                f"Taxa de investimento: {investment_ratio:.1f}%"
+            )
+            
+            # O fallback é identificado como baseado em regras; o rótulo da IA só acompanha a resposta do modelo
+            if alerts:
+                fallback = alerts[0]
+            elif scenarios:
+                fallback = f"Melhor cenário: {scenarios[0]['tipo']}. {scenarios[0]['descricao']}"
+            else:
+                fallback = "Avalie adiar a compra até formar uma reserva maior."
+            fallback = "📋 Recomendação baseada na sua análise: " + fallback
+            
+            def recommendation():
+                yield from advisor.stream_advice(
+                    f"Analise esta situação financeira: {context}. "
+                    "Dê uma recomendação estratégica e personalizada sobre a melhor forma de proceder com esta compra, "
+                    "considerando a diferença entre a reserva média e atual, o impacto no orçamento, prioridades financeiras e saúde financeira de longo prazo. "
+                    "A resposta deve ser objetiva e prática, em até 4 linhas.",
+                    fallback=fallback,
+                    prefix="🤖 Recomendação Estratégica: "
+                )
+            
+            st.write_stream(recommendation())
     else:
         st.warning("Adicione algumas transações para receber recomendações personalizadas.")
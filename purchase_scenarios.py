@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from instrumentation import instrument
+
+MAX_INSTALLMENTS = 60
+DEFAULT_RATES = np.round(np.arange(0.0, 5.01, 0.25), 2)  # % ao mês
+DEFAULT_DOWN_PAYMENTS = np.arange(0.0, 0.51, 0.05)  # fração do valor da compra
+METODOS = ['Price', 'SAC']
+
+
+@instrument()
+def scenario_grid(purchase_value, rates=DEFAULT_RATES, down_payments=DEFAULT_DOWN_PAYMENTS,
+                  max_installments=MAX_INSTALLMENTS, method='Price') -> dict:
+    """
+    Calcula todos os cenários de financiamento de uma compra em uma única operação vetorizada
+
+    A grade tem forma (entradas, taxas, parcelas), com parcelas de 1 a
+    max_installments. Na tabela Price a parcela é constante; no SAC a
+    amortização é constante e a maior parcela é a primeira.
+
+    Args:
+        purchase_value (float): Valor do item
+        rates (array-like): Taxas de juros mensais, em %
+        down_payments (array-like): Entradas, como fração do valor (0 a 1)
+        max_installments (int): Número máximo de parcelas
+        method (str): 'Price' ou 'SAC'
+
+    Returns:
+        dict: Arrays com os eixos ('down_payments', 'rates', 'installments') e,
+            por cenário, 'down_payment_value', 'first_installment',
+            'max_installment', 'total_paid' e 'total_interest'
+    """
+    if method not in METODOS:
+        raise ValueError(f"Método de amortização inválido: {method}")
+
+    down = np.asarray(down_payments, dtype=np.float64)[:, None, None]
+    rate = np.asarray(rates, dtype=np.float64)[None, :, None] / 100
+    n = np.arange(1, max_installments + 1, dtype=np.float64)[None, None, :]
+
+    down_value = purchase_value * down
+    principal = purchase_value - down_value
+
+    if method == 'Price':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.where(rate > 0, rate / (1 - (1 + rate) ** -n), 1 / n)
+        first = principal * factor
+        financed_total = first * n
+    else:
+        amortization = principal / n
+        first = amortization + principal * rate
+        # Juros do SAC: r * P * (n + 1) / 2, soma de uma progressão aritmética
+        financed_total = principal + rate * principal * (n + 1) / 2
+
+    shape = np.broadcast_shapes(down.shape, rate.shape, n.shape)
+    return {
+        'down_payments': down.ravel(),
+        'rates': rate.ravel() * 100,
+        'installments': n.ravel().astype(int),
+        'down_payment_value': np.broadcast_to(down_value, shape),
+        'first_installment': np.broadcast_to(first, shape),
+        # Com juros não negativos, a primeira parcela é a maior nos dois sistemas
+        'max_installment': np.broadcast_to(first, shape),
+        'total_paid': np.broadcast_to(down_value + financed_total, shape),
+        'total_interest': np.broadcast_to(financed_total - principal, shape),
+    }
+
+
+def feasible_frontier(grid, monthly_budget, available_cash=np.inf):
+    """
+    Marca os cenários que cabem no orçamento e encontra a fronteira viável
+
+    Um cenário é viável quando a maior parcela não passa de monthly_budget e a
+    entrada não passa do dinheiro disponível. Para cada par (entrada, taxa), a
+    fronteira é o menor número de parcelas viável, que também é o de menor juros.
+
+    Args:
+        grid (dict): Resultado de scenario_grid
+        monthly_budget (float): Valor máximo de parcela que o usuário comporta
+        available_cash (float): Dinheiro disponível para a entrada
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (máscara de viabilidade com a forma da
+            grade, menor número de parcelas por (entrada, taxa); 0 se inviável)
+    """
+    feasible = ((grid['max_installment'] <= monthly_budget + 1e-9)
+                & (grid['down_payment_value'] <= available_cash + 1e-9))
+    any_feasible = feasible.any(axis=-1)
+    first_feasible = feasible.argmax(axis=-1)
+    frontier = np.where(any_feasible, grid['installments'][first_feasible], 0)
+    return feasible, frontier
+
+
+def frontier_frame(grid, frontier) -> pd.DataFrame:
+    """
+    Tabela da fronteira viável: parcelas mínimas, parcela e juros por entrada e taxa
+    """
+    down_index, rate_index = np.nonzero(frontier)
+    n_index = frontier[down_index, rate_index] - 1
+    return pd.DataFrame({
+        'Entrada (%)': grid['down_payments'][down_index] * 100,
+        'Taxa (% a.m.)': grid['rates'][rate_index],
+        'Parcelas': frontier[down_index, rate_index],
+        'Maior Parcela': grid['max_installment'][down_index, rate_index, n_index],
+        'Juros Totais': grid['total_interest'][down_index, rate_index, n_index],
+    })
+
+
+def amortization_schedule(purchase_value, rate, installments, down_payment=0.0,
+                          method='Price') -> pd.DataFrame:
+    """
+    Tabela mês a mês de um cenário, com parcela, juros, amortização e saldo devedor
+
+    Args:
+        purchase_value (float): Valor do item
+        rate (float): Taxa de juros mensal, em %
+        installments (int): Número de parcelas
+        down_payment (float): Entrada, como fração do valor
+        method (str): 'Price' ou 'SAC'
+    """
+    grid = scenario_grid(purchase_value, [rate], [down_payment], installments, method)
+    principal = purchase_value * (1 - down_payment)
+    r = rate / 100
+    k = np.arange(1, installments + 1)
+
+    if method == 'Price':
+        payment = np.full(installments, grid['first_installment'][0, 0, -1])
+        # Saldo após k parcelas: P(1+r)^k - PMT((1+r)^k - 1)/r
+        growth = (1 + r) ** k
+        balance = principal * growth - payment * ((growth - 1) / r if r > 0 else k)
+        previous = np.concatenate(([principal], balance[:-1]))
+        interest = previous * r
+        amortization = payment - interest
+    else:
+        amortization = np.full(installments, principal / installments)
+        previous = principal - amortization * (k - 1)
+        interest = previous * r
+        payment = amortization + interest
+        balance = previous - amortization
+
+    return pd.DataFrame({
+        'Parcela': payment,
+        'Juros': interest,
+        'Amortização': amortization,
+        'Saldo Devedor': np.clip(balance, 0, None),
+    }, index=pd.Index(k, name='Mês'))
+
+
+@instrument()
+def frontier_heatmap(grid, feasible, down_index=0):
+    """
+    Heatmap (parcelas × taxa) da maior parcela para uma entrada, com cenários inviáveis em branco
+    """
+    import plotly.graph_objects as go
+
+    values = np.where(feasible[down_index], grid['max_installment'][down_index], np.nan)
+    fig = go.Figure(go.Heatmap(
+        z=values,
+        x=grid['installments'],
+        y=grid['rates'],
+        colorscale='Viridis',
+        colorbar={'title': 'Parcela (R$)'},
+        hovertemplate='%{x}x a %{y}% a.m.: R$ %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis_title='Número de Parcelas',
+        yaxis_title='Taxa de Juros (% a.m.)',
+        title=f"Cenários viáveis com entrada de {grid['down_payments'][down_index] * 100:.0f}%"
+    )
+    return fig
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_TTL = 15 * 60  # segundos; limita o tempo de um nome desatualizado no cache
+
+
+class SessionCache:
+    """
+    Cache de sessões verificadas, indexado pelo token JWT
+
+    Guarda as claims decodificadas e um registro reduzido do usuário. Cada
+    entrada expira no 'exp' do token (ou em max_ttl, o que vier antes) e é
+    removida no logout, então um token expirado nunca é servido do cache.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_ttl=DEFAULT_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # token -> (claims, user, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_lookups = 0
+
+    def get(self, token):
+        """
+        Retorna (claims, user) se o token estiver em cache e válido, senão None
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, user, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims, user
+
+    def put(self, token, claims, user):
+        """
+        Armazena a sessão até o 'exp' do token, limitado a max_ttl
+        """
+        expires_at = min(claims.get('exp', 0), time.time() + self.max_ttl)
+        with self._lock:
+            self._entries[token] = (claims, user, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, token):
+        """
+        Remove a sessão do cache (ex.: no logout)
+        """
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def record_lookup(self):
+        """
+        Contabiliza uma busca do usuário no banco (cache miss)
+        """
+        with self._lock:
+            self.db_lookups += 1
+
+    def stats(self):
+        """
+        Retorna contadores de uso; 'db_lookups_saved' é o número de acertos
+        """
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'db_lookups': self.db_lookups,
+            'db_lookups_saved': self.hits,
+        }
+
+
+# Instância compartilhada por todas as sessões do processo
+session_cache = SessionCache()
@@ -0,0 +1,57 @@
+import argparse
+import sys
+from db_connection import get_database
+from financial_tracker import ARCHIVE_COLLECTION, FinancialTracker
+
+
+def archive(db, year, user_ids=None):
+    """
+    Arquiva o ano informado para os usuários indicados (ou todos os que têm transações nele)
+
+    Returns:
+        dict: {user_id: transações movidas para o arquivo}
+    """
+    if user_ids is None:
+        user_ids = db['transactions'].distinct('user_id', {'year': year})
+    return {user_id: FinancialTracker(user_id=user_id, db=db).archive_year(year) for user_id in user_ids}
+
+
+def unarchive(db, year, user_ids=None):
+    """
+    Desfaz o arquivamento do ano informado para os usuários indicados (ou todos os arquivados)
+
+    Returns:
+        dict: {user_id: transações restauradas}
+    """
+    if user_ids is None:
+        user_ids = db[ARCHIVE_COLLECTION].distinct('user_id', {'year': year})
+    return {user_id: FinancialTracker(user_id=user_id, db=db).unarchive_year(year) for user_id in user_ids}
+
+
+def main():
+    """
+    Uso: python -m transaction_archive {archive,unarchive} --year 2022 [--user USER_ID]
+    """
+    parser = argparse.ArgumentParser(
+        description='Compacta anos encerrados em um documento colunar por usuário, ou desfaz o arquivamento')
+    parser.add_argument('action', choices=['archive', 'unarchive'])
+    parser.add_argument('--year', type=int, required=True)
+    parser.add_argument('--user', action='append', help='restringe a um usuário (pode ser repetido)')
+    args = parser.parse_args()
+
+    db = get_database()
+    try:
+        result = (archive if args.action == 'archive' else unarchive)(db, args.year, args.user)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    for user_id, count in result.items():
+        print(f"{user_id}: {count} transações")
+    action = 'arquivadas' if args.action == 'archive' else 'restauradas'
+    print(f"{sum(result.values())} transações {action} em {args.year} ({len(result)} usuários)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
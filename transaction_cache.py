@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+
+
+class TransactionCache:
+    """
+    Cache LRU de DataFrames de transações por usuário, compartilhado pelo processo
+
+    A chave de cada entrada é definida pelo chamador (ex.: o ano ou o ano e as
+    colunas projetadas) e combinada com o usuário e a versão dos seus dados.
+
+    Cada usuário tem um contador de versão. Os métodos que alteram transações
+    chamam invalidate(), que incrementa a versão e descarta as entradas do
+    usuário, então uma edição aparece imediatamente no próximo rerun.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user_id, key, version) -> (df, bytes)
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id):
+        """
+        Retorna a versão atual dos dados do usuário
+        """
+        return self._versions.get(user_id, 0)
+
+    def get(self, user_id, key):
+        """
+        Retorna uma cópia do DataFrame em cache ou None
+        """
+        key = (user_id, key, self.version(user_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Cópia para que alterações feitas pela interface não contaminem o cache
+            return entry[0].copy()
+
+    def put(self, user_id, key, df: pd.DataFrame, version=None):
+        """
+        Armazena o DataFrame, respeitando os limites de entradas e de memória
+
+        Args:
+            version (int, optional): Versão lida antes da consulta ao banco; se o
+                usuário foi invalidado no meio tempo, o resultado é descartado
+        """
+        current = self.version(user_id)
+        if version is not None and version != current:
+            return
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        key = (user_id, key, current)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df.copy(), size)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def invalidate(self, user_id):
+        """
+        Incrementa a versão do usuário e descarta todas as suas entradas
+        """
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """
+        Esvazia o cache
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Retorna contadores de uso do cache
+        """
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Instância compartilhada por todas as sessões do processo
+transaction_cache = TransactionCache()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Colunas editáveis no st.data_editor de "Gerenciar Transações"
+EDITABLE_COLUMNS = ['month', 'category', 'type', 'value', 'observation', 'paid']
+
+
+def _to_python(value):
+    """
+    Converte escalares numpy/pandas para tipos aceitos pelo BSON
+    """
+    if value is None or (np.ndim(value) == 0 and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def diff_transactions(original_df: pd.DataFrame, edited_df: pd.DataFrame,
+                      columns=EDITABLE_COLUMNS, select_column='Selecionar'):
+    """
+    Compara o DataFrame original com o editado em uma única passada vetorizada
+
+    As linhas são alinhadas pelo '_id' (e não pela posição), então ordenações
+    ou remoções no editor não geram falsos positivos. Linhas novas, sem '_id',
+    são ignoradas.
+
+    Args:
+        original_df (pd.DataFrame): Transações como foram carregadas do banco
+        edited_df (pd.DataFrame): Resultado do st.data_editor
+        columns (list[str]): Colunas a comparar
+        select_column (str): Coluna de checkbox que marca linhas para exclusão
+
+    Returns:
+        tuple[dict, list]: ({_id: {coluna: novo_valor}}, [_ids marcados para exclusão])
+    """
+    deletes = []
+    if select_column in edited_df.columns:
+        selected = edited_df[edited_df[select_column].fillna(False).astype(bool)]
+        deletes = selected['_id'].dropna().astype(str).tolist()
+
+    if original_df.empty or edited_df.empty:
+        return {}, deletes
+
+    columns = [col for col in columns if col in original_df.columns and col in edited_df.columns]
+    original = original_df.dropna(subset=['_id']).set_index('_id')[columns]
+    edited = edited_df.dropna(subset=['_id']).set_index('_id')[columns]
+    edited = edited[edited.index.isin(original.index)]
+    original = original.loc[edited.index]
+
+    old = original.astype(object)
+    new = edited.astype(object)
+    both_missing = old.isna() & new.isna()
+    changed = (old != new) & ~both_missing
+
+    rows = changed.any(axis=1).to_numpy()
+    if not rows.any():
+        return {}, deletes
+
+    values = new.to_numpy()[rows]
+    flags = changed.to_numpy()[rows]
+    updates = {}
+    for _id, row_values, row_flags in zip(new.index[rows], values, flags):
+        updates[str(_id)] = {
+            col: _to_python(value)
+            for col, value, flag in zip(columns, row_values, row_flags) if flag
+        }
+
+    return updates, deletes